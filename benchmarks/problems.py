@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+The objectives of the benchmark suite, with their known optima.
+"""
+
+import itertools
+import math
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class Problem(object):
+  """
+  An objective to minimize from `vertex`, with the `nelder_mead` arguments
+  to do it with, and its `optimum`, computed over the lattice if not given.
+  A run has converged once the best configuration found is within
+  `tolerance` of the optimum.
+  """
+
+  def __init__(self, objective: Callable[[Sequence[float]], float],
+               vertex: List[float], step_sizes: List[float],
+               tolerance: float, optimum: Optional[float] = None,
+               bounds: Optional[List[Tuple[float, float]]] = None,
+               lattice: Optional[List[float]] = None,
+               iterations: int = 200, threshold: float = 1e-8) -> None:
+    self.objective = objective
+    self.vertex = vertex
+    self.step_sizes = step_sizes
+    self.tolerance = tolerance
+    self.bounds = bounds
+    self.lattice = lattice
+    self.iterations = iterations
+    self.threshold = threshold
+    self.optimum = self._grid_optimum() if optimum is None else optimum
+
+  def _grid_optimum(self) -> float:
+    assert self.bounds is not None and self.lattice is not None
+    axes = [[low + i * step for i in range(int((high - low) / step) + 1)]
+            for (low, high), step in zip(self.bounds, self.lattice)]
+    return min(self.objective(p) for p in itertools.product(*axes))
+
+  def arguments(self) -> Any:
+    return dict(vertex=self.vertex, step_sizes=self.step_sizes,
+                iterations=self.iterations, threshold=self.threshold,
+                bounds=self.bounds, lattice=self.lattice)
+
+
+def rosenbrock(x: Sequence[float]) -> float:
+  return (1 - x[0]) ** 2 + 100 * (x[1] - x[0] ** 2) ** 2
+
+
+def quadratic(x: Sequence[float]) -> float:
+  # as in `forking_tuner/examples/quadratic.py`
+  return (x[0] - 5) ** 2 + (x[1] - 7) ** 2
+
+
+def thread_latency(x: Sequence[float]) -> float:
+  """
+  A synthetic batch latency, in milliseconds, for `x[0]` intra-op and
+  `x[1]` inter-op threads on 28 cores: the work splits across the threads,
+  each of which costs some synchronization, oversubscribing the cores costs
+  context switches, and the inter-op pool is best at 2 concurrent ops.
+  """
+  threads, ops = int(x[0]), int(x[1])
+  latency = 100 / threads + 0.5 * threads
+  latency += 2 * max(threads * ops - 28, 0) / ops
+  return latency + 1.5 * abs(math.log2(ops / 2))
+
+
+PROBLEMS = {'rosenbrock': Problem(rosenbrock, [-1.2, 1.0], [0.5, 0.5], 1e-3,
+                                  optimum=0.0, iterations=500),
+            'quadratic': Problem(quadratic, [22, 2], [11, 1], 1e-3,
+                                 optimum=0.0),
+            'thread-latency': Problem(thread_latency, [28, 4], [14, 2], 0.05,
+                                      bounds=[(1, 56), (1, 8)],
+                                      lattice=[1, 1])}
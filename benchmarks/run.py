@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Runs the benchmark suite and prints its results as JSON, e.g.
+
+    python -m benchmarks.run --noise 0.01 --cost 0.005 --runs 5 > base.json
+
+For every problem and run: the trials and seconds it took, the trials until
+the best configuration found was within the problem's tolerance of its
+optimum, and the rate of trials spent on a configuration evaluated before.
+Then the overhead of a trial, of a bare fork and pipe round trip, and of a
+tuner trial that does no work.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from forking_tuner import nelder_mead, report, tune
+from forking_tuner.channel import in_trial
+from forking_tuner.strategies import GridSearch
+from forking_tuner.trace import read_trace, summarize
+
+from .problems import PROBLEMS, Problem
+
+_VERSION = 1
+
+# the number of trials forked so far, shared with the children so that each
+# draws its noise from a seed of its own, the same from one run to the next
+_COUNTER = struct.Struct('q')
+
+
+def _next_trial(counter: mmap.mmap) -> int:
+  index, = _COUNTER.unpack_from(counter)
+  _COUNTER.pack_into(counter, 0, index + 1)
+  return index
+
+
+def run_problem(problem: Problem, noise: float, cost: float, seed: int,
+                directory: str, repeats: int = 1) -> Dict[str, Any]:
+  """
+  Tunes `problem` with Gaussian noise of standard deviation `noise` added to
+  its objective, sleeping `cost` seconds per trial.
+  """
+  counter = mmap.mmap(-1, _COUNTER.size)
+  path = os.path.join(directory, f'{seed}-{time.monotonic_ns()}.jsonl')
+  start = time.perf_counter()
+  vertex = None  # type: Optional[Sequence[float]]
+  for vertex in nelder_mead(trace=path, repeats=repeats,
+                            **problem.arguments()):
+    if not in_trial():
+      break
+    value = problem.objective(vertex)
+    rng = random.Random(f'{seed}:{_next_trial(counter)}')
+    if cost:
+      time.sleep(cost)
+    report(value + (rng.gauss(0, noise) if noise else 0.0), exact=value)
+  seconds = time.perf_counter() - start
+
+  with open(path) as f:
+    records = list(read_trace(f))
+  os.unlink(path)
+  converged = None  # type: Optional[int]
+  best = None  # type: Optional[Dict[str, Any]]
+  for count, record in enumerate(records, 1):
+    if best is None or record['objective'] < best['objective']:
+      best = record
+    if converged is None and \
+       best['metrics']['exact'] <= problem.optimum + problem.tolerance:
+      converged = count
+  summary = summarize(iter(records))
+  duplicates = summary['wasted']['duplicate'][0]
+  return {'seed': seed, 'trials': len(records), 'seconds': seconds,
+          'seconds_per_trial': seconds / max(len(records), 1),
+          'trials_to_converge': converged,
+          'duplicate_rate': duplicates / max(len(records), 1),
+          'best': vertex,
+          'error': problem.objective(vertex or []) - problem.optimum}
+
+
+def fork_overhead(count: int) -> float:
+  """
+  The seconds a bare fork, one-byte pipe write and reap take.
+  """
+  start = time.perf_counter()
+  for _ in range(count):
+    r, w = os.pipe()
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+      os.write(w, b'.')
+      os._exit(0)
+    os.close(w)
+    os.read(r, 1)
+    os.close(r)
+    os.waitpid(pid, 0)
+  return (time.perf_counter() - start) / count
+
+
+def trial_overhead(count: int) -> float:
+  """
+  The seconds a tuner trial that does no work takes, end to end.
+  """
+  start = time.perf_counter()
+  for _ in tune(GridSearch([(1, count)])):
+    if not in_trial():
+      break
+    report(0.0)
+  return (time.perf_counter() - start) / count
+
+
+def _median(values: Sequence[Optional[float]]) -> Optional[float]:
+  known = [v for v in values if v is not None]
+  return statistics.median(known) if known else None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  parser = argparse.ArgumentParser(prog='python -m benchmarks.run',
+                                   description='Benchmarks the tuner\'s '
+                                   'search efficiency and overhead.')
+  parser.add_argument('--problem', action='append', choices=sorted(PROBLEMS),
+                      help='a problem to run, all of them by default')
+  parser.add_argument('--noise', type=float, default=0.0,
+                      help='the standard deviation of the noise added to '
+                      'the objectives')
+  parser.add_argument('--cost', type=float, default=0.0,
+                      help='the seconds every trial sleeps')
+  parser.add_argument('--repeats', type=int, default=1)
+  parser.add_argument('--runs', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--overhead-trials', type=int, default=200)
+  parser.add_argument('--output', help='the file to write, stdout by default')
+  args = parser.parse_args(argv)
+
+  problems = {}
+  with tempfile.TemporaryDirectory() as directory:
+    for name in args.problem or sorted(PROBLEMS):
+      runs = [run_problem(PROBLEMS[name], args.noise, args.cost,
+                          args.seed + i, directory, args.repeats)
+              for i in range(args.runs)]
+      medians = {key: _median([r[key] for r in runs])
+                 for key in ('trials', 'seconds', 'trials_to_converge',
+                             'duplicate_rate', 'error')}
+      converged = sum(r['trials_to_converge'] is not None for r in runs)
+      problems[name] = {'optimum': PROBLEMS[name].optimum, 'median': medians,
+                        'converged': converged, 'runs': runs}
+  results = {'version': _VERSION,
+             'python': platform.python_version(),
+             'platform': platform.platform(),
+             'cpus': len(os.sched_getaffinity(0)),
+             'arguments': {k: v for k, v in vars(args).items()
+                           if k != 'output'},
+             'problems': problems,
+             'overhead': {'fork_pipe': fork_overhead(args.overhead_trials),
+                          'trial': trial_overhead(args.overhead_trials)}}
+  text = json.dumps(results, indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(text + '\n')
+  else:
+    print(text)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
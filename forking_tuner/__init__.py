@@ -20,17 +20,50 @@
 forking-tuner: The Forking Tuner.
 """
 
+import ctypes
+import functools
+import math
 import os
+import selectors
+import signal
 import sys
-from statistics import stdev
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from statistics import mean, median
 from typing import List, Callable, Tuple, Any, Generator, Sequence, Optional
+from typing import Dict, Hashable, Set, Union
 import logging
 
-__all__ = ['logger', 'nelder_mead', 'set_log_level']
+from . import channel, objectives, shared
+from .affinity import partition_cpus
+from .channel import fidelity, report
+from .checkpoint import Checkpoint
+from .hooks import Hooks
+from .trace import Trace, phases
+from .objectives import INFEASIBLE, Constraints, pareto_front
+from .shared import inherit, resources
+from .strategies import AdaptiveNelderMead, NelderMead, Strategy
+
+__all__ = ['INFEASIBLE', 'PENALTY', 'Simplex', 'Trial', 'TrialFailed',
+           'fidelity', 'inherit', 'logger', 'minimize', 'nelder_mead',
+           'pareto_front', 'relative_timeout', 'report', 'resources',
+           'set_log_level', 'tune']
 
 
 Callback = Callable[[List[List[Any]]], None]
-SimplexWithObjectives = List[List[List[float]]]
+Timeout = Union[None, float, Callable[[Optional[float]], Optional[float]]]
+Aggregate = Callable[[List[float]], float]
+Report = Tuple[float, Dict[str, Any], Dict[str, float], Dict[str, Any]]
+
+
+# the objective of trials that were killed, worse than any other
+PENALTY = math.inf
+
+# what to do with the trials whose child exited without reporting
+_FAILURE_POLICIES = ('penalty', 'retry', 'abort')
+
+_PR_SET_PDEATHSIG = 1
 
 
 logger = logging.getLogger(__name__)
@@ -39,161 +72,963 @@ _logger_handler.setLevel(logging.DEBUG)
 logger.addHandler(_logger_handler)
 
 
-def _make_simplex(vertex: Sequence,
-                  step_sizes: Optional[List[int]] = None) -> List[List[float]]:
-  dim = len(vertex)
-  step_sizes = step_sizes or [1 for i in range(dim)]
-  assert dim == len(step_sizes)
-  simplex = []
-  # vertex + unit vector along each axis
-  for i in range(dim):
-    vert = [float(v) for v in vertex]
-    vert[i] += step_sizes[i]
-    simplex.append(vert)
-  # and the original vertex
-  simplex.append([float(v) for v in vertex])
-  return simplex
+class Trial(object):
+  """
+  A forked evaluation of `vertex`, with the `objective` and the extra
+  `metrics` its child reported, at the given `fidelity`, if any.  `usage` is
+  what the child used, from its `rusage`: `user_time` and `system_time` in
+  seconds, `max_rss` in bytes, `voluntary_switches` and
+  `involuntary_switches`, and `minor_faults` and `major_faults`.
+  `violation` tells how much the trial violates the tuner's constraints, 0
+  when it's feasible.  `step` names the strategy's step the trial was for,
+  `repeat` whether it sampled an already evaluated vertex again to decide a
+  close call, and `child` has the `pid` of the child, the times it was
+  forked at, `start`, and finished at, `end`, and the `perf_counter_ns`
+  `timings` of its phases, see `phases`.  `replayed` trials come from a
+  checkpoint.
+  """
+
+  def __init__(self, vertex: List[float], objective: float,
+               metrics: Dict[str, Any],
+               fidelity: Optional[float] = None,
+               usage: Optional[Dict[str, float]] = None,
+               violation: float = 0.0, step: str = '', repeat: bool = False,
+               child: Optional[Dict[str, Any]] = None,
+               replayed: bool = False) -> None:
+    self.vertex = vertex
+    self.objective = objective
+    self.metrics = metrics
+    self.fidelity = fidelity
+    self.usage = usage or {}
+    self.violation = violation
+    self.step = step
+    self.repeat = repeat
+    self.child = child or {}
+    self.replayed = replayed
+
+  def values(self) -> Dict[str, Any]:
+    """
+    The `usage`, the reported `metrics` and the `objective`, by name.
+    """
+    return {**self.usage, **self.metrics, 'objective': self.objective}
 
+  def phases(self) -> Dict[str, int]:
+    """
+    The nanoseconds the trial spent in each of its phases, see
+    `trace.phases`.
+    """
+    return phases(self.child.get('timings', {}))
 
-def _do_fork() -> Tuple[bool, Any]:
+  def __repr__(self) -> str:
+    return f'Trial({self.vertex}, {self.objective}, {self.metrics})'
+
+
+class Simplex(list):
+  """
+  The `[vertex, objective]` pairs passed to the tuner's callback, best
+  first, with the run's counters in `stats`: the number of forked `trials` and
+  the `cache_hits` and `cache_misses` of the trial cache, the `trials`
+  forked since the previous callback, and the `pareto` front of the feasible
+  trials so far, if the tuner keeps one.
+  """
+
+  def __init__(self, pairs: List[List[Any]], stats: Dict[str, int],
+               trials: List[Trial],
+               pareto: Optional[List[Trial]] = None) -> None:
+    super().__init__(pairs)
+    self.stats = stats
+    self.trials = trials
+    self.pareto = pareto or []
+
+
+class TrialFailed(RuntimeError):
+  """
+  A trial child exited without reporting an objective, e.g. it crashed, and
+  the failure policy is to abort the run.
+  """
+
+
+def _die_with_parent(parent: int) -> None:
+  # have the kernel kill the child when the tuner dies, however it dies, so
+  # that no trial outlives it, on Linux
+  try:
+    prctl = ctypes.CDLL(None, use_errno=True).prctl
+  except AttributeError:
+    return
+  prctl(_PR_SET_PDEATHSIG, signal.SIGKILL)
+  if os.getppid() != parent:
+    # the tuner died before the call
+    os._exit(1)
+
+
+def _do_fork(cpus: Optional[Set[int]] = None) -> Tuple[bool, Any]:
+  # don't let the child flush what the parent has buffered so far
+  sys.stdout.flush()
+  sys.stderr.flush()
   r, w = os.pipe()
+  parent = os.getpid()
   pid = os.fork()
 
   # parent
   if pid > 0:
     os.close(w)
-    read = os.fdopen(r)
-    line = None
-    for line in read:
-      pass
-    return (True, float(line.strip()))
+    return (True, (pid, r))
 
   # child
   os.close(r)
-  write = os.fdopen(w, 'w')
-  sys.stdout = write
+  _die_with_parent(parent)
+  if cpus:
+    os.sched_setaffinity(0, cpus)
+  channel._open(w)
   return (False, None)
 
 
-def _centroid(simplex: SimplexWithObjectives) -> List[float]:
-  sim = [s[1] for s in simplex]
-  points_count = len(sim) - 1
-  dim = len(sim[0])
-  ret = [0.0] * points_count
-  for i in range(points_count):
-    for j in range(dim):
-      ret[j] += sim[i][j]
-  for j in range(dim):
-    ret[j] /= points_count
-  return ret
+def _exit_child() -> None:
+  # the child's work ends with its iteration of the tuning loop; skip the rest
+  # of the script as well as the parent's exit handlers
+  sys.stdout.flush()
+  sys.stderr.flush()
+  os._exit(0)
 
 
-def _reflect(simplex: SimplexWithObjectives,
-             center: List[float]) -> List[float]:
-  return [2 * i - j for i, j in zip(center, simplex[-1][1])]
+def _trial_child(vertex: Any, number: int, fidelity: Optional[float],
+                 hooks: Sequence[Hooks]) -> Generator[Any, None, None]:
+  # the trial child's side of the tuner: hands its vertex to the tuning loop
+  # and exits once the loop is done with it
+  channel._fidelity = fidelity
+  for hook in hooks:
+    hook.on_trial_start(number, vertex)
+  channel._mark('start')
+  yield vertex
+  channel._mark('end')
+  for hook in reversed(hooks):
+    hook.on_trial_exit(number, vertex)
+  channel._send_timings()
+  _exit_child()
 
 
-def _expand(reflected: List[float], center: List[float]) -> List[float]:
-  return [i - j for i, j in zip(reflected, center)]
+def _usage(rusage: Any) -> Dict[str, float]:
+  # ru_maxrss is in kilobytes, except on macOS
+  scale = 1 if sys.platform == 'darwin' else 1024
+  return {'user_time': rusage.ru_utime,
+          'system_time': rusage.ru_stime,
+          'max_rss': rusage.ru_maxrss * scale,
+          'voluntary_switches': rusage.ru_nvcsw,
+          'involuntary_switches': rusage.ru_nivcsw,
+          'minor_faults': rusage.ru_minflt,
+          'major_faults': rusage.ru_majflt}
 
 
-def _contract(simplex: SimplexWithObjectives,
-              center: List[float]) -> List[float]:
-  return [0.5 * i + 0.5 * j for i, j in zip(center, simplex[-1][1])]
+def _format_usage(usage: Dict[str, float]) -> str:
+  if not usage:
+    return 'no usage'
+  return ('{user_time:.2f}s user, {system_time:.2f}s system, '
+          '{max_rss_mib:.0f} MiB max RSS, {voluntary_switches:.0f} voluntary '
+          'and {involuntary_switches:.0f} involuntary context switches, '
+          '{minor_faults:.0f} minor and {major_faults:.0f} major page faults'
+          ).format(max_rss_mib=usage['max_rss'] / 2 ** 20, **usage)
 
 
-def _shrink(simplex: SimplexWithObjectives) -> None:
-  for i in range(1, len(simplex)):
-    simplex[i][1] = [0.5 * i + 0.5 * j for i, j in
-                     zip(simplex[0][1], simplex[i][1])]
+def _read_reports(children: List[Tuple[int, int]],
+                  timeout: Optional[float] = None) -> List[Report]:
+  # read all the channels together until the children close them, killing
+  # those still running after `timeout` seconds, then reap all of them
+  deadline = None if timeout is None else time.monotonic() + timeout
+  data = [b''] * len(children)
+  ends = [0.0] * len(children)
+  closed = [0] * len(children)
+  try:
+    with selectors.DefaultSelector() as selector:
+      for index, (pid, r) in enumerate(children):
+        selector.register(r, selectors.EVENT_READ, index)
+      while selector.get_map():
+        remaining = None
+        if deadline is not None:
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            break
+        for key, _ in selector.select(remaining):
+          chunk = os.read(key.fd, 65536)
+          if chunk:
+            data[key.data] += chunk
+          else:
+            ends[key.data] = time.time()
+            closed[key.data] = time.perf_counter_ns()
+            selector.unregister(key.fd)
+      running = [key.data for key in selector.get_map().values()]
+  except BaseException:
+    # interrupted, e.g. by Ctrl-C: don't leave the children running
+    _kill_children(children)
+    raise
+  usages = []
+  statuses = []
+  reaped = []
+  for index, (pid, r) in enumerate(children):
+    os.close(r)
+    if index in running:
+      os.kill(pid, signal.SIGKILL)
+      ends[index] = time.time()
+      closed[index] = time.perf_counter_ns()
+      logger.info(f'killed trial child {pid} after {timeout} seconds')
+    _, status, rusage = os.wait4(pid, 0)
+    usages.append(_usage(rusage))
+    statuses.append(status)
+    reaped.append(time.perf_counter_ns())
+  reports = []  # type: List[Report]
+  for index, usage in enumerate(usages):
+    timings = dict(channel.parse_timings(data[index]), closed=closed[index],
+                   reaped=reaped[index])
+    child = dict(_exit_status(statuses[index]), pid=children[index][0],
+                 end=ends[index], timings=timings)
+    if index in running:
+      reports.append((PENALTY, {'timed_out': True}, usage, child))
+      continue
+    report = channel.parse_records(data[index])
+    if report is None:
+      logger.warning(f'trial child {child["pid"]} exited without reporting '
+                     f'an objective, with status {child["status"]} and '
+                     f'signal {child["signal"]}')
+      reports.append((PENALTY, {'failed': True}, usage, child))
+      continue
+    reports.append((report[0], report[1], usage, child))
+  return reports
 
 
-def nelder_mead(vertex: Sequence, step_sizes: Optional[List[int]] = None,
-                iterations: int = 200, threshold: float = 1e-2,
-                cb: Optional[Callback] = None) -> Generator:
+def _exit_status(status: int) -> Dict[str, Optional[int]]:
+  # the exit `status` of a child that exited, the `signal` that killed it
+  # otherwise
+  return {'status': os.WEXITSTATUS(status) if os.WIFEXITED(status) else None,
+          'signal': os.WTERMSIG(status) if os.WIFSIGNALED(status) else None}
+
+
+def _kill_children(children: List[Tuple[int, int]]) -> None:
+  # kills and reaps the children, and closes their channels
+  for pid, r in children:
+    os.close(r)
+    try:
+      os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:  # pragma: no cover
+      pass
+    os.waitpid(pid, 0)
+
+
+def _fork_batch(count: int, partitions: List[Optional[Set[int]]],
+                timeout: Optional[float] = None) -> Tuple[bool, Any]:
   """
-  The Nelder-Mead-based Forking Tuner.  See the project README.md or
-  `forking_tuner.examples` for details.
+  Forks `count` children that run concurrently, each pinned to its own
+  partition.  Returns `(True, reports)` in the parent once every child has
+  finished, or has been killed after `timeout` seconds, and `(False, index)`
+  in the child.  Each report is an `(objective, metrics, usage, child)`
+  tuple, where `child` has the child's `pid`, the times it was forked at,
+  `start`, and finished at, `end`, the `timings` of its phases, and its exit
+  `status`, or the `signal` that killed it.  A child that exited without
+  reporting, e.g. that crashed, gets the `PENALTY` objective and a `failed`
+  metric.  Every child is reaped, and killed if the parent is interrupted.
   """
-  VertexType = type(vertex)  # type: Any
+  start = time.time()
+  children = []  # type: List[Tuple[int, int]]
+  forks = []
   try:
-    VertexType = VertexType._make
-  except AttributeError:
-    pass
-  sim = _make_simplex(vertex, step_sizes)
-  # zip with objectives
-  simplex = [list(i) for i in zip([0.0] * len(sim), sim)]  # type: List
-  len_simplex = len(simplex)
-
-  # compute initial vertices' objectives
-  for index in range(len_simplex):
-    is_parent, value = _do_fork()
-    if not is_parent:
-      yield VertexType(simplex[index][1])
-      return
-    simplex[index][0] = value
-
-  # https://en.wikipedia.org/wiki/Nelder%E2%80%93Mead_method
-  for _ in range(iterations):
-    # 1. Order, check early termination
-    simplex = sorted(simplex)
-    typed_simplex = [[VertexType(v), o] for o, v in simplex]
-    if cb is not None:
-      cb(typed_simplex)
-    logger.info('simplexes with objectives:')
-    for vertex, objective in typed_simplex:
-      logger.info(f'\t{vertex}: {objective}')
-    if stdev([s[0] for s in simplex]) < threshold:
-      break
+    for index in range(count):
+      fork = time.perf_counter_ns()
+      is_parent, child = _do_fork(partitions[index])
+      if not is_parent:
+        return (False, index)
+      forks.append({'fork': fork, 'forked': time.perf_counter_ns()})
+      children.append(child)
+  except BaseException:
+    _kill_children(children)
+    raise
+  reports = _read_reports(children, timeout)
+  for (_, _, _, child), timings in zip(reports, forks):
+    child['start'] = start
+    child.setdefault('timings', {}).update(timings)
+  return (True, reports)
 
-    # 2. Compute centroid
-    center = _centroid(simplex)
 
-    # 3. Reflection
-    reflected = _reflect(simplex, center)
-    is_parent, value = _do_fork()
-    if not is_parent:
-      yield VertexType(reflected)
-      return
-    if value > simplex[0][0] and value < simplex[1][0]:
-      simplex[-1] = [value, reflected]
-      continue
+def relative_timeout(factor: float, offset: float = 0.0
+                     ) -> Callable[[Optional[float]], Optional[float]]:
+  """
+  A `trial_timeout` of `factor` times the best objective so far, which has
+  to be a duration in seconds, plus `offset` seconds for the trial's setup.
+  There's no timeout until the first objective is known.
+  """
+  def timeout(best: Optional[float]) -> Optional[float]:
+    return None if best is None else factor * best + offset
 
-    # 4. Expansion
-    if value < simplex[0][0]:
-      expanded = _expand(reflected, center)
-      is_parent, value_expanded = _do_fork()
-      if not is_parent:
-        yield VertexType(expanded)
-        return
-      if value_expanded < value:
-        simplex[-1] = [value_expanded, expanded]
-        continue
-      simplex[-1] = [value, reflected]
-      continue
+  return timeout
+
+
+def _trimmed_mean(samples: List[float]) -> float:
+  cut = len(samples) // 5
+  return mean(sorted(samples)[cut:len(samples) - cut])
+
+
+def _squares(samples: List[float]) -> float:
+  center = mean(samples)
+  return sum((i - center) ** 2 for i in samples)
+
+
+_AGGREGATES = {'median': median,
+               'trimmed': _trimmed_mean}  # type: Dict[str, Aggregate]
+
+
+def _pooled(sample: float) -> bool:
+  # killed and infeasible trials don't tell how noisy the objective is
+  return math.isfinite(sample) and sample < INFEASIBLE
+
+
+def _aggregate(aggregate: Union[str, Aggregate]) -> Aggregate:
+  if not isinstance(aggregate, str):
+    return aggregate
+  if aggregate not in _AGGREGATES:
+    raise ValueError(f'unknown aggregate {aggregate!r}')
+  return _AGGREGATES[aggregate]
+
+
+class _Evaluator(object):
+  """
+  Evaluates points in forked children, `len(partitions)` at a time.  With a
+  `cache_key`, points that canonicalize to an already evaluated key get the
+  stored objective back without forking; at most `cache_size` keys are kept,
+  least recently used first out, or all of them if `cache_size` is `None`.
+
+  Children still running `trial_timeout` seconds after the fork are killed
+  and get the `PENALTY` objective.  `trial_timeout` may also be a function of
+  the best objective so far, `None` before the first one, see
+  `relative_timeout`.
+
+  A point is sampled up to `repeats` times and its objective is the
+  `aggregate` of its samples, `'median'`, `'trimmed'` for the 20% trimmed
+  mean, or any function of the samples.  Sampling stops as soon as the
+  `confidence` interval, based on the noise pooled over every repeated point,
+  tells whether the point is better or worse than each of the objectives it
+  is evaluated `against`, so that clear wins and losses take one sample.
+
+  Points evaluated at a `fidelity` are cached apart from the others, and
+  their children get it back from `forking_tuner.fidelity()`.
+
+  Trials whose metrics or usage violate the `constraints` get a penalized
+  objective, see `objectives.penalize`.  With `pareto` metric names, the
+  `front` of the feasible trials that trade their objective off against
+  them is kept up to date.
+
+  With a `checkpoint` path, the trials are persisted after every batch, and
+  those already in the checkpoint are replayed from it rather than forked.
+
+  The `hooks` are called around every trial, see `hooks.Hooks`, and the
+  trials' `timings` get the time the tuner was `ready` to fork their batch.
+
+  The trials whose child exited without reporting an objective, e.g. that
+  crashed, get the `PENALTY` objective with the `'penalty'` policy of
+  `on_failure`, are forked again, up to `retries` times, with `'retry'`, or
+  raise `TrialFailed` with `'abort'`.
+
+  The evaluator is `exhausted` once `time_budget` seconds have passed since
+  it was created, or it has run `trial_budget` trials; the children still
+  running at the end of the time budget are killed like after a timeout.
+
+  Use as `values = yield from evaluator.evaluate(...)`: the children yield
+  their vertex to the caller's loop and exit once it's done, the parent gets
+  the objectives back.
+  """
+
+  def __init__(self, VertexType: Any, partitions: List[Optional[Set[int]]],
+               cache_key: Optional[Callable[[List[float]], Hashable]] = None,
+               cache_size: Optional[int] = 128,
+               trial_timeout: Timeout = None, repeats: int = 1,
+               aggregate: Union[str, Aggregate] = 'median',
+               confidence: float = 1.96, constraints: Constraints = None,
+               penalty: Optional[float] = None,
+               pareto: Optional[Sequence[str]] = None,
+               checkpoint: Optional[str] = None,
+               hooks: Sequence[Hooks] = (),
+               time_budget: Optional[float] = None,
+               trial_budget: Optional[int] = None,
+               on_failure: str = 'penalty', retries: int = 1) -> None:
+    if on_failure not in _FAILURE_POLICIES:
+      raise ValueError(f'unknown failure policy {on_failure!r}')
+    self.VertexType = VertexType
+    self.partitions = partitions
+    # how many points are evaluated at once
+    self.width = len(partitions)
+    self.cache_key = cache_key
+    self.cache_size = cache_size
+    self.trial_timeout = trial_timeout
+    self.repeats = repeats
+    self.aggregate = _aggregate(aggregate)
+    self.confidence = confidence
+    self.constraints = constraints
+    self.penalty = penalty
+    self.pareto = pareto
+    self.front = []  # type: List[Trial]
+    self.checkpoint = None  # type: Optional[Checkpoint]
+    if checkpoint is not None:
+      self.checkpoint = Checkpoint(checkpoint)
+    self.best = None  # type: Optional[float]
+    # the pooled sum of squared deviations of the repeated samples and its
+    # degrees of freedom
+    self._squares = 0.0
+    self._dof = 0
+    self.cache = OrderedDict()  # type: OrderedDict
+    self.stats = {'trials': 0, 'cache_hits': 0, 'cache_misses': 0}
+    self.trials = []  # type: List[Trial]
+    self.hooks = hooks
+    self.on_failure = on_failure
+    self.retries = retries
+    self.time_budget = time_budget
+    self.trial_budget = trial_budget
+    self._started = time.monotonic()
+    self._ready = time.perf_counter_ns()
+
+  def evaluate(self, points: List[List[float]], against: Sequence[float] = (),
+               fidelity: Optional[float] = None, step: str = ''
+               ) -> Generator[Any, None, Optional[List[float]]]:
+    # without a cache every point gets its own samples, even duplicates
+    keys = list(range(len(points)))  # type: List[Hashable]
+    if self.cache_key is not None:
+      keys = [self.cache_key(point) for point in points]
+      if fidelity is not None:
+        keys = [(fidelity, key) for key in keys]
+    point_of = dict(zip(keys, points))
+    samples = {}  # type: Dict[Hashable, List[float]]
+    misses = []  # type: List[Hashable]
+    for key in keys:
+      if key in samples or key in misses:
+        self.stats['cache_hits'] += 1
+      elif key in self.cache:
+        self.cache.move_to_end(key)
+        samples[key] = self.cache[key]
+        self.stats['cache_hits'] += 1
+      else:
+        misses.append(key)
+    if self.cache_key is not None:
+      self.stats['cache_misses'] += len(misses)
+
+    values = yield from self._fork([point_of[key] for key in misses],
+                                   fidelity, step)
+    if values is None:
+      return None
+    for key, value in zip(misses, values):
+      samples[key] = [value]
+    # sample again until the comparisons with `against` are decided
+    while True:
+      undecided = [key for key in samples
+                   if not self._decided(samples[key], against)]
+      if not undecided:
+        break
+      values = yield from self._fork([point_of[key] for key in undecided],
+                                     fidelity, step, repeat=True)
+      if values is None:
+        return None
+      for key, value in zip(undecided, values):
+        self._add_sample(samples[key], value)
+
+    if self.cache_key is not None:
+      for key in samples:
+        self.cache[key] = samples[key]
+        self.cache.move_to_end(key)
+        if self.cache_size is not None and len(self.cache) > self.cache_size:
+          self.cache.popitem(last=False)
+    return [self.aggregate(samples[key]) for key in keys]
+
+  def noise(self) -> Optional[float]:
+    """
+    The pooled standard deviation of the repeated samples, if any.
+    """
+    if not self._dof:
+      return None
+    return math.sqrt(self._squares / self._dof)
+
+  def resolution(self) -> float:
+    """
+    The standard error of an objective sampled `repeats` times, 0 until the
+    noise is known.
+    """
+    noise = self.noise()
+    return 0.0 if noise is None else noise / math.sqrt(self.repeats)
+
+  def _decided(self, samples: List[float], against: Sequence[float]) -> bool:
+    if len(samples) >= self.repeats or not against:
+      return True
+    if not all(_pooled(s) for s in samples):
+      return True
+    noise = self.noise()
+    if noise is None:
+      return False
+    value = self.aggregate(samples)
+    margin = self.confidence * noise / math.sqrt(len(samples))
+    return all(abs(value - i) > margin for i in against)
+
+  def _add_sample(self, samples: List[float], value: float) -> None:
+    if _pooled(value):
+      self._squares -= _squares(samples)
+      samples.append(value)
+      self._squares += _squares(samples)
+      self._dof += 1
+    else:
+      samples.append(value)
 
-    # 5. Contraction
-    contracted = _contract(simplex, center)
-    is_parent, value = _do_fork()
+  def _fork(self, points: List[List[float]], fidelity: Optional[float] = None,
+            step: str = '', repeat: bool = False
+            ) -> Generator[Any, None, Optional[List[float]]]:
+    values = []  # type: List[float]
+    width = self.width
+    for start in range(0, len(points), width):
+      batch = points[start:start + width]
+      result = None
+      if self.checkpoint is not None:
+        result = self.checkpoint.replay(batch, fidelity)
+      replayed = result is not None
+      if result is None:
+        numbers = list(range(self.stats['trials'],
+                             self.stats['trials'] + len(batch)))
+        is_parent, result = yield from self._run(batch, fidelity, numbers)
+        if not is_parent:
+          return None
+        is_parent, result = yield from self._supervise(batch, fidelity,
+                                                       numbers, result)
+        if not is_parent:
+          return None
+        for _, _, _, child in result:
+          child.setdefault('timings', {}).setdefault('ready', self._ready)
+        if self.checkpoint is not None:
+          self.checkpoint.record(batch, fidelity, result)
+      first = self.stats['trials']
+      self.stats['trials'] += len(batch)
+      for number, (point, (value, metrics, usage, child)) in \
+          enumerate(zip(batch, result), first):
+        trial = Trial(point, value, metrics, fidelity, usage, step=step,
+                      repeat=repeat, child=child, replayed=replayed)
+        self.trials.append(trial)
+        logger.info(f'trial {point}: {value}, {_format_usage(usage)}')
+        logger.debug(f'trial {point} phases, in ns: {dict(trial.phases())}')
+        if value < PENALTY:
+          trial.violation = objectives.violation(trial.values(),
+                                                 self.constraints)
+          if math.isinf(trial.violation):
+            logger.warning(f'trial {point} is missing a metric of the '
+                           f'constraints on {sorted(self.constraints or {})}')
+        if value < PENALTY and not trial.violation:
+          if self.best is None or value < self.best:
+            self.best = value
+          if self.pareto is not None:
+            self.front = pareto_front(self.front + [trial], self._tradeoff)
+        values.append(objectives.penalize(value, trial.violation,
+                                          self.penalty))
+        for hook in self.hooks:
+          hook.on_trial_end(number, trial)
+      self._ready = time.perf_counter_ns()
+    return values
+
+  def _run(self, batch: List[List[float]], fidelity: Optional[float],
+           numbers: List[int]) -> Generator[Any, Any, Tuple[bool, Any]]:
+    # evaluates a batch, the trials `numbers`, see `_fork_batch`, the
+    # children yield their vertex
+    is_parent, result = _fork_batch(len(batch), self.partitions,
+                                    self._timeout())
     if not is_parent:
-      yield VertexType(contracted)
-      return
-    if value < simplex[-1][0]:
-      simplex[-1] = [value, contracted]
-      continue
+      yield from _trial_child(self.VertexType(batch[result]), numbers[result],
+                              fidelity, self.hooks)
+    return is_parent, result
 
-    # 6. Shrink
-    _shrink(simplex)
-    for i in range(1, len(simplex)):
-      is_parent, value = _do_fork()
+  def _supervise(self, batch: List[List[float]], fidelity: Optional[float],
+                 numbers: List[int], reports: List[Report]
+                 ) -> Generator[Any, Any, Tuple[bool, Any]]:
+    # applies the failure policy to the failed trials of a batch, which keep
+    # their number when they're retried
+    reports = list(reports)
+    retries = self.retries if self.on_failure == 'retry' else 0
+    for _ in range(retries):
+      failed = [i for i, r in enumerate(reports) if r[1].get('failed')]
+      if not failed:
+        break
+      logger.warning(f'retrying {len(failed)} failed trials')
+      is_parent, result = yield from self._run([batch[i] for i in failed],
+                                               fidelity,
+                                               [numbers[i] for i in failed])
       if not is_parent:
-        yield VertexType(simplex[i][1])
-        return
-      simplex[i][0] = value
+        return is_parent, result
+      for i, retried in zip(failed, result):
+        reports[i] = retried
+    vertices = [batch[i] for i, r in enumerate(reports) if r[1].get('failed')]
+    if vertices and self.on_failure == 'abort':
+      raise TrialFailed(f'the trials of {vertices} exited without reporting '
+                        f'an objective')
+    return True, reports
+
+  def _tradeoff(self, trial: Trial) -> List[float]:
+    values = trial.values()
+    return [trial.objective] + [values[name] for name in self.pareto or ()]
+
+  def exhausted(self) -> bool:
+    """
+    Whether the time or trial budget has been spent.
+    """
+    if self.trial_budget is not None and \
+       self.stats['trials'] >= self.trial_budget:
+      return True
+    remaining = self._remaining()
+    return remaining is not None and remaining <= 0
+
+  def _remaining(self) -> Optional[float]:
+    if self.time_budget is None:
+      return None
+    return self._started + self.time_budget - time.monotonic()
+
+  def _timeout(self) -> Optional[float]:
+    timeout = self.trial_timeout
+    if callable(timeout):
+      timeout = timeout(self.best)
+    remaining = self._remaining()
+    if remaining is not None:
+      # the trials still running once the budget is spent are cut short
+      timeout = max(0.0, remaining if timeout is None
+                    else min(timeout, remaining))
+    return timeout
+
+
+def _timed_call(objective: Callable[..., Any], vertex: Any
+                ) -> Tuple[Any, Dict[str, Any]]:
+  # calls `objective`, in this process or in an executor's worker, returning
+  # what it returned and a `child` with the times of the call
+  start, ns = time.time(), time.perf_counter_ns()
+  result = objective(vertex)
+  return result, {'start': start, 'end': time.time(),
+                  'timings': {'start': ns, 'end': time.perf_counter_ns()}}
+
+
+class _CallEvaluator(_Evaluator):
+  """
+  An `_Evaluator` that calls `objective` with the points, as `VertexType`s,
+  in this process, or on `executor`, up to `parallel` of them at once,
+  instead of forking children.  The objective returns the objective of its
+  point, or an `(objective, metrics)` pair, and gets the `fidelity` as a
+  keyword argument if there's one.
+  """
+
+  def __init__(self, objective: Callable[..., Any],
+               executor: Optional[Executor], VertexType: Any, parallel: int,
+               *args: Any, **kw: Any) -> None:
+    super().__init__(VertexType, [None] * parallel, *args, **kw)
+    self.objective = objective
+    self.executor = executor
+
+  def _run(self, batch: List[List[float]], fidelity: Optional[float],
+           numbers: List[int]) -> Generator[Any, Any, Tuple[bool, Any]]:
+    # nothing is forked, nothing to yield
+    yield from ()
+    objective = self.objective
+    if fidelity is not None:
+      objective = functools.partial(objective, fidelity=fidelity)
+    call = functools.partial(_timed_call, objective)
+    vertices = [self.VertexType(point) for point in batch]
+    if self.executor is None:
+      results = [call(vertex) for vertex in vertices]
+    else:
+      results = list(self.executor.map(call, vertices))
+    reports = []  # type: List[Report]
+    for result, child in results:
+      value, metrics = result if isinstance(result, tuple) else (result, {})
+      reports.append((float(value), dict(metrics), {}, child))
+    return (True, reports)
+
+
+def _vertex_type(vertex_type: Any) -> Any:
+  # namedtuples are built from an iterable with `_make`
+  try:
+    return vertex_type._make
+  except AttributeError:
+    return vertex_type
+
+
+def _partitions(parallel: int) -> List[Optional[Set[int]]]:
+  # the CPUs of each of the `parallel` concurrent children, unpinned when
+  # there are fewer CPUs than children
+  if parallel <= 1:
+    return [None]
+  try:
+    return list(partition_cpus(parallel))
+  except ValueError as e:
+    logger.warning(f'running {parallel} trials at once without pinning '
+                   f'them: {e}')
+    return [None] * parallel
+
+
+def tune(strategy: Strategy, vertex_type: Any = list,
+         cb: Optional[Callback] = None, parallel: int = 1,
+         cache_key: Optional[Callable[[List[float]], Hashable]] = None,
+         cache_size: Optional[int] = 128, trial_timeout: Timeout = None,
+         repeats: int = 1, aggregate: Union[str, Aggregate] = 'median',
+         confidence: float = 1.96,
+         setup: Optional[Callable[[], Any]] = None,
+         constraints: Constraints = None, penalty: Optional[float] = None,
+         pareto: Optional[Sequence[str]] = None,
+         checkpoint: Optional[str] = None,
+         trace: Optional[str] = None,
+         hooks: Sequence[Hooks] = (),
+         time_budget: Optional[float] = None,
+         trial_budget: Optional[int] = None, on_failure: str = 'penalty',
+         retries: int = 1) -> Generator:
+  """
+  The Forking Tuner driving any search `strategy`, see
+  `forking_tuner.strategies`.  Each point the strategy asks for is yielded
+  to the tuning loop, as a `vertex_type`, in a forked child; once the
+  strategy is done, or the budget is spent, the best point is yielded to the
+  loop in the parent.  `cb` gets the strategy's ranking, as a `Simplex`,
+  after every iteration.  The other arguments are those of `nelder_mead`.
+  """
+  VertexType = _vertex_type(vertex_type)
+  partitions = _partitions(parallel)
+  if strategy.constrained and cache_key is None:
+    # remember every visited configuration
+    cache_key, cache_size = tuple, None
+  evaluator = _Evaluator(VertexType, partitions, cache_key, cache_size,
+                         trial_timeout, repeats, aggregate, confidence,
+                         constraints, penalty, pareto, checkpoint, hooks,
+                         time_budget, trial_budget, on_failure, retries)
+  tracer = None if trace is None else Trace(trace)
+  shared._setup(setup)
+  try:
+    done = yield from _search(strategy, evaluator, VertexType, cb, tracer)
+  finally:
+    # the children never get here, they exit after their trial
+    shared._teardown()
+    if tracer is not None:
+      tracer.close()
+  if not done:
+    return
 
   # parent cleanup
-  yield VertexType(simplex[0][1])
-  return
+  if pareto is not None:
+    logger.info(f'pareto front of the objective and {", ".join(pareto)}:')
+    for trial in evaluator.front:
+      logger.info(f'\t{VertexType(trial.vertex)}: {evaluator._tradeoff(trial)}')
+  best = strategy.best()
+  if best is not None:
+    yield VertexType(best[0])
+
+
+def _search(strategy: Strategy, evaluator: _Evaluator, VertexType: Any,
+            cb: Optional[Callback], tracer: Optional[Trace]
+            ) -> Generator[Any, Any, bool]:
+  # ask the strategy for points and tell it their objectives until it's done,
+  # `False` in the children
+  iteration = strategy.iteration
+  while True:
+    strategy.resolution = evaluator.resolution()
+    batch = strategy.ask()
+    if strategy.iteration != iteration:
+      iteration = strategy.iteration
+      ranking = Simplex([[VertexType(v), o] for v, o in strategy.ranking()],
+                        dict(evaluator.stats), evaluator.trials,
+                        list(evaluator.front))
+      evaluator.trials = []
+      if cb is not None:
+        cb(ranking)
+      logger.info('iteration %(iteration)d, ranking with objectives '
+                  '(%(trials)d trials, %(cache_hits)d cache hits, '
+                  '%(cache_misses)d misses):',
+                  dict(evaluator.stats, iteration=iteration))
+      for vertex, objective in ranking:
+        logger.info(f'\t{vertex}: {objective}')
+    if batch is None:
+      break
+    if evaluator.exhausted():
+      logger.info(f'stopping after {evaluator.stats["trials"]} trials, the '
+                  f'budget is spent')
+      break
+    logger.debug(f'{batch.step}: evaluating {len(batch.points)} points')
+    done = len(evaluator.trials)
+    values = yield from evaluator.evaluate(batch.points, batch.against,
+                                           batch.fidelity, batch.step)
+    if values is None:
+      return False
+    # cache hits don't count towards the strategy's patience
+    strategy.trials = evaluator.stats['trials']
+    if tracer is not None:
+      for trial in evaluator.trials[done:]:
+        if not trial.replayed:
+          tracer.write(trial, tuple(trial.vertex) in strategy.clamped)
+    strategy.tell(values)
+  return True
+
+
+def _nelder_mead(vertex: Sequence, step_sizes: Optional[Sequence[float]],
+                 iterations: int, threshold: float,
+                 bounds: Optional[Sequence[Tuple[float, float]]],
+                 lattice: Optional[Sequence[float]],
+                 patience: Optional[int], restarts: int, adaptive: bool,
+                 full_shrink: bool) -> NelderMead:
+  if adaptive:
+    return AdaptiveNelderMead(vertex, step_sizes, iterations, threshold,
+                              bounds, lattice, patience, restarts,
+                              full_shrink)
+  return NelderMead(vertex, step_sizes, iterations, threshold, bounds,
+                    lattice, patience, restarts)
+
+
+def nelder_mead(vertex: Sequence, step_sizes: Optional[List[int]] = None,
+                iterations: int = 200, threshold: float = 1e-2,
+                cb: Optional[Callback] = None,
+                parallel: int = 1,
+                cache_key: Optional[Callable[[List[float]], Hashable]] = None,
+                cache_size: Optional[int] = 128,
+                trial_timeout: Timeout = None, repeats: int = 1,
+                aggregate: Union[str, Aggregate] = 'median',
+                confidence: float = 1.96,
+                bounds: Optional[Sequence[Tuple[float, float]]] = None,
+                lattice: Optional[Sequence[float]] = None,
+                setup: Optional[Callable[[], Any]] = None,
+                constraints: Constraints = None,
+                penalty: Optional[float] = None,
+                pareto: Optional[Sequence[str]] = None,
+                checkpoint: Optional[str] = None,
+                trace: Optional[str] = None,
+                hooks: Sequence[Hooks] = (),
+                patience: Optional[int] = None, restarts: int = 0,
+                time_budget: Optional[float] = None,
+                trial_budget: Optional[int] = None, adaptive: bool = False,
+                full_shrink: bool = True, on_failure: str = 'penalty',
+                retries: int = 1) -> Generator:
+  """
+  The Nelder-Mead-based Forking Tuner.  See the project README.md or
+  `forking_tuner.examples` for details.
+
+  With `parallel` above 1, the vertices that do not depend on each other,
+  i.e. the initial simplex and the shrunk vertices, are evaluated by up to
+  `parallel` concurrent children, each pinned to its own disjoint set of CPUs.
+  With more children than CPUs this process may run on, they aren't pinned,
+  and a warning is logged.
+
+  With a `cache_key`, vertices that canonicalize to the same key, e.g. the
+  same integer knobs once rounded, are only forked once; the `cache_size`
+  most recently used keys are kept, or all of them if it's `None`.
+
+  Children still running `trial_timeout` seconds after the fork are killed
+  and their vertex gets the `PENALTY` objective.  It may also be a function
+  of the best objective so far, see `relative_timeout`.
+
+  With `repeats` above 1, close calls between vertices are sampled again, up
+  to `repeats` times, until the `confidence` interval of their `aggregate`
+  objective decides them.
+
+  `bounds`, a `(low, high)` pair per dimension, and `lattice`, a step per
+  dimension, 0 for a continuous one, restrict the vertices to the feasible
+  configurations; every visited one is then cached and never forked twice.
+
+  `setup` runs once in the parent before the first trial, e.g. to load a
+  dataset or generate inputs; the children get what it returns from
+  `forking_tuner.resources()`, and large arrays passed through
+  `forking_tuner.inherit()` without copying them.  The objects that exist by
+  then are frozen out of the garbage collector to keep them shared.
+
+  `constraints` limit the metrics the children report, or their usage, see
+  `Trial`, by name: `{'max_rss': 8 * 2 ** 30}` for an upper limit, or a
+  `(low, high)` pair.  Infeasible vertices rank after all the feasible ones,
+  the least infeasible first, or with a `penalty`, get their objective
+  increased by `penalty` times their relative violation.  With `pareto`
+  metric names, the callback also gets the feasible trials that are not
+  dominated on the objective and those metrics, in `Simplex.pareto`.
+
+  With a `checkpoint` path, every completed trial is persisted there,
+  atomically.  Running the tuner again with the same arguments replays those
+  trials instead of forking them, and resumes at the step it was interrupted
+  at.
+
+  With a `trace` path, a JSON record of every trial is appended to it as
+  soon as the trial completes, see `python -m forking_tuner.trace`.
+
+  The `hooks`, see `forking_tuner.hooks`, are called around every trial,
+  e.g. `hooks.Profile` to profile the children.  Every trial's `child` has
+  the `perf_counter_ns` timestamps of its phases, from the tuner's own work
+  to the fork, the child's setup, the workload, and the child's reaping, see
+  `Trial.phases`.
+
+  The search stalls when the best objective hasn't improved for `patience`
+  trials, or the simplex has become degenerate, and restarts around the best
+  vertex with a fresh simplex, half as large every time, up to `restarts`
+  times, see `strategies.NelderMead`.  Whatever the search's progress, the
+  tuner stops after `time_budget` seconds, killing the trials still running
+  then, or `trial_budget` trials, and yields the best vertex so far.
+
+  With dozens of knobs, `adaptive` runs `strategies.AdaptiveNelderMead`,
+  whose steps adapt to the dimension; `full_shrink=False` then has a shrink
+  cost a single trial, rather than one per dimension.
+
+  Every child is reaped, its exit `status`, or the `signal` that killed it,
+  recorded in its trial's `child`, and killed if the tuner dies or is
+  interrupted.  A child that exits without reporting, e.g. that crashes, gets
+  the `PENALTY` objective with the default `on_failure='penalty'`, is forked
+  again, up to `retries` times, with `'retry'`, or raises `TrialFailed` with
+  `'abort'`.
+  """
+  strategy = _nelder_mead(vertex, step_sizes, iterations, threshold, bounds,
+                          lattice, patience, restarts, adaptive, full_shrink)
+  yield from tune(strategy, type(vertex), cb, parallel, cache_key,
+                  cache_size, trial_timeout, repeats, aggregate, confidence,
+                  setup, constraints, penalty, pareto, checkpoint, trace,
+                  hooks, time_budget, trial_budget, on_failure, retries)
+
+
+def minimize(objective: Callable[..., Any], vertex: Sequence,
+             step_sizes: Optional[List[int]] = None, iterations: int = 200,
+             threshold: float = 1e-2, cb: Optional[Callback] = None,
+             executor: Optional[Executor] = None,
+             parallel: Optional[int] = None,
+             cache_key: Optional[Callable[[List[float]], Hashable]] = None,
+             cache_size: Optional[int] = 128, repeats: int = 1,
+             aggregate: Union[str, Aggregate] = 'median',
+             confidence: float = 1.96,
+             bounds: Optional[Sequence[Tuple[float, float]]] = None,
+             lattice: Optional[Sequence[float]] = None,
+             constraints: Constraints = None,
+             penalty: Optional[float] = None,
+             pareto: Optional[Sequence[str]] = None,
+             checkpoint: Optional[str] = None,
+             trace: Optional[str] = None,
+             patience: Optional[int] = None, restarts: int = 0,
+             time_budget: Optional[float] = None,
+             trial_budget: Optional[int] = None, adaptive: bool = False,
+             full_shrink: bool = True) -> Optional[Tuple[Any, float]]:
+  """
+  The Nelder-Mead search of `nelder_mead`, calling `objective` with every
+  vertex instead of forking a child for it, for workloads that can be
+  reconfigured at runtime, e.g. a batch or pool size, and where forking
+  isn't safe: threads, notebooks, multithreaded services.  `objective`
+  returns the vertex's objective, or an `(objective, metrics)` pair.
+
+  Without an `executor`, the vertices are evaluated one at a time in this
+  process.  With a `concurrent.futures` executor, they are evaluated by its
+  warm workers, up to `parallel` at once; a `ProcessPoolExecutor` needs a
+  picklable `objective`.  `parallel` defaults to the CPU count, which is
+  that of a `ProcessPoolExecutor`'s workers by default; set it to the
+  executor's worker count otherwise, vertices beyond it wait for a worker.
+
+  The other arguments are those of `nelder_mead`.  Returns the best vertex
+  and its objective.
+  """
+  strategy = _nelder_mead(vertex, step_sizes, iterations, threshold, bounds,
+                          lattice, patience, restarts, adaptive, full_shrink)
+  VertexType = _vertex_type(type(vertex))
+  if parallel is None:
+    parallel = 1 if executor is None else os.cpu_count() or 1
+  if strategy.constrained and cache_key is None:
+    cache_key, cache_size = tuple, None
+  evaluator = _CallEvaluator(objective, executor, VertexType, parallel,
+                             cache_key, cache_size, None, repeats, aggregate,
+                             confidence, constraints, penalty, pareto,
+                             checkpoint, (), time_budget, trial_budget)
+  tracer = None if trace is None else Trace(trace)
+  try:
+    # nothing is forked, so nothing is yielded
+    for _ in _search(strategy, evaluator, VertexType, cb, tracer):
+      pass  # pragma: no cover
+  finally:
+    if tracer is not None:
+      tracer.close()
+  best = strategy.best()
+  return None if best is None else (VertexType(best[0]), best[1])
 
 
 def set_log_level(level):
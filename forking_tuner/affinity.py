@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+CPU placement helpers for forking-tuner.
+"""
+
+import itertools
+import os
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+__all__ = ['partition_cpus', 'place', 'placement_space', 'set_placement']
+
+
+_CPU_PATH = '/sys/devices/system/cpu'
+_NODE_PATH = '/sys/devices/system/node'
+
+
+def _parse_cpulist(text: str) -> List[int]:
+  cpus = []  # type: List[int]
+  for part in text.strip().split(','):
+    if not part:
+      continue
+    low, _, high = part.partition('-')
+    cpus.extend(range(int(low), int(high or low) + 1))
+  return cpus
+
+
+def _read_int(path: str, default: int = 0) -> int:
+  try:
+    with open(path) as f:
+      return int(f.read())
+  except (OSError, ValueError):
+    return default
+
+
+def _numa_nodes() -> List[List[int]]:
+  try:
+    names = os.listdir(_NODE_PATH)
+  except OSError:
+    return []
+  nodes = []
+  for name in sorted((n for n in names
+                      if n.startswith('node') and n[4:].isdigit()),
+                     key=lambda n: int(n[4:])):
+    with open(os.path.join(_NODE_PATH, name, 'cpulist')) as f:
+      nodes.append(_parse_cpulist(f.read()))
+  return nodes
+
+
+def _cpu_key(cpu: int, node_of: dict) -> Tuple[int, int, int, int]:
+  # NUMA node, socket, physical core, then the logical CPU, so that SMT
+  # siblings end up next to each other
+  topology = os.path.join(_CPU_PATH, f'cpu{cpu}', 'topology')
+  return (node_of.get(cpu, 0),
+          _read_int(os.path.join(topology, 'physical_package_id')),
+          _read_int(os.path.join(topology, 'core_id'), cpu),
+          cpu)
+
+
+def _online_cpus() -> List[int]:
+  """
+  The online CPUs of the whole machine, whether or not this process may run
+  on them.
+  """
+  try:
+    with open(os.path.join(_CPU_PATH, 'online')) as f:
+      return _parse_cpulist(f.read())
+  except OSError:
+    return list(range(os.cpu_count() or 1))
+
+
+def _allowed_cpus(cpus: Optional[Iterable[int]] = None
+                  ) -> List[Tuple[Tuple[int, int, int, int], int]]:
+  """
+  The CPUs this process may run on, or `cpus`, with their `_cpu_key`, in its
+  order.
+  """
+  if cpus is None:
+    cpus = os.sched_getaffinity(0)
+  node_of = {cpu: i for i, node in enumerate(_numa_nodes()) for cpu in node}
+  return sorted((_cpu_key(cpu, node_of), cpu) for cpu in cpus)
+
+
+def _sockets(cpus: Optional[Iterable[int]] = None) -> List[List[List[int]]]:
+  """
+  The CPUs this process may run on, or `cpus`, as the logical CPUs of each
+  core, by socket, or NUMA node of a socket with sub-NUMA clustering.
+  """
+  sockets = OrderedDict()  # type: OrderedDict
+  for (node, socket, core, _), cpu in _allowed_cpus(cpus):
+    cores = sockets.setdefault((node, socket), OrderedDict())
+    cores.setdefault(core, []).append(cpu)
+  return [list(cores.values()) for cores in sockets.values()]
+
+
+def place(count: int, scatter: bool = False, sockets: Optional[int] = None,
+          smt: bool = True) -> Set[int]:
+  """
+  Picks `count` of the CPUs this process may run on, all of them if there
+  are fewer, on at most `sockets` sockets.  Compact placement fills a
+  core's SMT siblings, then a socket's cores, before moving on to the next
+  one; `scatter` spreads the CPUs across the sockets in turn, and across the
+  cores of a socket before using their siblings.  Without `smt`, only one
+  CPU per core is used.
+  """
+  domains = _sockets()[:sockets] if sockets else _sockets()
+  if not smt:
+    domains = [[core[:1] for core in cores] for cores in domains]
+  if scatter:
+    # each socket's CPUs ordered by their rank among their core's siblings
+    spread = [[cpu for siblings in itertools.zip_longest(*cores)
+               for cpu in siblings if cpu is not None] for cores in domains]
+    order = [cpu for cpus in itertools.zip_longest(*spread)
+             for cpu in cpus if cpu is not None]
+  else:
+    order = [cpu for cores in domains for core in cores for cpu in core]
+  return set(order[:max(count, 1)])
+
+
+def placement_space() -> Tuple[List[Tuple[int, int]], List[int]]:
+  """
+  The `bounds` and `lattice` of the placement dimensions `set_placement`
+  takes, for the CPUs this process may run on: the CPU count, compact or
+  scatter, the socket count, and whether to use SMT siblings.
+  """
+  sockets = _sockets()
+  cpus = sum(len(core) for cores in sockets for core in cores)
+  return [(1, cpus), (0, 1), (1, len(sockets)), (0, 1)], [1, 1, 1, 1]
+
+
+def set_placement(params: Sequence[float]) -> Set[int]:
+  """
+  Pins this process to the CPUs `place` picks for `params`: the CPU count,
+  1 to scatter them, 0 to keep them compact, the socket count, and 1 to use
+  SMT siblings, e.g. the last dimensions of a vertex, see `placement_space`.
+  Returns the CPUs.
+  """
+  cpus = place(int(params[0]), params[1] >= 0.5, max(int(params[2]), 1),
+               params[3] >= 0.5)
+  os.sched_setaffinity(0, cpus)
+  return cpus
+
+
+def partition_cpus(count: int) -> List[Set[int]]:
+  """
+  Splits the CPUs this process may run on into `count` disjoint, equally
+  sized sets.  CPUs are grouped by NUMA node, socket and core so that a set
+  never shares a core with another when the sizes allow it.  Left-over CPUs
+  are not handed out, keeping the sets comparable.
+  """
+  cpus = [cpu for _, cpu in _allowed_cpus()]
+  size = len(cpus) // count
+  if size < 1:
+    raise ValueError(f'cannot split {len(cpus)} CPUs into {count} sets')
+  return [set(cpus[i * size:(i + 1) * size]) for i in range(count)]
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+An asyncio driver of the tuner, for services that tune from an event loop.
+
+Forking the event loop's process would hand the whole loop to every child,
+so here a trial is a coroutine function of the vertex, that typically runs
+the workload in a subprocess, see `run`, and returns its objective, or an
+`(objective, metrics)` pair.  Trials are awaited without blocking the loop,
+several tuning sessions can run concurrently, and cancelling a session
+cancels its trials in flight, which kill their subprocesses.
+
+    async def trial(vertex):
+      status, output = await aio.run(['./bench'], env=knobs(vertex))
+      return parse(output)
+
+    best, objective = await aio.tune(NelderMead([28, 2], [8, 1]), trial)
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from typing import Sequence, Tuple
+
+from . import PENALTY, Callback, Report, Trial, _Evaluator, _search
+from . import _vertex_type
+from .hooks import Hooks
+from .strategies import Strategy
+from .trace import Trace
+
+__all__ = ['run', 'trials', 'tune']
+
+
+async def run(command: Sequence[str], env: Optional[Dict[str, str]] = None,
+              timeout: Optional[float] = None) -> Tuple[Optional[int], str]:
+  """
+  Runs `command` with `env` in its own session, returning its exit status
+  and its output, both streams.  The status is `None` if it had to be
+  killed, with all of its children, after `timeout` seconds, with the
+  output up to then.  If the caller is cancelled, the command is killed as
+  well.
+  """
+  process = await asyncio.create_subprocess_exec(*command, env=env,
+                                                 stdout=subprocess.PIPE,
+                                                 stderr=subprocess.STDOUT,
+                                                 start_new_session=True)
+  stdout = process.stdout
+  assert stdout is not None
+  output = bytearray()
+
+  async def read() -> None:
+    # chunk by chunk, to keep what was read when timed out
+    while True:
+      chunk = await stdout.read(65536)
+      if not chunk:
+        break
+      output.extend(chunk)
+    await process.wait()
+
+  try:
+    await asyncio.wait_for(read(), timeout)
+  except asyncio.TimeoutError:
+    await _kill(process)
+    output.extend(await stdout.read())
+    return None, output.decode(errors='replace')
+  except asyncio.CancelledError:
+    await _kill(process)
+    raise
+  return process.returncode, output.decode(errors='replace')
+
+
+async def _kill(process: Any) -> None:
+  try:
+    os.killpg(process.pid, signal.SIGKILL)
+  except ProcessLookupError:  # pragma: no cover
+    pass
+  await process.wait()
+
+
+class _Batch(object):
+  """
+  The points `_AsyncEvaluator` hands up to the driver to evaluate.
+  """
+
+  def __init__(self, points: List[List[float]],
+               fidelity: Optional[float]) -> None:
+    self.points = points
+    self.fidelity = fidelity
+
+
+class _AsyncEvaluator(_Evaluator):
+  """
+  An `_Evaluator` that yields the batches to evaluate to its driver, which
+  awaits their trials and sends their reports back.
+  """
+
+  def _run(self, batch: List[List[float]], fidelity: Optional[float],
+           numbers: List[int]) -> Any:
+    reports = yield _Batch(batch, fidelity)
+    return True, reports
+
+
+class _Collect(Hooks):
+
+  def __init__(self) -> None:
+    self.trials = []  # type: List[Trial]
+
+  def on_trial_end(self, number: int, trial: Any) -> None:
+    self.trials.append(trial)
+
+
+async def _trial(trial: Callable[..., Any], vertex: Any,
+                 fidelity: Optional[float], timeout: Optional[float]
+                 ) -> Report:
+  start, ns = time.time(), time.perf_counter_ns()
+  kw = {} if fidelity is None else {'fidelity': fidelity}
+  call = trial(vertex, **kw)
+  try:
+    result = await asyncio.wait_for(call, timeout)
+  except asyncio.TimeoutError:
+    result = (PENALTY, {'timed_out': True})
+  value, metrics = result if isinstance(result, tuple) else (result, {})
+  child = {'start': start, 'end': time.time(),
+           'timings': {'start': ns, 'end': time.perf_counter_ns()}}
+  return float(value), dict(metrics), {}, child
+
+
+async def _evaluate(trial: Callable[..., Any], evaluator: _AsyncEvaluator,
+                    batch: _Batch) -> List[Report]:
+  # the trials of a batch, concurrently, all of them cancelled and awaited
+  # before an error or a cancellation propagates
+  timeout = evaluator._timeout()
+  tasks = [asyncio.ensure_future(_trial(trial, evaluator.VertexType(point),
+                                        batch.fidelity, timeout))
+           for point in batch.points]
+  try:
+    return await asyncio.gather(*tasks)
+  finally:
+    for task in tasks:
+      task.cancel()
+    await asyncio.wait(tasks)
+
+
+async def trials(strategy: Strategy, trial: Callable[..., Any],
+                 vertex_type: Any = list, cb: Optional[Callback] = None,
+                 parallel: int = 1, **kw: Any) -> AsyncIterator[Trial]:
+  """
+  Drives `strategy` with `trial`, a coroutine function of a `vertex_type`
+  point, and of its `fidelity` as a keyword argument when the strategy asks
+  for one, up to `parallel` of them at once, yielding every `Trial` as its
+  batch completes.  `cb` gets the strategy's ranking after every iteration.
+  The other keyword arguments are those of `forking_tuner.tune`, except the
+  fork-only `setup` and `hooks`; `trial_timeout` cancels the trials still
+  running after that many seconds and gives them the `PENALTY` objective.
+  """
+  trace = kw.pop('trace', None)
+  VertexType = _vertex_type(vertex_type)
+  if strategy.constrained and 'cache_key' not in kw:
+    # remember every visited configuration
+    kw.update(cache_key=tuple, cache_size=None)
+  collect = _Collect()
+  evaluator = _AsyncEvaluator(VertexType, [None] * parallel, hooks=[collect],
+                              **kw)
+  tracer = None if trace is None else Trace(trace)
+  search = _search(strategy, evaluator, VertexType, cb, tracer)
+  try:
+    reports = None  # type: Optional[List[Report]]
+    while True:
+      try:
+        batch = search.send(reports)
+      except StopIteration:
+        batch = None
+      for done in collect.trials:
+        yield done
+      collect.trials = []
+      if batch is None:
+        break
+      reports = await _evaluate(trial, evaluator, batch)
+  finally:
+    search.close()
+    if tracer is not None:
+      tracer.close()
+
+
+async def tune(strategy: Strategy, trial: Callable[..., Any],
+               vertex_type: Any = list, cb: Optional[Callback] = None,
+               parallel: int = 1, **kw: Any) -> Optional[Tuple[Any, float]]:
+  """
+  Drives `strategy` with `trial` to the end, see `trials`, and returns the
+  best point, as a `vertex_type`, and its objective.
+  """
+  async for _ in trials(strategy, trial, vertex_type, cb, parallel, **kw):
+    pass
+  best = strategy.best()
+  return None if best is None else (_vertex_type(vertex_type)(best[0]),
+                                    best[1])
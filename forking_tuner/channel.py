@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+The result channel trial children report their objectives over.
+
+Each report is a fixed-size header, the objective as a double and the length
+of the extra metrics, followed by the extra metrics encoded as JSON.  The
+child's stdout is left alone.  Once the trial is over, the child sends its
+own timings in a last record, flagged in its length.
+"""
+
+import json
+import os
+import struct
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+__all__ = ['fidelity', 'in_trial', 'report']
+
+
+# the objective and the length of the JSON-encoded extra metrics
+_HEADER = struct.Struct('<dI')
+
+# the length flag of the record of the child's timings
+_TIMINGS = 1 << 31
+
+# the write end of the channel, only set in trial children
+_fd = None  # type: Optional[int]
+
+# the fidelity the trial child is asked to evaluate its point at
+_fidelity = None  # type: Optional[float]
+
+# the `perf_counter_ns` timestamps of the trial child's phases
+_timings = {}  # type: Dict[str, int]
+
+
+def _open(fd: int) -> None:
+  # called in the child right after the fork
+  global _fd, _timings
+  _fd = fd
+  _timings = {'child': time.perf_counter_ns()}
+
+
+def _write(fd: int, value: float, payload: bytes, flag: int = 0) -> None:
+  header = _HEADER.pack(float(value), len(payload) | flag)
+  record = memoryview(header + payload)
+  while record:
+    record = record[os.write(fd, record):]
+
+
+def _mark(phase: str) -> None:
+  # timestamps the start of a phase of the trial child
+  _timings[phase] = time.perf_counter_ns()
+
+
+def _send_timings() -> None:
+  # called in the child once its trial is over, right before it exits
+  if _fd is not None:
+    _write(_fd, 0.0, json.dumps(_timings).encode(), _TIMINGS)
+
+
+def report(value: float, **extra_metrics: Any) -> float:
+  """
+  Reports the trial's objective `value`, and any JSON-serializable
+  `extra_metrics`, to the tuner.  The last report of a trial wins.  Outside of
+  a trial child, e.g. when the tuner runs the best vertex in the parent, this
+  does nothing.  Returns `value`.
+  """
+  if _fd is not None:
+    payload = json.dumps(extra_metrics).encode() if extra_metrics else b''
+    _write(_fd, value, payload)
+  return value
+
+
+def in_trial() -> bool:
+  """
+  Whether this process is a trial child, rather than the tuner.
+  """
+  return _fd is not None
+
+
+def fidelity(default: Optional[float] = None) -> Optional[float]:
+  """
+  The fidelity the tuner asks the current trial to be evaluated at, e.g. a
+  number of benchmark batches, or `default` outside of a multi-fidelity
+  search.
+  """
+  return default if _fidelity is None else _fidelity
+
+
+def _records(data: bytes) -> Iterator[Tuple[float, bytes, bool]]:
+  # the complete records in `data`, as `(value, payload, timings)`
+  offset = 0
+  while offset + _HEADER.size <= len(data):
+    value, length = _HEADER.unpack_from(data, offset)
+    offset += _HEADER.size
+    timings = bool(length & _TIMINGS)
+    length &= ~_TIMINGS
+    if offset + length > len(data):
+      break
+    yield value, data[offset:offset + length], timings
+    offset += length
+
+
+def parse_records(data: bytes) -> Optional[Tuple[float, Dict[str, Any]]]:
+  """
+  Returns the last complete report in `data` as `(objective,
+  extra_metrics)`, or `None` if there is none.
+  """
+  record = None
+  for value, payload, timings in _records(data):
+    if not timings:
+      record = (value, json.loads(payload.decode()) if payload else {})
+  return record
+
+
+def parse_timings(data: bytes) -> Dict[str, int]:
+  """
+  Returns the timings the child sent in `data`, empty if it didn't.
+  """
+  for _, payload, timings in _records(data):
+    if timings:
+      return json.loads(payload.decode())
+  return {}
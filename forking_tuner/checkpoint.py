@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Checkpoints of tuning runs.
+
+A checkpoint is the list of the trials forked so far, in order, one JSON
+line per trial after a header line, appended as they complete.  Given the
+same arguments, the search strategies and the tuner make the same decisions
+from the same objectives, so a run resumes at the exact step it was
+interrupted at by replaying those trials instead of forking them again.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+from .trace import read_trace
+
+__all__ = ['Checkpoint']
+
+
+# the reports of a batch of trials, see `_fork_batch`
+Reports = List[Tuple[float, Dict[str, Any], Dict[str, float], Dict[str, Any]]]
+
+_VERSION = 2
+
+logger = logging.getLogger('forking_tuner')
+
+
+class Checkpoint(object):
+  """
+  The trials of a run, appended to `path` after every batch, and replayed
+  from it when the run is resumed.
+  """
+
+  def __init__(self, path: str) -> None:
+    self.path = path
+    self.trials = []  # type: List[Dict[str, Any]]
+    # how many of the trials have been replayed, `None` once the run has
+    # diverged from the checkpoint
+    self.replayed = 0  # type: Optional[int]
+    # whether the file only has the trials recorded so far, once it's been
+    # rewritten without those the run diverged from
+    self.rewritten = False
+    if os.path.exists(path):
+      with open(path) as f:
+        records = list(read_trace(f))
+      if not records or records[0].get('version') != _VERSION:
+        raise ValueError(f'unsupported checkpoint version in {path}')
+      self.trials = records[1:]
+      logger.info(f'resuming from {len(self.trials)} trials in {path}')
+
+  def replay(self, points: List[List[float]],
+             fidelity: Optional[float] = None) -> Optional[Reports]:
+    """
+    The reports of the next trials, if they were checkpointed for the same
+    `points` and `fidelity`, `None` otherwise.
+    """
+    if self.replayed is None:
+      return None
+    trials = self.trials[self.replayed:self.replayed + len(points)]
+    if not trials:
+      return None
+    if len(trials) < len(points) or \
+       [t['vertex'] for t in trials] != [list(p) for p in points] or \
+       any(t['fidelity'] != fidelity for t in trials):
+      logger.warning(f'the run diverged from {self.path} after '
+                     f'{self.replayed} trials, discarding the rest')
+      del self.trials[self.replayed:]
+      self.replayed = None
+      return None
+    self.replayed += len(trials)
+    return [(t['objective'], t['metrics'], t['usage'], t['child'])
+            for t in trials]
+
+  def record(self, points: List[List[float]], fidelity: Optional[float],
+             reports: Reports) -> None:
+    """
+    Appends the trials of a batch to the checkpoint, and syncs it.
+    """
+    self.replayed = None
+    trials = [{'vertex': list(point), 'fidelity': fidelity,
+               'objective': objective, 'metrics': metrics, 'usage': usage,
+               'child': child}
+              for point, (objective, metrics, usage, child)
+              in zip(points, reports)]
+    if not self.rewritten:
+      # once per run, drop the trials the run diverged from, and a last one
+      # cut short by a crash
+      partial = f'{self.path}.partial'
+      with open(partial, 'w') as f:
+        self._write(f, [{'version': _VERSION}] + self.trials)
+      os.replace(partial, self.path)
+      self.rewritten = True
+    self.trials.extend(trials)
+    with open(self.path, 'a') as f:
+      self._write(f, trials)
+
+  @staticmethod
+  def _write(f: IO[str], records: List[Dict[str, Any]]) -> None:
+    f.write(''.join(json.dumps(r) + '\n' for r in records))
+    f.flush()
+    os.fsync(f.fileno())
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+The `forking-tuner` command: tunes the environment variables of an external
+program, e.g.
+
+    forking-tuner --param OMP_NUM_THREADS=1:56 --param KMP_BLOCKTIME=0:200:10 \\
+        --metric 'latency: ([0-9.]+) ms' -- ./serve --benchmark
+
+Each trial runs the command once, with the knobs of its vertex in its
+environment, and reads its objective from the program's output.
+"""
+
+import argparse
+import logging
+import os
+import re
+import signal
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple
+
+from . import PENALTY, report, set_log_level, tune
+from .channel import in_trial
+from .strategies import NelderMead
+
+__all__ = ['main']
+
+
+class Param(object):
+  """
+  A knob: the environment variable `name`, between `low` and `high`,
+  starting from `start`, in multiples of `step`, 0 for a continuous one.
+  """
+
+  def __init__(self, name: str, low: float, high: float,
+               start: Optional[float] = None, step: float = 1) -> None:
+    if low > high:
+      raise ValueError(f'{name}: {low} is above {high}')
+    self.name = name
+    self.low = low
+    self.high = high
+    self.start = (low + high) / 2 if start is None else start
+    self.step = step
+
+  def format(self, value: float) -> str:
+    if self.step and float(self.step).is_integer() and \
+       float(self.low).is_integer():
+      return str(int(round(value)))
+    return repr(float(value))
+
+
+def parse_param(spec: str) -> Param:
+  """
+  Parses `NAME=LOW:HIGH[:STEP[:START]]`, by default an integer knob starting
+  halfway between its bounds.
+  """
+  name, sep, values = spec.partition('=')
+  parts = values.split(':')
+  if not sep or not name or not 2 <= len(parts) <= 4:
+    raise argparse.ArgumentTypeError(f'{spec!r} is not '
+                                     'NAME=LOW:HIGH[:STEP[:START]]')
+  try:
+    numbers = [float(p) for p in parts]
+  except ValueError:
+    raise argparse.ArgumentTypeError(f'{spec!r} has a non-numeric value')
+  low, high = numbers[:2]
+  step = numbers[2] if len(numbers) > 2 else 1
+  start = numbers[3] if len(numbers) > 3 else None
+  try:
+    return Param(name, low, high, start, step)
+  except ValueError as e:
+    raise argparse.ArgumentTypeError(str(e))
+
+
+def extract(metric: Pattern, output: str) -> Optional[float]:
+  """
+  The value of the last match of `metric` in `output`, its first group if it
+  has one, `None` without a match.
+  """
+  value = None
+  for match in metric.finditer(output):
+    value = match.group(1 if metric.groups else 0)
+  try:
+    return None if value is None else float(value)
+  except ValueError:
+    return None
+
+
+def run(command: Sequence[str], env: Dict[str, str],
+        timeout: Optional[float] = None) -> Tuple[Optional[int], str]:
+  """
+  Runs `command` with `env`, returning its exit status and its output, both
+  streams.  The status is `None` if it had to be killed, with all of its
+  children, after `timeout` seconds.
+  """
+  process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.STDOUT,
+                             start_new_session=True)
+  try:
+    output, _ = process.communicate(timeout=timeout)
+  except subprocess.TimeoutExpired:
+    os.killpg(process.pid, signal.SIGKILL)
+    output, _ = process.communicate()
+    return None, output.decode(errors='replace')
+  return process.returncode, output.decode(errors='replace')
+
+
+def trial(params: List[Param], vertex: Sequence[float], command: List[str],
+          metric: Pattern, maximize: bool = False,
+          timeout: Optional[float] = None) -> Tuple[float, Dict[str, Any]]:
+  """
+  Runs the command for `vertex` and returns its objective, `PENALTY` if it
+  failed, timed out, or didn't print the metric, and extra metrics.
+  """
+  knobs = {p.name: p.format(v) for p, v in zip(params, vertex)}
+  status, output = run(command, dict(os.environ, **knobs), timeout)
+  value = extract(metric, output) if status == 0 else None
+  if value is None:
+    return PENALTY, {'status': status, 'output': output[-1000:]}
+  return -value if maximize else value, {'metric': value}
+
+
+def _parser() -> argparse.ArgumentParser:
+  parser = argparse.ArgumentParser(prog='forking-tuner',
+                                   description='Tunes the environment '
+                                   'variables of a command.',
+                                   usage='%(prog)s --param '
+                                   'NAME=LOW:HIGH[:STEP[:START]] ... '
+                                   '--metric REGEX [options] -- COMMAND '
+                                   '[ARG ...]')
+  parser.add_argument('--param', action='append', type=parse_param,
+                      required=True, dest='params',
+                      help='an environment variable to tune, between LOW and '
+                      'HIGH, in multiples of STEP, 1 by default, 0 for a '
+                      'continuous one, starting from START, halfway by '
+                      'default')
+  parser.add_argument('--metric', required=True, type=re.compile,
+                      help='a regular expression matching the objective in '
+                      'the output of the command, its first group if any')
+  parser.add_argument('--maximize', action='store_true',
+                      help='maximize the metric instead of minimizing it')
+  parser.add_argument('--timeout', type=float,
+                      help='seconds after which a run is killed')
+  parser.add_argument('--iterations', type=int, default=200)
+  parser.add_argument('--threshold', type=float, default=1e-2)
+  parser.add_argument('--repeats', type=int, default=1)
+  parser.add_argument('--parallel', type=int, default=1)
+  parser.add_argument('--patience', type=int,
+                      help='restart, or stop, after this many runs without '
+                      'improvement')
+  parser.add_argument('--restarts', type=int, default=0,
+                      help='how many times to restart a stalled search around '
+                      'the best configuration')
+  parser.add_argument('--time-budget', type=float,
+                      help='seconds after which to stop tuning')
+  parser.add_argument('--trial-budget', type=int,
+                      help='runs after which to stop tuning')
+  parser.add_argument('--trace', help='a JSONL file to append the trials to')
+  parser.add_argument('--checkpoint', help='a file to resume the run from')
+  parser.add_argument('-v', '--verbose', action='store_true')
+  parser.add_argument('command', nargs='+', help='the command to tune')
+  return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  """
+  The `forking-tuner` entry point.
+  """
+  args = _parser().parse_args(argv)
+  if args.verbose:
+    set_log_level(logging.INFO)
+  params = args.params  # type: List[Param]
+  # the children's runs are killed first, the tuner only kills the children
+  # that fail to report
+  trial_timeout = None if args.timeout is None else args.timeout + 10
+  strategy = NelderMead([p.start for p in params],
+                        [(p.high - p.low) / 4 or 1 for p in params],
+                        args.iterations, args.threshold,
+                        [(p.low, p.high) for p in params],
+                        [p.step for p in params], args.patience,
+                        args.restarts)
+  for vertex in tune(strategy, parallel=args.parallel,
+                     trial_timeout=trial_timeout, repeats=args.repeats,
+                     checkpoint=args.checkpoint, trace=args.trace,
+                     time_budget=args.time_budget,
+                     trial_budget=args.trial_budget):
+    # the tuner yields the best vertex to the parent once it's done
+    if not in_trial():
+      break
+    value, metrics = trial(params, vertex, args.command, args.metric,
+                           args.maximize, args.timeout)
+    report(value, **metrics)
+
+  best = strategy.best()
+  if best is None or best[1] >= PENALTY:
+    print('no run of the command printed the metric', file=sys.stderr)
+    return 1
+  print(' '.join(f'{p.name}={p.format(v)}' for p, v in zip(params, best[0])))
+  print(f'{args.metric.pattern}: {-best[1] if args.maximize else best[1]}')
+  return 0
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Distributed tuning: a coordinator runs the search strategy and dispatches
+its trials to workers on other machines, which fork them the same way the
+tuner does and send the reports back.
+
+    # on every node, with the tuning loop as usual
+    for vertex in distributed.worker(('coordinator', 7000)):
+      set_threading(vertex)
+      report(benchmark())
+
+    # on the coordinator
+    with distributed.Coordinator(('', 7000)) as coordinator:
+      best, objective = coordinator.tune(GridSearch([(1, 56), (1, 8)]))
+
+Workers connect over TCP, or a Unix socket given as a path, and may come
+and go: the trials of a worker that disconnects, or stops responding, are
+dispatched again to the others.  The messages are lines of JSON.
+"""
+
+import json
+import logging
+import os
+import selectors
+import socket
+import time
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
+from typing import Union
+
+from . import Callback, Report, _Evaluator, _fork_batch, _partitions
+from . import _search, _trial_child, _vertex_type, shared
+from .hooks import Hooks
+from .strategies import Strategy
+from .trace import Trace
+
+__all__ = ['Coordinator', 'worker']
+
+
+# a `(host, port)` pair, or the path of a Unix socket
+Address = Union[str, Tuple[str, int]]
+
+# the TCP keepalive probes of the workers' connections: idle seconds before
+# the first one, seconds between them, and how many go unanswered before
+# the connection is dropped
+_KEEPALIVE = (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 6))
+
+logger = logging.getLogger('forking_tuner')
+
+
+def _send(sock: socket.socket, message: Dict[str, Any]) -> None:
+  sock.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _family(address: Address) -> int:
+  return socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+
+class _Worker(object):
+  """
+  A connected worker, with the `slots` it evaluates trials in, once it has
+  said hello, the batch indices of its trials in flight, and the monotonic
+  time it's given up on by if they have a timeout.
+  """
+
+  def __init__(self, sock: socket.socket) -> None:
+    self.sock = sock
+    self.name = ''
+    self.slots = 0
+    self.buffer = b''
+    self.inflight = []  # type: List[int]
+    self.deadline = None  # type: Optional[float]
+
+  def messages(self, chunk: bytes) -> List[Dict[str, Any]]:
+    self.buffer += chunk
+    *lines, self.buffer = self.buffer.split(b'\n')
+    return [json.loads(line.decode()) for line in lines]
+
+
+class Coordinator(object):
+  """
+  Listens for workers at `address`, a `(host, port)` pair, port 0 for any,
+  or the path of a Unix socket, and dispatches the trials of its `tune`
+  runs to them; `address` is then the address actually listened at.
+  Closing the coordinator tells the workers to stop.
+
+  A worker whose trials haven't reported `grace` seconds past their trial
+  timeout is dropped, and its trials requeued, like one that disconnects;
+  TCP keepalive probes detect the workers that vanished between trials.
+  """
+
+  def __init__(self, address: Address, grace: float = 30.0) -> None:
+    self.grace = grace
+    self.listener = socket.socket(_family(address), socket.SOCK_STREAM)
+    if not isinstance(address, str):
+      self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    self.listener.bind(address)
+    self.listener.listen()
+    self.address = self.listener.getsockname()  # type: Any
+    self.selector = selectors.DefaultSelector()
+    self.selector.register(self.listener, selectors.EVENT_READ, None)
+    self.workers = []  # type: List[_Worker]
+
+  def __enter__(self) -> 'Coordinator':
+    return self
+
+  def __exit__(self, *exc_info: Any) -> None:
+    self.close()
+
+  def close(self) -> None:
+    for worker in list(self.workers):
+      try:
+        _send(worker.sock, {'type': 'done'})
+      except OSError:  # pragma: no cover
+        pass
+      self._drop(worker, [])
+    self.selector.close()
+    self.listener.close()
+    if isinstance(self.address, str):
+      os.unlink(self.address)
+
+  def tune(self, strategy: Strategy, vertex_type: Any = list,
+           cb: Optional[Callback] = None, **kw: Any
+           ) -> Optional[Tuple[Any, float]]:
+    """
+    Drives `strategy` to the end with the trials evaluated by the workers,
+    as many at once as the strategy asks for and they have slots, and
+    returns the best point, as a `vertex_type`, and its objective.  The
+    keyword arguments are those of `forking_tuner.tune`, except the ones
+    the workers take, `parallel`, `setup` and `hooks`.
+    """
+    trace = kw.pop('trace', None)
+    VertexType = _vertex_type(vertex_type)
+    if strategy.constrained and 'cache_key' not in kw:
+      # remember every visited configuration
+      kw.update(cache_key=tuple, cache_size=None)
+    evaluator = _Dispatcher(self, VertexType, [None], **kw)
+    tracer = None if trace is None else Trace(trace)
+    try:
+      # nothing is forked here, so nothing is yielded
+      for _ in _search(strategy, evaluator, VertexType, cb, tracer):
+        pass  # pragma: no cover
+    finally:
+      if tracer is not None:
+        tracer.close()
+    best = strategy.best()
+    return None if best is None else (VertexType(best[0]), best[1])
+
+  def run(self, points: List[List[float]], numbers: List[int],
+          fidelity: Optional[float], timeout: Optional[float]
+          ) -> List[Report]:
+    """
+    The reports of the trials of `points`, dispatched to the workers with
+    free slots, waiting for workers to connect if there are none.
+    """
+    reports = [None] * len(points)  # type: List[Optional[Report]]
+    pending = list(range(len(points)))
+    while pending or any(w.inflight for w in self.workers):
+      for worker in list(self.workers):
+        if pending and worker.slots and not worker.inflight:
+          indices, pending = pending[:worker.slots], pending[worker.slots:]
+          try:
+            _send(worker.sock, {'type': 'trials',
+                                'points': [points[i] for i in indices],
+                                'numbers': [numbers[i] for i in indices],
+                                'fidelity': fidelity, 'timeout': timeout})
+          except OSError:
+            self._drop(worker, pending, indices)
+            continue
+          worker.inflight = indices
+          worker.deadline = None
+          if timeout is not None:
+            worker.deadline = time.monotonic() + timeout + self.grace
+      for key, _ in self.selector.select(self._wait()):
+        if key.data is None:
+          self._accept()
+          continue
+        worker = key.data
+        try:
+          chunk = worker.sock.recv(65536)
+        except OSError:  # pragma: no cover
+          chunk = b''
+        if not chunk:
+          self._drop(worker, pending)
+          continue
+        for message in worker.messages(chunk):
+          if message['type'] == 'hello':
+            worker.name, worker.slots = message['name'], message['slots']
+            logger.info(f'worker {worker.name} joined with {worker.slots} '
+                        f'slots')
+          elif message['type'] == 'reports':
+            for index, report in zip(worker.inflight, message['reports']):
+              objective, metrics, usage, child = report
+              child['worker'] = worker.name
+              reports[index] = (objective, metrics, usage, child)
+            worker.inflight = []
+      now = time.monotonic()
+      for worker in list(self.workers):
+        if worker.inflight and worker.deadline is not None and \
+           worker.deadline <= now:
+          logger.warning(f'worker {worker.name} stopped responding')
+          self._drop(worker, pending)
+    return [r for r in reports if r is not None]
+
+  def _wait(self) -> Optional[float]:
+    # the seconds until the next worker is given up on, if any
+    deadlines = [w.deadline for w in self.workers
+                 if w.inflight and w.deadline is not None]
+    if not deadlines:
+      return None
+    return max(0.0, min(deadlines) - time.monotonic())
+
+  def _accept(self) -> None:
+    sock, _ = self.listener.accept()
+    if sock.family != socket.AF_UNIX:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+      for name, value in _KEEPALIVE:
+        if hasattr(socket, name):
+          sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+    worker = _Worker(sock)
+    self.workers.append(worker)
+    self.selector.register(sock, selectors.EVENT_READ, worker)
+
+  def _drop(self, worker: _Worker, pending: List[int],
+            indices: Sequence[int] = ()) -> None:
+    # requeues the worker's trials in flight, and those it was about to get
+    requeued = list(indices) + worker.inflight
+    if requeued:
+      logger.warning(f'worker {worker.name} left, requeueing '
+                     f'{len(requeued)} trials')
+    pending[:0] = requeued
+    worker.inflight = []
+    self.workers.remove(worker)
+    self.selector.unregister(worker.sock)
+    worker.sock.close()
+
+
+class _Dispatcher(_Evaluator):
+  """
+  An `_Evaluator` that has the `coordinator`'s workers evaluate its points,
+  all the points of a batch at once.
+  """
+
+  def __init__(self, coordinator: Coordinator, *args: Any,
+               **kw: Any) -> None:
+    super().__init__(*args, **kw)
+    self.coordinator = coordinator
+    self.width = 2 ** 31
+
+  def _run(self, batch: List[List[float]], fidelity: Optional[float],
+           numbers: List[int]) -> Generator[Any, Any, Tuple[bool, Any]]:
+    # nothing is forked, nothing to yield
+    yield from ()
+    return True, self.coordinator.run(batch, numbers, fidelity,
+                                      self._timeout())
+
+
+def _connect(address: Address, timeout: float) -> socket.socket:
+  # retries until the coordinator listens, for up to `timeout` seconds
+  deadline = time.monotonic() + timeout
+  while True:
+    sock = socket.socket(_family(address), socket.SOCK_STREAM)
+    try:
+      sock.connect(address)
+      return sock
+    except OSError:
+      sock.close()
+      if time.monotonic() > deadline:
+        raise
+      time.sleep(0.1)
+
+
+def worker(address: Address, parallel: int = 1, vertex_type: Any = list,
+           setup: Optional[Any] = None, hooks: Sequence[Hooks] = (),
+           connect_timeout: float = 60.0) -> Generator:
+  """
+  Connects to the coordinator at `address` and evaluates the trials it
+  sends, up to `parallel` at once, each pinned to its own set of CPUs, or
+  unpinned if there are fewer CPUs than that, until it closes.  Like
+  `forking_tuner.tune`, each trial's point is yielded to the tuning loop, as
+  a `vertex_type`, in a forked child, which reports its objective; nothing
+  is yielded in the worker itself.  `setup` and `hooks` are those of
+  `forking_tuner.tune`.
+  """
+  VertexType = _vertex_type(vertex_type)
+  partitions = _partitions(parallel)
+  shared._setup(setup)
+  try:
+    sock = _connect(address, connect_timeout)
+    with sock, sock.makefile('rb') as messages:
+      _send(sock, {'type': 'hello', 'name': f'{socket.gethostname()}:'
+                   f'{os.getpid()}', 'slots': parallel})
+      for line in messages:
+        ready = time.perf_counter_ns()
+        message = json.loads(line.decode())
+        if message['type'] == 'done':
+          break
+        points = message['points']
+        is_parent, result = _fork_batch(len(points), partitions,
+                                        message['timeout'])
+        if not is_parent:
+          # the coordinator sees the worker leave if it dies, even with this
+          # child still running
+          messages.close()
+          sock.close()
+          yield from _trial_child(VertexType(points[result]),
+                                  message['numbers'][result],
+                                  message['fidelity'], hooks)
+          return
+        for _, _, _, child in result:
+          # the coordinator's clock is another machine's
+          child['timings']['ready'] = ready
+        _send(sock, {'type': 'reports', 'reports': result})
+  finally:
+    shared._teardown()
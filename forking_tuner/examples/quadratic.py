@@ -21,16 +21,17 @@ A simple quadratic example that minimizes the `(x - 5) ** 2 + (x - 7) ** 2`
 function and provides sample callback usage..
 """
 
-from forking_tuner import nelder_mead
+from forking_tuner import nelder_mead, report
 
 
 # minimizes a quadratic function
 def main():
   # the callback will print the simplexes and their objectives at every step
   for attempt in nelder_mead([22, 2], [11, 1], threshold=1e-8, cb=print):
-    # the best attempt's objective value, will be close  to 0
-    print(f"Optimal parameters for (x - 5) ^ 2 + (y - 7) ^ 2 are: {attempt}.")
-    print((attempt[0] - 5) ** 2 + (attempt[1] - 7) ** 2)
+    objective = report((attempt[0] - 5) ** 2 + (attempt[1] - 7) ** 2)
+  # the last attempt is the best one, its objective value will be close to 0
+  print(f"Optimal parameters for (x - 5) ^ 2 + (y - 7) ^ 2 are: {attempt}.")
+  print(objective)
 
 
 if __name__ == '__main__':
@@ -19,16 +19,17 @@
 """
 The ResNet50 example.
 
-It will likely not converge due to the variance in clock-to-clock CPU usage.
+Each trial warms the model up until its prediction times settle, then reports
+their median.  Close calls between configurations are measured up to 3 times
+to cope with the variance in clock-to-clock CPU usage.
 
-You may wish to increase the number of predictions in the timeit loop, though
-that will increase the runtime considerably.
+You may wish to increase the number of sampled predictions, though that will
+increase the runtime considerably.
 """
 
 import logging
 import os
 import sys
-import timeit
 from collections import namedtuple
 
 try:
@@ -38,7 +39,8 @@ except ImportError:
   sys.exit(-1)
 
 
-from forking_tuner import nelder_mead, set_log_level
+from forking_tuner import inherit, nelder_mead, resources, set_log_level
+from forking_tuner.measure import measure
 from forking_tuner.tf import set_threading
 
 
@@ -57,17 +59,29 @@ def main():
 
   print("This will take a while...")
   set_log_level(logging.INFO)
+  # thread counts are integers between 1 and the number of CPUs, each of them
+  # is only measured once
+  cpus = os.cpu_count() or 1
+
+  def setup():
+    # the input batch is generated once, and read by every trial in place
+    return inherit(np.random.rand(32, 224, 224, 3))
+
   for attempt in nelder_mead(threading(22, 2), [11, 1], threshold=0.02,
-                             iterations=10):
+                             iterations=10, repeats=3,
+                             bounds=[(1, cpus), (1, cpus)], lattice=[1, 1],
+                             setup=setup):
     set_threading(attempt)
     # N.B. ResNet50 creation has to happen inside this loop because
     # 'forking-tuner' sets the threading model and that has to happen before any
     # tensors are instantiated
     res = ResNet50()
-    print(f"Optimal configuration: {int(attempt[0])} intra-op threads, "
-          f"{int(attempt[1])} inter-op threads.")
-    print(timeit.timeit(lambda: res.predict(np.random.rand(32, 224, 224, 3),
-                                            32), number=1))
+    images = resources()
+    elapsed = measure(lambda: res.predict(images, 32), samples=5, window=2,
+                      items=len(images)).median
+  print(f"Optimal configuration: {int(attempt[0])} intra-op threads, "
+        f"{int(attempt[1])} inter-op threads.")
+  print(elapsed)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Hooks around the tuner's trials, e.g. to profile the trial children.
+
+Trials are numbered from 0 in the order they're forked, so a child and the
+tuner agree on the number of a trial.
+"""
+
+import cProfile
+import os
+import tracemalloc
+from typing import Any
+
+__all__ = ['Hooks', 'Profile', 'TraceMalloc']
+
+
+class Hooks(object):
+  """
+  The hooks the tuner calls around every trial, pass instances to its
+  `hooks`.  `on_trial_start` and `on_trial_exit` run in the trial child,
+  right before its vertex is handed to the tuning loop and right after the
+  loop is done with it; `on_trial_end` runs in the tuner once the trial is
+  over, with its `Trial`, replayed ones included.
+  """
+
+  def on_trial_start(self, number: int, vertex: Any) -> None:
+    pass
+
+  def on_trial_exit(self, number: int, vertex: Any) -> None:
+    pass
+
+  def on_trial_end(self, number: int, trial: Any) -> None:
+    pass
+
+
+class Profile(Hooks):
+  """
+  Profiles every trial child with `cProfile`, dumping its statistics to
+  `trial-<number>.prof` in `directory`, see `pstats`.
+  """
+
+  def __init__(self, directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    # only ever enabled in the children, each of which has its own copy
+    self.profile = cProfile.Profile()
+
+  def on_trial_start(self, number: int, vertex: Any) -> None:
+    self.profile.enable()
+
+  def on_trial_exit(self, number: int, vertex: Any) -> None:
+    self.profile.disable()
+    self.profile.dump_stats(os.path.join(self.directory,
+                                         f'trial-{number}.prof'))
+
+
+class TraceMalloc(Hooks):
+  """
+  Traces the allocations of every trial child with `tracemalloc`, keeping
+  `frames` frames per allocation, and dumps a snapshot of those still
+  allocated at its end to `trial-<number>.tracemalloc` in `directory`, see
+  `tracemalloc.Snapshot.load`.
+  """
+
+  def __init__(self, directory: str, frames: int = 1) -> None:
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    self.frames = frames
+
+  def on_trial_start(self, number: int, vertex: Any) -> None:
+    tracemalloc.start(self.frames)
+
+  def on_trial_exit(self, number: int, vertex: Any) -> None:
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    snapshot.dump(os.path.join(self.directory, f'trial-{number}.tracemalloc'))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""
+Steady-state measurement of a trial's workload, in the trial child:
+
+    for threads in nelder_mead([22, 2], [11, 1]):
+      set_threading(threads)
+      model = ResNet50()
+      measure.measure(lambda: model.predict(images, 32), items=len(images))
+
+The workload is warmed up until its timings settle, e.g. once graphs are
+traced and memory touched, then sampled with `perf_counter_ns`, and the
+statistics of the samples are reported to the tuner.
+"""
+
+import logging
+import math
+import time
+from statistics import mean, median
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from . import channel
+
+__all__ = ['Measurement', 'measure', 'percentile', 'steady']
+
+
+# the statistics a measurement can report as the trial's objective
+_OBJECTIVES = ('mean', 'median', 'p95', 'p99', 'throughput')
+
+logger = logging.getLogger('forking_tuner')
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+  """
+  The `q`th percentile of `samples`, between 0 and 100, interpolated
+  linearly between the closest ranks.
+  """
+  ordered = sorted(samples)
+  rank = (len(ordered) - 1) * q / 100
+  low = math.floor(rank)
+  high = min(low + 1, len(ordered) - 1)
+  return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def steady(samples: Sequence[float], window: int, tolerance: float) -> bool:
+  """
+  Whether the last `samples` have settled: the medians of their last two
+  `window`s are within `tolerance` of each other, relative to the last one.
+  """
+  if window < 1 or len(samples) < 2 * window:
+    return False
+  previous = median(samples[-2 * window:-window])
+  last = median(samples[-window:])
+  return abs(previous - last) <= tolerance * last
+
+
+class Measurement(object):
+  """
+  The `samples` of a workload, in nanoseconds, each call processing `items`
+  items, taken once it `settled`, after `warmup` calls; its statistics are
+  in seconds, and its `throughput` in items per second.
+  """
+
+  def __init__(self, samples: List[int], items: float = 1, warmup: int = 0,
+               settled: bool = True) -> None:
+    if not samples:
+      raise ValueError('a measurement needs at least one sample')
+    self.samples = samples
+    self.items = items
+    self.warmup = warmup
+    self.settled = settled
+
+  def percentile(self, q: float) -> float:
+    return percentile(self.samples, q) / 1e9
+
+  @property
+  def mean(self) -> float:
+    return mean(self.samples) / 1e9
+
+  @property
+  def median(self) -> float:
+    return median(self.samples) / 1e9
+
+  @property
+  def p95(self) -> float:
+    return self.percentile(95)
+
+  @property
+  def p99(self) -> float:
+    return self.percentile(99)
+
+  @property
+  def throughput(self) -> float:
+    return self.items * len(self.samples) * 1e9 / (sum(self.samples) or 1)
+
+  def objective(self, name: str) -> float:
+    """
+    The statistic `name`, one of `mean`, `median`, `p95`, `p99` and
+    `throughput`, as an objective to minimize, i.e. the throughput negated.
+    """
+    if name not in _OBJECTIVES:
+      raise ValueError(f'unknown objective {name!r}')
+    value = getattr(self, name)
+    return -value if name == 'throughput' else value
+
+  def metrics(self) -> Dict[str, Any]:
+    """
+    The statistics, and how many calls were sampled and warmed up, as the
+    metrics of a report, e.g. to constrain the `p99` latency.
+    """
+    return {'mean': self.mean, 'median': self.median, 'p95': self.p95,
+            'p99': self.p99, 'throughput': self.throughput,
+            'samples': len(self.samples), 'warmup': self.warmup,
+            'settled': self.settled}
+
+  def __repr__(self) -> str:
+    return (f'Measurement({len(self.samples)} samples, median '
+            f'{self.median:.6f}s, p99 {self.p99:.6f}s, throughput '
+            f'{self.throughput:.2f}/s)')
+
+
+def _time(workload: Callable[[], Any]) -> int:
+  start = time.perf_counter_ns()
+  workload()
+  return time.perf_counter_ns() - start
+
+
+def measure(workload: Callable[[], Any], samples: Optional[int] = None,
+            warmup: int = 1, max_warmup: int = 100, window: int = 5,
+            tolerance: float = 0.05, items: float = 1,
+            max_time: Optional[float] = None, objective: str = 'median',
+            report: bool = True) -> Measurement:
+  """
+  Calls `workload` until its timings reach a steady state, then times it
+  `samples` more times, by default the trial's fidelity, see
+  `forking_tuner.fidelity`, or 30.
+
+  The warm-up takes at least `warmup` calls, and ends once the medians of the
+  last two `window`s of calls are within `tolerance` of each other, see
+  `steady`; the last window then counts as the first samples.  A workload
+  still unsettled after `max_warmup` calls is sampled anyway, and its
+  measurement flagged.  With `max_time`, both stop after that many seconds,
+  keeping at least one sample.
+
+  Each call processes `items` items, e.g. the size of a batch, for the
+  throughput.  The `objective` statistic, see `Measurement.objective`, and
+  all of them as metrics, are reported to the tuner unless `report` is
+  false.  Returns the `Measurement`.
+  """
+  if objective not in _OBJECTIVES:
+    raise ValueError(f'unknown objective {objective!r}')
+  if samples is None:
+    samples = int(channel.fidelity() or 30)
+  samples = max(samples, 1)
+  deadline = None if max_time is None else time.monotonic() + max_time
+
+  def expired() -> bool:
+    return deadline is not None and time.monotonic() >= deadline
+
+  timings = []  # type: List[int]
+  settled = max_warmup <= 0
+  while not settled and len(timings) < max_warmup and not expired():
+    timings.append(_time(workload))
+    settled = len(timings) >= warmup and steady(timings, window, tolerance)
+  if settled and timings:
+    # the settled window is sampled already
+    kept = timings[-min(window, samples):]
+  else:
+    if not settled:
+      logger.warning(f'the workload did not reach a steady state in '
+                     f'{len(timings)} calls')
+    kept = []
+  warmed = len(timings) - len(kept)
+  while len(kept) < samples and not (kept and expired()):
+    kept.append(_time(workload))
+  measurement = Measurement(kept, items, warmed, settled)
+  if report:
+    channel.report(measurement.objective(objective), **measurement.metrics())
+  return measurement
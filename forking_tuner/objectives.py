@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Constraints on, and trade-offs between, the metrics trials report.
+"""
+
+import math
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from typing import TypeVar, Union
+
+__all__ = ['INFEASIBLE', 'pareto_front']
+
+
+Constraint = Union[float, Tuple[float, float]]
+Constraints = Optional[Dict[str, Constraint]]
+T = TypeVar('T')
+
+
+# the objective of trials that violate a constraint, scaled by the violation,
+# so that they rank after every feasible one; floats near it are too far
+# apart to add small violations to it
+INFEASIBLE = 1e15
+
+
+def violation(metrics: Dict[str, Any], constraints: Constraints) -> float:
+  """
+  How much `metrics` violate the `constraints`, a limit per metric name,
+  either an upper limit or a `(low, high)` pair: the sum of the distances to
+  the limits, relative to the limits.  0 when they're all met, infinite
+  when a metric is missing, e.g. a trial that didn't report it.
+  """
+  total = 0.0
+  for name, limit in (constraints or {}).items():
+    if name not in metrics:
+      return math.inf
+    low, high = limit if isinstance(limit, tuple) else (-math.inf, limit)
+    value = metrics[name]
+    if value > high:
+      total += (value - high) / (abs(high) or 1.0)
+    elif value < low:
+      total += (low - value) / (abs(low) or 1.0)
+  return total
+
+
+def penalize(objective: float, violation: float,
+             penalty: Optional[float] = None) -> float:
+  """
+  The objective to rank an `objective` with a constraint `violation` by:
+  `INFEASIBLE` times one plus the violation without a `penalty`, so that
+  the feasible ones come first and the least infeasible ones after them, or
+  the objective plus `penalty` times the violation.
+  """
+  if not violation or not math.isfinite(objective):
+    return objective
+  if math.isinf(violation):
+    return math.inf
+  if penalty is None:
+    return INFEASIBLE * (1 + violation)
+  return objective + penalty * violation
+
+
+def _dominates(a: Sequence[float], b: Sequence[float]) -> bool:
+  return all(i <= j for i, j in zip(a, b)) and any(i < j for i, j in zip(a, b))
+
+
+def pareto_front(items: List[T], key: Callable[[T], Sequence[float]]
+                 ) -> List[T]:
+  """
+  The `items` whose `key`, a vector of values to minimize, isn't dominated
+  by another one's, i.e. no other item is at least as good on every value and
+  better on one, in their original order.
+  """
+  keys = [key(i) for i in items]
+  return [item for item, k in zip(items, keys)
+          if not any(_dominates(other, k) for other in keys)]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+OpenMP and BLAS utility configuration callbacks for forking-tuner.
+
+The runtimes read their environment variables when they are loaded, and
+those already loaded into the tuner process, e.g. by importing NumPy, are
+only told through their own API, through `ctypes`.
+"""
+
+import ctypes
+import os
+from typing import Any, List, Tuple
+
+__all__ = ['set_threading']
+
+
+# the environment variables the runtimes read when they are loaded
+_ENVIRONMENT = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+
+# the file name prefixes of the runtimes and the functions that set their
+# thread counts, the first one a runtime has is called
+_SETTERS = (('libgomp', ('omp_set_num_threads',)),
+            ('libiomp', ('omp_set_num_threads',)),
+            ('libomp', ('omp_set_num_threads',)),
+            ('libmkl_rt', ('MKL_Set_Num_Threads',)),
+            ('libopenblas', ('openblas_set_num_threads',
+                             'openblas_set_num_threads64_')),
+            ('libscipy_openblas', ('scipy_openblas_set_num_threads',
+                                   'scipy_openblas_set_num_threads64_')))
+
+_MAPS_PATH = '/proc/self/maps'
+
+
+def _loaded_libraries() -> List[str]:
+  """
+  The paths of the shared libraries mapped into this process, none where
+  there's no `/proc`.
+  """
+  try:
+    with open(_MAPS_PATH) as f:
+      lines = f.read().splitlines()
+  except OSError:
+    return []
+  paths = set()
+  for line in lines:
+    fields = line.split(None, 5)
+    if len(fields) == 6 and '.so' in os.path.basename(fields[5]):
+      paths.add(fields[5])
+  return sorted(paths)
+
+
+def _runtimes() -> List[Tuple[str, Any]]:
+  """
+  The loaded runtimes, as `(path, setter)` pairs.
+  """
+  runtimes = []
+  for path in _loaded_libraries():
+    name = os.path.basename(path)
+    functions = next((f for prefix, f in _SETTERS if name.startswith(prefix)),
+                     ())
+    if not functions:
+      continue
+    try:
+      library = ctypes.CDLL(path)
+    except OSError:
+      continue
+    setter = next((getattr(library, f) for f in functions
+                   if hasattr(library, f)), None)
+    if setter is not None:
+      runtimes.append((path, setter))
+  return runtimes
+
+
+def set_threading(params: List[float]) -> None:
+  """
+  Sets the OpenMP, MKL and OpenBLAS thread counts, of the runtimes loaded
+  later through the environment, and of those already loaded directly.
+
+  A forked child inherits the thread pools the tuner process started, and
+  GNU OpenMP's doesn't survive the fork, so the tuner process must not run a
+  parallel region before the trials are forked, and the children must call
+  this before they do.
+  """
+
+  threads = max([int(params[0]), 1])
+  for name in _ENVIRONMENT:
+    os.environ[name] = str(threads)
+  for _, setter in _runtimes():
+    setter(threads)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Tuning profiles: the best configuration found for a workload, stored per
+hardware fingerprint, to skip or shorten the search the next time the
+workload is tuned on the same, or a similar, machine.
+
+    store = profiles.ProfileStore()
+    for threads in profiles.nelder_mead(store, 'resnet50', [22, 2], [11, 1],
+                                        scaled=[True, True],
+                                        libraries=['tensorflow']):
+      ...
+
+On a machine with a profile, the stored configuration is yielded right
+away, without any trial; elsewhere, the search starts from the profile of
+the most similar machine, its thread counts scaled by the core counts, with
+a tight simplex, and its result is stored.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import math
+import os
+import platform
+import time
+from importlib import metadata
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
+
+from . import INFEASIBLE, _nelder_mead, _vertex_type, tune
+from .affinity import _numa_nodes, _online_cpus, _sockets
+from .channel import in_trial
+
+__all__ = ['ProfileStore', 'fingerprint', 'nelder_mead']
+
+
+Fingerprint = Dict[str, Any]
+
+_CPUINFO_PATH = '/proc/cpuinfo'
+_VERSION = 1
+# the step sizes of a warm start, relative to those of a cold one
+_WARM_STEP = 0.25
+
+logger = logging.getLogger('forking_tuner')
+
+
+def _cpu_model() -> str:
+  try:
+    with open(_CPUINFO_PATH) as f:
+      for line in f:
+        key, _, value = line.partition(':')
+        if key.strip() == 'model name':
+          return value.strip()
+  except OSError:
+    pass
+  return platform.processor() or platform.machine()
+
+
+def _version(library: str) -> Optional[str]:
+  try:
+    return metadata.version(library)
+  except metadata.PackageNotFoundError:
+    return None
+
+
+def fingerprint(libraries: Sequence[str] = ()) -> Fingerprint:
+  """
+  What the best configuration of a workload depends on, on this machine:
+  the CPU model, its online logical CPUs, their physical cores, sockets, the
+  most SMT siblings per core, the NUMA nodes, and the versions of the
+  `libraries`, distribution names, `None` if not installed.  It's the whole
+  machine's topology, the same whatever CPUs this process is restricted to.
+  """
+  sockets = _sockets(_online_cpus())
+  cores = [core for socket in sockets for core in socket]
+  return {'cpu': _cpu_model(),
+          'machine': platform.machine(),
+          'cpus': sum(len(core) for core in cores),
+          'cores': len(cores),
+          'sockets': len(sockets),
+          'smt': max((len(core) for core in cores), default=1),
+          'numa': len(_numa_nodes()) or 1,
+          'libraries': {name: _version(name) for name in libraries}}
+
+
+def _key(workload: str, fingerprint: Fingerprint) -> str:
+  canonical = json.dumps(fingerprint, sort_keys=True)
+  return f'{workload}/{hashlib.sha256(canonical.encode()).hexdigest()[:16]}'
+
+
+def _similarity(a: Fingerprint, b: Fingerprint) -> Tuple[Any, ...]:
+  # the same CPU and libraries first, then the same topology, then the
+  # closest core count
+  return (a['cpu'] == b['cpu'], a['libraries'] == b['libraries'],
+          a['smt'] == b['smt'], a['sockets'] == b['sockets'],
+          -abs(math.log(max(a['cores'], 1) / max(b['cores'], 1))))
+
+
+def _check_dimensions(workload: str, profile: Dict[str, Any],
+                      vertex: Sequence) -> None:
+  if len(profile['vertex']) != len(vertex):
+    raise ValueError(f'the profile of {workload} has '
+                     f'{len(profile["vertex"])} dimensions, its vertex '
+                     f'{len(vertex)}: tune it under another name, or remove '
+                     f'its profiles from the store')
+
+
+def _default_path() -> str:
+  home = os.path.join(os.path.expanduser('~'), '.cache')
+  cache = os.environ.get('XDG_CACHE_HOME') or home
+  return os.path.join(cache, 'forking-tuner', 'profiles.json')
+
+
+class ProfileStore(object):
+  """
+  The profiles of the workloads tuned on this and other machines, in the
+  JSON file at `path`, by default in the user's cache directory, e.g. on a
+  shared file system.  Each profile is the best `vertex` found for a
+  workload on a machine with a given fingerprint, and its `objective`.
+  """
+
+  def __init__(self, path: Optional[str] = None) -> None:
+    self.path = path or _default_path()
+
+  def _load(self) -> Dict[str, Dict[str, Any]]:
+    try:
+      with open(self.path) as f:
+        data = json.load(f)
+    except FileNotFoundError:
+      return {}
+    if data.get('version') != _VERSION:
+      raise ValueError(f'unsupported profile store version in {self.path}')
+    profiles = data['profiles']  # type: Dict[str, Dict[str, Any]]
+    return profiles
+
+  def get(self, workload: str, fingerprint: Fingerprint
+          ) -> Optional[Dict[str, Any]]:
+    """
+    The profile of `workload` on a machine with this exact `fingerprint`.
+    """
+    return self._load().get(_key(workload, fingerprint))
+
+  def nearest(self, workload: str, fingerprint: Fingerprint
+              ) -> Optional[Dict[str, Any]]:
+    """
+    The profile of `workload` on the machine most similar to `fingerprint`:
+    with the same CPU model, library versions, SMT and socket counts, in that
+    order, and the closest core count.
+    """
+    profiles = [p for p in self._load().values()
+                if p['workload'] == workload]
+    if not profiles:
+      return None
+    return max(profiles,
+               key=lambda p: _similarity(p['fingerprint'], fingerprint))
+
+  def save(self, workload: str, fingerprint: Fingerprint,
+           vertex: Sequence[float], objective: float) -> None:
+    """
+    Stores the best `vertex` of `workload` on a machine with `fingerprint`,
+    replacing its previous one, and atomically replaces the file.  The
+    machines sharing the file take turns, under a lock on `path.lock`, so
+    that none of them loses the profiles saved by the others meanwhile.
+    """
+    profile = {'workload': workload, 'fingerprint': fingerprint,
+               'vertex': [float(x) for x in vertex], 'objective': objective,
+               'time': time.time()}
+    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+    with open(f'{self.path}.lock', 'a') as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      profiles = self._load()
+      profiles[_key(workload, fingerprint)] = profile
+      partial = f'{self.path}.{platform.node()}.{os.getpid()}.partial'
+      with open(partial, 'w') as f:
+        json.dump({'version': _VERSION, 'profiles': profiles}, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+      os.replace(partial, self.path)
+
+  def warm_start(self, workload: str, fingerprint: Fingerprint,
+                 vertex: Sequence[float],
+                 step_sizes: Optional[Sequence[float]] = None,
+                 scaled: Sequence[bool] = ()
+                 ) -> Tuple[List[float], List[float]]:
+    """
+    Where to start searching for the best configuration of `workload` on a
+    machine with `fingerprint`, and with which step sizes: from the profile
+    of this machine or of the most similar one, with the dimensions flagged
+    in `scaled`, e.g. thread counts, scaled by the ratio of the core counts,
+    and a simplex a quarter the size of `step_sizes`; from `vertex` and
+    `step_sizes` without a profile.  Raises `ValueError` if the profile
+    doesn't have as many dimensions as `vertex`, e.g. once the workload's
+    search space changed.
+    """
+    steps = [float(s) for s in (step_sizes or [1] * len(vertex))]
+    profile = self.get(workload, fingerprint)
+    if profile is None:
+      profile = self.nearest(workload, fingerprint)
+    if profile is None:
+      return [float(x) for x in vertex], steps
+    _check_dimensions(workload, profile, vertex)
+    ratio = fingerprint['cores'] / max(profile['fingerprint']['cores'], 1)
+    start = [x * ratio if i < len(scaled) and scaled[i] else x
+             for i, x in enumerate(profile['vertex'])]
+    logger.info(f'warm start of {workload} from {start}, the profile of a '
+                f'{profile["fingerprint"]["cores"]}-core '
+                f'{profile["fingerprint"]["cpu"]}')
+    return start, [s * _WARM_STEP for s in steps]
+
+
+def nelder_mead(store: ProfileStore, workload: str, vertex: Sequence,
+                step_sizes: Optional[Sequence[float]] = None,
+                scaled: Sequence[bool] = (), reuse: bool = True,
+                libraries: Sequence[str] = (), iterations: int = 200,
+                threshold: float = 1e-2,
+                bounds: Optional[Sequence[Tuple[float, float]]] = None,
+                lattice: Optional[Sequence[float]] = None,
+                patience: Optional[int] = None, restarts: int = 0,
+                adaptive: bool = False, full_shrink: bool = True,
+                **kw: Any) -> Generator:
+  """
+  `forking_tuner.nelder_mead` for the `workload`, with the profiles of
+  `store`, on this machine's `fingerprint` with the `libraries`.  With a
+  profile for this machine and `reuse`, its vertex is yielded to the loop in
+  the parent right away, without any trial.  Otherwise, the search starts
+  from `store.warm_start`, scaling the `scaled` dimensions, and the best
+  vertex it finds, if feasible, is stored as this machine's profile before
+  it's yielded.  The keyword arguments are those of `forking_tuner.tune`.
+  """
+  VertexType = _vertex_type(type(vertex))
+  machine = fingerprint(libraries)
+  profile = store.get(workload, machine)
+  if reuse and profile is not None:
+    _check_dimensions(workload, profile, vertex)
+    logger.info(f'reusing the profile of {workload}: {profile["vertex"]}, '
+                f'{profile["objective"]}')
+    yield VertexType(profile['vertex'])
+    return
+
+  start, steps = store.warm_start(workload, machine, vertex, step_sizes,
+                                  scaled)
+  strategy = _nelder_mead(start, steps, iterations, threshold, bounds,
+                          lattice, patience, restarts, adaptive, full_shrink)
+  for item in tune(strategy, type(vertex), **kw):
+    if not in_trial():
+      # the best vertex, in the parent
+      best = strategy.best()
+      if best is not None and best[1] < INFEASIBLE:
+        store.save(workload, machine, best[0], best[1])
+    yield item
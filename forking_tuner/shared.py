@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Resources set up once in the tuner process and shared with every trial child.
+
+Forked children share the parent's memory copy-on-write, but CPython writes
+to every object it touches, to update its reference count, and its garbage
+collector writes to every tracked object it traverses, so pages end up
+copied anyway.  Large buffers are kept out of the object heap, in their own
+private memory mapping that the children inherit, and the objects that exist
+when the tuning starts are frozen out of the garbage collector's reach until
+it ends.
+"""
+
+import gc
+import mmap
+from typing import Any, Callable, Optional
+
+__all__ = ['inherit', 'resources']
+
+
+# what the `setup` hook returned
+_resources = None  # type: Any
+# whether `_setup` froze the objects, not its caller, and how many tuning
+# loops, e.g. a coordinator and a worker in the same process, are running
+_froze = False
+_depth = 0
+
+
+def resources() -> Any:
+  """
+  What the tuner's `setup` hook returned, in the parent as well as in the
+  trial children, or `None` without one.
+  """
+  return _resources
+
+
+def inherit(data: Any) -> Any:
+  """
+  Copies `data`, a NumPy array or any other C-contiguous buffer, e.g.
+  `bytes`, into a private anonymous memory mapping and returns a view of it,
+  an array of the same shape and type for a NumPy array, a `memoryview`
+  otherwise.
+
+  It's a read-only copy for the trial children, which inherit it when
+  forked and read it without copying a page.  It isn't shared memory: a
+  child that writes to it only writes to its own copy, which neither the
+  parent nor the other children see.
+  """
+  view = memoryview(data)
+  if not view.c_contiguous:
+    raise ValueError('only C-contiguous buffers can be shared')
+  buffer = mmap.mmap(-1, max(view.nbytes, 1), flags=mmap.MAP_PRIVATE)
+  buffer[:view.nbytes] = view.cast('B')
+  if type(data).__module__ == 'numpy':
+    import numpy
+    return numpy.frombuffer(buffer, data.dtype, data.size).reshape(data.shape)
+  shared = memoryview(buffer)[:view.nbytes]  # type: Any
+  return shared.cast(view.format, view.shape) if view.nbytes else shared
+
+
+def _setup(hook: Optional[Callable[[], Any]]) -> None:
+  """
+  Runs the `setup` hook, if any, then freezes every object allocated so far
+  so that the garbage collector doesn't touch them in the children.
+  """
+  global _resources, _froze, _depth
+  if hook is not None:
+    _resources = hook()
+  # leave the objects frozen by the caller as they are
+  if not _depth:
+    _froze = gc.get_freeze_count() == 0
+  _depth += 1
+  gc.freeze()
+
+
+def _teardown() -> None:
+  """
+  Unfreezes the objects frozen by `_setup`, in the parent once tuning ends,
+  so that the garbage they become is collected again, unless some were
+  frozen already, by the caller.
+  """
+  global _froze, _depth
+  _depth -= 1
+  if not _depth and _froze:
+    gc.unfreeze()
+    _froze = False
@@ -0,0 +1,913 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Search strategies for forking-tuner.
+
+A strategy only proposes points and learns their objectives, through `ask`
+and `tell`; evaluating them, in forked children or otherwise, is up to the
+tuner driving it.
+"""
+
+import itertools
+import math
+import random
+from collections import Counter
+from statistics import stdev
+from typing import Any, Callable, Generator, List, Optional, Sequence, Set
+from typing import Tuple
+
+from .objectives import INFEASIBLE
+
+__all__ = ['AdaptiveNelderMead', 'Batch', 'CoordinateDescent', 'GridSearch',
+           'Hyperband', 'NelderMead', 'Strategy', 'SuccessiveHalving']
+
+
+Bounds = Optional[Sequence[Tuple[float, float]]]
+Lattice = Optional[Sequence[float]]
+SimplexWithObjectives = List[List[Any]]
+Visited = Set[Tuple[float, ...]]
+
+# the flatness below which a simplex is degenerate, see `_flatness`
+_DEGENERATE = 1e-6
+# how much smaller the simplex gets with every restart
+_RESTART_SCALE = 0.5
+
+
+class Batch(object):
+  """
+  The `points` a strategy asks to evaluate together.  Their objectives will
+  be compared `against` the given ones, which tells the tuner how precisely
+  to measure them, at the given `fidelity`, e.g. a number of benchmark
+  batches, if any.  `step` names the kind of step they are for.
+  """
+
+  def __init__(self, points: List[List[float]], against: Sequence[float] = (),
+               fidelity: Optional[float] = None, step: str = '') -> None:
+    self.points = points
+    self.against = against
+    self.fidelity = fidelity
+    self.step = step
+
+  def __repr__(self) -> str:
+    return (f'Batch({self.points}, {self.against}, {self.fidelity}, '
+            f'{self.step!r})')
+
+
+class Strategy(object):
+  """
+  A search strategy, asked for the next `Batch` to evaluate and told its
+  objectives, in turns, until `ask` returns `None`.  Subclasses implement
+  `search`, a generator that yields the batches and receives their
+  objectives.
+
+  Points are projected onto the feasible configurations declared by `bounds`,
+  a `(low, high)` pair per dimension, and `lattice`, a step per dimension, 0
+  for a continuous one.  `iteration` counts the strategy's iterations, and
+  `resolution` and `trials`, kept up to date by the tuner, are the
+  measurement noise of an objective and the number of trials run so far,
+  cache hits aside; without a tuner, every point told counts as a trial.
+  `clamped` has the points of the last batch that were proposed out of
+  bounds.
+  """
+
+  def __init__(self, bounds: Bounds = None, lattice: Lattice = None) -> None:
+    self.bounds = bounds
+    self.lattice = lattice
+    self.iteration = 0
+    self.resolution = 0.0
+    self.trials = None  # type: Optional[int]
+    self.visited = set()  # type: Visited
+    self.clamped = set()  # type: Visited
+    self.history = []  # type: List[Tuple[List[float], float]]
+    # the number of trials run by the time each point of `history` was told
+    self._trials = []  # type: List[int]
+    self._search = None  # type: Optional[Generator[Batch, List[float], None]]
+    self._batch = None  # type: Optional[Batch]
+    self._told = []  # type: List[float]
+    self._done = False
+
+  @property
+  def constrained(self) -> bool:
+    return self.bounds is not None or self.lattice is not None
+
+  def project(self, point: Sequence[float]) -> List[float]:
+    if not self.constrained:
+      return [float(x) for x in point]
+    projected = _project(point, self.bounds, self.lattice)
+    if self.bounds and any(not low <= x <= high
+                           for x, (low, high) in zip(point, self.bounds)):
+      self.clamped.add(tuple(projected))
+    return projected
+
+  def ask(self) -> Optional[Batch]:
+    if self._done:
+      return None
+    self.clamped = set()
+    try:
+      if self._search is None:
+        self._search = self.search()
+        self._batch = next(self._search)
+      else:
+        self._batch = self._search.send(self._told)
+    except StopIteration:
+      self._done = True
+      self._batch = None
+    return self._batch
+
+  def tell(self, objectives: Sequence[float]) -> None:
+    assert self._batch is not None
+    assert len(objectives) == len(self._batch.points)
+    self._told = list(objectives)
+    for point, objective in zip(self._batch.points, self._told):
+      self.visited.add(tuple(point))
+      self.history.append((point, objective))
+      self._trials.append(len(self.history) if self.trials is None
+                          else self.trials)
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    raise NotImplementedError()  # pragma: no cover
+
+  def ranking(self) -> List[List[Any]]:
+    """
+    The `[point, objective]` pairs the strategy currently considers, best
+    first.
+    """
+    return [[p, o] for o, p in sorted((o, p) for p, o in self.history)]
+
+  def best(self) -> Optional[Tuple[List[float], float]]:
+    """
+    The best point so far and its objective.
+    """
+    ranking = self.ranking()
+    return (ranking[0][0], ranking[0][1]) if ranking else None
+
+
+def _project(point: Sequence[float], bounds: Bounds = None,
+             lattice: Lattice = None) -> List[float]:
+  """
+  The feasible point nearest to `point`: within `bounds`, and on the
+  `lattice`, i.e. at a multiple of its step from the lower bound, or from 0
+  without one.  A step of 0 leaves the dimension continuous.
+  """
+  projected = []
+  for i, x in enumerate(point):
+    low, high = bounds[i] if bounds else (-math.inf, math.inf)
+    x = min(max(float(x), low), high)
+    step = lattice[i] if lattice else 0
+    if step:
+      origin = low if math.isfinite(low) else 0.0
+      x = origin + round((x - origin) / step) * step
+      if x > high:
+        x -= step
+    projected.append(float(x))
+  return projected
+
+
+def _make_simplex(vertex: Sequence,
+                  step_sizes: Optional[Sequence[float]] = None
+                  ) -> List[List[float]]:
+  dim = len(vertex)
+  step_sizes = step_sizes or [1 for i in range(dim)]
+  assert dim == len(step_sizes)
+  simplex = []
+  # vertex + unit vector along each axis
+  for i in range(dim):
+    vert = [float(v) for v in vertex]
+    vert[i] += step_sizes[i]
+    simplex.append(vert)
+  # and the original vertex
+  simplex.append([float(v) for v in vertex])
+  return simplex
+
+
+def _rebuild(simplex: SimplexWithObjectives, steps: List[float],
+             project: Callable[[List[float]], List[float]],
+             visited: Callable[[List[float]], bool]
+             ) -> Optional[List[List[float]]]:
+  """
+  New vertices around the best one, one step away along each axis, that
+  haven't been visited yet where possible.  `None` when every feasible
+  neighbour has been visited already.
+  """
+  best = simplex[0][1]
+  vertices = []
+  exhausted = True
+  for i, step in enumerate(steps):
+    neighbours = []
+    for sign in (1, -1):
+      neighbour = list(best)
+      neighbour[i] += sign * step
+      neighbour = project(neighbour)
+      if neighbour != best:
+        neighbours.append(neighbour)
+    fresh = [n for n in neighbours if not visited(n)]
+    exhausted = exhausted and not fresh
+    vertices.append((fresh or neighbours or [best])[0])
+  return None if exhausted else vertices
+
+
+def _collapsed(simplex: SimplexWithObjectives,
+               candidate: Optional[List[float]] = None) -> bool:
+  # whether the vertices, or the candidate vertex, aren't all distinct
+  vertices = [s[1] for s in simplex]
+  if candidate is not None:
+    return candidate in vertices
+  return any(v in vertices[:i] for i, v in enumerate(vertices))
+
+
+def _converged(objectives: List[float], threshold: float,
+               noise: float = 0.0) -> bool:
+  # penalized vertices have to be replaced before the simplex can converge,
+  # as well as a simplex of infeasible vertices only, and objectives closer
+  # than the measurement noise can't be told apart
+  if not all(math.isfinite(o) for o in objectives) or \
+     all(o >= INFEASIBLE for o in objectives):
+    return False
+  return stdev(objectives) < max(threshold, noise)
+
+
+def _flatness(simplex: SimplexWithObjectives,
+              scales: Sequence[float]) -> float:
+  """
+  How far the simplex is from degenerate: the volume spanned by its edges
+  from the best vertex, in units of `scales` per axis, relative to the
+  product of their lengths.  1 for orthogonal edges, 0 for a simplex that
+  lies in a hyperplane, which can't explore the whole space anymore.
+  """
+  best = simplex[0][1]
+  edges = [[(x - b) / s for x, b, s in zip(v, best, scales)]
+           for _, v in simplex[1:]]
+  lengths = math.prod(math.sqrt(sum(x * x for x in e)) for e in edges)
+  if not lengths:
+    return 0.0
+  # the determinant, by Gaussian elimination with partial pivoting
+  volume = 1.0
+  for i in range(len(edges)):
+    pivot = max(range(i, len(edges)), key=lambda r: abs(edges[r][i]))
+    edges[i], edges[pivot] = edges[pivot], edges[i]
+    if not edges[i][i]:
+      return 0.0
+    volume *= edges[i][i]
+    for row in edges[i + 1:]:
+      factor = row[i] / edges[i][i]
+      for j in range(i, len(row)):
+        row[j] -= factor * edges[i][j]
+  return abs(volume) / lengths
+
+
+def _centroid(simplex: SimplexWithObjectives) -> List[float]:
+  sim = [s[1] for s in simplex]
+  points_count = len(sim) - 1
+  dim = len(sim[0])
+  ret = [0.0] * dim
+  for i in range(points_count):
+    for j in range(dim):
+      ret[j] += sim[i][j]
+  for j in range(dim):
+    ret[j] /= points_count
+  return ret
+
+
+def _numpy() -> Any:
+  # NumPy if it's installed, `None` otherwise
+  try:
+    import numpy
+  except ImportError:
+    return None
+  return numpy
+
+
+def _affine(a: Any, b: Any, t: float) -> Any:
+  # a + t (b - a), of lists or of NumPy arrays
+  if isinstance(a, list):
+    return [x + t * (y - x) for x, y in zip(a, b)]
+  return a + t * (b - a)
+
+
+def _gao_han(dim: int) -> Tuple[float, float, float]:
+  """
+  The expansion, contraction and shrink coefficients of the adaptive
+  Nelder-Mead method (Gao and Han, 2012) in `dim` dimensions, the standard
+  ones in up to 2 dimensions.  The farther the expansions and the milder the
+  contractions and shrinks as dimensions get added, the longer the simplex
+  keeps its size and shape.
+  """
+  dim = max(dim, 2)
+  return 1 + 2 / dim, 0.75 - 1 / (2 * dim), 1 - 1 / dim
+
+
+class _ArraySimplex(object):
+  """
+  A simplex of `[objective, vertex]` pairs, with the vertices as the rows of
+  an array, a NumPy one if it's installed, lists otherwise.  The sum of the
+  vertices is kept up to date as they're replaced, so that the centroid of
+  all but the worst one costs one pass over a vertex rather than over the
+  whole simplex.  `order` has the indices of the vertices, best first, as of
+  the last `sort`.  The vertices are counted as well, to tell whether the
+  simplex has collapsed without comparing them all.
+  """
+
+  def __init__(self, pairs: SimplexWithObjectives) -> None:
+    self.numpy = _numpy()
+    self.objectives = [o for o, _ in pairs]
+    rows = [[float(x) for x in v] for _, v in pairs]
+    self.counts = Counter(tuple(row) for row in rows)
+    self.vertices = rows  # type: Any
+    if self.numpy is not None:
+      self.vertices = self.numpy.array(rows)
+    self.total = self._sum()
+    # replacements since the sum was last computed from scratch
+    self.updates = 0
+    self.sort()
+
+  def _sum(self) -> Any:
+    if self.numpy is None:
+      return [math.fsum(c) for c in zip(*self.vertices)]
+    return self.vertices.sum(axis=0)
+
+  def sort(self) -> None:
+    self.order = sorted(range(len(self.objectives)),
+                        key=lambda i: self.objectives[i])
+
+  def vertex(self, rank: int) -> Any:
+    return self.vertices[self.order[rank]]
+
+  def objective(self, rank: int) -> float:
+    return self.objectives[self.order[rank]]
+
+  def best(self) -> List[Any]:
+    """
+    The best `[objective, vertex]` pair, as of the last `sort`.
+    """
+    return [self.objective(0), [float(x) for x in self.vertex(0)]]
+
+  def worst(self) -> List[Any]:
+    """
+    The worst `[objective, vertex]` pair, as of the last `sort`.
+    """
+    return [self.objective(-1), [float(x) for x in self.vertex(-1)]]
+
+  def collapsed(self, candidate: Optional[List[float]] = None) -> bool:
+    """
+    See `_collapsed`.
+    """
+    if candidate is not None:
+      return tuple(float(x) for x in candidate) in self.counts
+    return len(self.counts) < len(self.objectives)
+
+  def centroid(self) -> Any:
+    # of every vertex but the worst one
+    worst, count = self.vertex(-1), len(self.order) - 1
+    if self.numpy is None:
+      return [(t - w) / count for t, w in zip(self.total, worst)]
+    return (self.total - worst) / count
+
+  def replace(self, rank: int, objective: float,
+              vertex: List[float]) -> None:
+    index = self.order[rank]
+    self.objectives[index] = objective
+    old = tuple(float(x) for x in self.vertices[index])
+    self.counts[old] -= 1
+    if not self.counts[old]:
+      del self.counts[old]
+    self.counts[tuple(float(x) for x in vertex)] += 1
+    if self.numpy is None:
+      self.total = [t + x - old for t, x, old in
+                    zip(self.total, vertex, self.vertices[index])]
+    else:
+      self.total += self.numpy.asarray(vertex) - self.vertices[index]
+    self.vertices[index] = vertex
+    self.updates += 1
+    # bound the rounding errors that accumulate in the sum
+    if self.updates == len(self.order):
+      self.total, self.updates = self._sum(), 0
+
+  def pairs(self) -> SimplexWithObjectives:
+    """
+    The `[objective, vertex]` pairs, best first.
+    """
+    return [[self.objectives[i], [float(x) for x in self.vertices[i]]]
+            for i in self.order]
+
+  def flatness(self, scales: Sequence[float]) -> float:
+    """
+    See `_flatness`.
+    """
+    if self.numpy is None:
+      return _flatness(self.pairs(), scales)
+    np = self.numpy
+    edges = (self.vertices[self.order[1:]] - self.vertex(0)) / np.array(scales)
+    lengths = np.prod(np.linalg.norm(edges, axis=1))
+    return float(abs(np.linalg.det(edges)) / lengths) if lengths else 0.0
+
+
+def _reflect(simplex: SimplexWithObjectives,
+             center: List[float]) -> List[float]:
+  return [2 * i - j for i, j in zip(center, simplex[-1][1])]
+
+
+def _expand(reflected: List[float], center: List[float]) -> List[float]:
+  return [i - j for i, j in zip(reflected, center)]
+
+
+def _contract(simplex: SimplexWithObjectives,
+              center: List[float]) -> List[float]:
+  return [0.5 * i + 0.5 * j for i, j in zip(center, simplex[-1][1])]
+
+
+def _shrink(simplex: SimplexWithObjectives) -> None:
+  for i in range(1, len(simplex)):
+    simplex[i][1] = [0.5 * i + 0.5 * j for i, j in
+                     zip(simplex[0][1], simplex[i][1])]
+
+
+class NelderMead(Strategy):
+  """
+  The Nelder-Mead method, starting from `vertex` and a step of `step_sizes`
+  along each axis, for at most `iterations`, or until the objectives of the
+  simplex spread less than `threshold`.
+
+  On a lattice, the simplex is rebuilt from the best vertex and its unvisited
+  neighbours whenever it collapses, i.e. a step lands on one of its vertices,
+  and the search stops once they have all been visited.
+
+  With a `patience` or `restarts`, the search stalls when its best objective
+  hasn't improved for `patience` trials, if given, or its simplex has become
+  degenerate, i.e. flat.  It then restarts around the best vertex with a
+  fresh simplex, half as large as the previous one, up to `restarts` times,
+  or stops.
+  """
+
+  def __init__(self, vertex: Sequence,
+               step_sizes: Optional[Sequence[float]] = None,
+               iterations: int = 200, threshold: float = 1e-2,
+               bounds: Bounds = None, lattice: Lattice = None,
+               patience: Optional[int] = None, restarts: int = 0) -> None:
+    super().__init__(bounds, lattice)
+    self.vertex = vertex
+    self.step_sizes = step_sizes
+    self.iterations = iterations
+    self.threshold = threshold
+    self.patience = patience
+    self.restarts = restarts
+    self.restarted = 0
+    self.simplex = []  # type: SimplexWithObjectives
+    # the best objective told, and the trials run when it was told, or when
+    # the search last restarted
+    self._best_objective = math.inf
+    self._best_trial = 0
+
+  def ranking(self) -> List[List[Any]]:
+    return [[v, o] for o, v in sorted(self.simplex)]
+
+  def best(self) -> Optional[Tuple[List[float], float]]:
+    # a step cut short, e.g. by a budget, may have found a better point than
+    # those of the simplex
+    best = super().best()
+    for point, objective in self.history:
+      if best is None or objective < best[1]:
+        best = (point, objective)
+    return best
+
+  def tell(self, objectives: Sequence[float]) -> None:
+    super().tell(objectives)
+    for objective, trial in zip(objectives, self._trials[-len(objectives):]):
+      if objective < self._best_objective:
+        self._best_objective, self._best_trial = objective, trial
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    constrained = self.constrained
+    sim = [self.project(v) for v in _make_simplex(self.vertex,
+                                                  self.step_sizes)]
+    # zip with objectives
+    values = yield Batch(sim, step='initial')
+    simplex = [list(i) for i in zip(values, sim)]  # type: List
+    self.simplex = simplex
+    collapsed = constrained and _collapsed(simplex)
+
+    # https://en.wikipedia.org/wiki/Nelder%E2%80%93Mead_method
+    for _ in range(self.iterations):
+      # 1. Order, check early termination
+      simplex = self.simplex = sorted(simplex)
+      self.iteration += 1
+      if _converged([s[0] for s in simplex], self.threshold,
+                    self.resolution):
+        break
+
+      # the simplex collapsed onto the lattice, rebuild it
+      if collapsed:
+        rebuilt = _rebuild(simplex, self._steps(), self.project,
+                           lambda v: tuple(v) in self.visited)
+        if rebuilt is None:
+          break
+        values = yield Batch(rebuilt, step='rebuild')
+        simplex[1:] = [list(i) for i in zip(values, rebuilt)]
+        collapsed = _collapsed(simplex)
+        continue
+
+      # restart around the best vertex once stalled
+      if self._stalled():
+        if self.restarted == self.restarts:
+          break
+        vertices = self._restart(simplex[0][1])
+        values = yield Batch(vertices, step='restart')
+        simplex[1:] = [list(i) for i in zip(values, vertices)]
+        collapsed = constrained and _collapsed(simplex)
+        continue
+
+      # 2. Compute centroid
+      center = _centroid(simplex)
+
+      # 3. Reflection
+      reflected = self.project(_reflect(simplex, center))
+      collapsed = constrained and _collapsed(simplex, reflected)
+      if collapsed:
+        continue
+      value, = yield Batch([reflected], [simplex[0][0], simplex[1][0]],
+                           step='reflect')
+      if value > simplex[0][0] and value < simplex[1][0]:
+        simplex[-1] = [value, reflected]
+        continue
+
+      # 4. Expansion
+      if value < simplex[0][0]:
+        expanded = self.project(_expand(reflected, center))
+        value_expanded, = yield Batch([expanded], [value], step='expand')
+        if value_expanded < value:
+          simplex[-1] = [value_expanded, expanded]
+          continue
+        simplex[-1] = [value, reflected]
+        continue
+
+      # 5. Contraction
+      contracted = self.project(_contract(simplex, center))
+      collapsed = constrained and _collapsed(simplex, contracted)
+      if collapsed:
+        continue
+      value, = yield Batch([contracted], [simplex[-1][0]], step='contract')
+      if value < simplex[-1][0]:
+        simplex[-1] = [value, contracted]
+        continue
+
+      # 6. Shrink
+      _shrink(simplex)
+      for s in simplex:
+        s[1] = self.project(s[1])
+      values = yield Batch([s[1] for s in simplex[1:]], step='shrink')
+      for i, value in enumerate(values, 1):
+        simplex[i][0] = value
+      collapsed = constrained and _collapsed(simplex)
+
+  def _scales(self) -> List[float]:
+    dim = len(self.vertex)
+    return [float(i) or 1.0 for i in (self.step_sizes or [1] * dim)]
+
+  def _restart(self, best: List[float]) -> List[List[float]]:
+    # the vertices of a fresh simplex around the best one, smaller with every
+    # restart
+    self.restarted += 1
+    self._best_trial = self._trials[-1]
+    scale = _RESTART_SCALE ** self.restarted
+    steps = [s * scale for s in self._scales()]
+    return [self.project(v) for v in _make_simplex(best, steps)[:-1]]
+
+  def _flatness(self) -> float:
+    return _flatness(self.simplex, self._scales())
+
+  def _stalled(self) -> bool:
+    # no improvement for `patience` trials since the last restart, or a
+    # degenerate simplex, only looked for with a patience or restarts
+    if self.patience is None and not self.restarts:
+      return False
+    if self.patience is not None:
+      if self._trials[-1] - self._best_trial >= self.patience:
+        return True
+    return self._flatness() < _DEGENERATE
+
+  def _steps(self) -> List[float]:
+    dim = len(self.simplex[0][1])
+    steps = [float(i) for i in (self.step_sizes or [1] * dim)]
+    if self.lattice is not None:
+      steps = [self.lattice[i] or steps[i] for i in range(dim)]
+    return steps
+
+
+class AdaptiveNelderMead(NelderMead):
+  """
+  The Nelder-Mead method for many dimensions, e.g. dozens of knobs tuned
+  together: with the coefficients of `_gao_han`, which keep the simplex from
+  shrinking to a point, or flattening, before it gets anywhere, and an
+  `_ArraySimplex`.  A failed contraction shrinks every vertex toward the
+  best one, a trial per vertex, or with `full_shrink=False`, only the worst
+  one, in a single trial.  The other arguments are those of `NelderMead`.
+
+  `simplex` is only built from the array, as `[objective, vertex]` pairs,
+  when it's read, e.g. for the tuner's callback.
+  """
+
+  def __init__(self, vertex: Sequence,
+               step_sizes: Optional[Sequence[float]] = None,
+               iterations: int = 200, threshold: float = 1e-2,
+               bounds: Bounds = None, lattice: Lattice = None,
+               patience: Optional[int] = None, restarts: int = 0,
+               full_shrink: bool = True) -> None:
+    super().__init__(vertex, step_sizes, iterations, threshold, bounds,
+                     lattice, patience, restarts)
+    self.full_shrink = full_shrink
+    self.array = None  # type: Optional[_ArraySimplex]
+
+  @property  # type: ignore
+  def simplex(self) -> SimplexWithObjectives:
+    if self.array is None:
+      return []
+    return self.array.pairs()
+
+  @simplex.setter
+  def simplex(self, pairs: SimplexWithObjectives) -> None:
+    self.array = _ArraySimplex(pairs) if pairs else None
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    constrained = self.constrained
+    expansion, contraction, shrink = _gao_han(len(self.vertex))
+    sim = [self.project(v) for v in _make_simplex(self.vertex,
+                                                  self.step_sizes)]
+    values = yield Batch(sim, step='initial')
+    array = self.array = _ArraySimplex([list(i) for i in zip(values, sim)])
+    collapsed = constrained and array.collapsed()
+    size = len(sim)
+
+    for _ in range(self.iterations):
+      array.sort()
+      self.iteration += 1
+      if _converged(array.objectives, self.threshold, self.resolution):
+        break
+
+      # the simplex collapsed onto the lattice, rebuild it
+      if collapsed:
+        rebuilt = _rebuild(array.pairs(), self._steps(), self.project,
+                           lambda v: tuple(v) in self.visited)
+        if rebuilt is None:
+          break
+        values = yield Batch(rebuilt, step='rebuild')
+        pairs = [list(i) for i in zip(values, rebuilt)]
+        array = self.array = _ArraySimplex([array.best()] + pairs)
+        collapsed = array.collapsed()
+        continue
+
+      # restart around the best vertex once stalled
+      if self._stalled():
+        if self.restarted == self.restarts:
+          break
+        vertices = self._restart(array.best()[1])
+        values = yield Batch(vertices, step='restart')
+        pairs = [list(i) for i in zip(values, vertices)]
+        array = self.array = _ArraySimplex([array.best()] + pairs)
+        collapsed = constrained and array.collapsed()
+        continue
+
+      best, second = array.objective(0), array.objective(-2)
+      worst = array.objective(-1)
+      center = array.centroid()
+
+      # reflection, through the centroid of the other vertices
+      reflected = self.project(_affine(center, array.vertex(-1), -1))
+      collapsed = constrained and array.collapsed(reflected)
+      if collapsed:
+        continue
+      value, = yield Batch([reflected], [best, second], step='reflect')
+      if best <= value < second:
+        array.replace(-1, value, reflected)
+        continue
+
+      # expansion, farther along the same direction
+      if value < best:
+        expanded = self.project(_affine(center, reflected, expansion))
+        value_expanded, = yield Batch([expanded], [value], step='expand')
+        if value_expanded < value:
+          array.replace(-1, value_expanded, expanded)
+        else:
+          array.replace(-1, value, reflected)
+        continue
+
+      # contraction, outside the simplex if the reflection beat the worst
+      # vertex, inside otherwise
+      outside = value < worst
+      limit = value if outside else worst
+      toward = reflected if outside else array.vertex(-1)
+      contracted = self.project(_affine(center, toward, contraction))
+      collapsed = constrained and array.collapsed(contracted)
+      if collapsed:
+        continue
+      value, = yield Batch([contracted], [limit], step='contract')
+      if value < limit or (outside and value == limit):
+        array.replace(-1, value, contracted)
+        continue
+
+      # shrink toward the best vertex
+      first = 1 if self.full_shrink else size - 1
+      shrunk = [self.project(_affine(array.vertex(0), array.vertex(rank),
+                                     shrink))
+                for rank in range(first, size)]
+      values = yield Batch(shrunk, step='shrink')
+      for rank, (value, vertex) in enumerate(zip(values, shrunk), first):
+        array.replace(rank, value, vertex)
+      collapsed = constrained and array.collapsed()
+
+  def _flatness(self) -> float:
+    assert self.array is not None
+    return self.array.flatness(self._scales())
+
+
+class GridSearch(Strategy):
+  """
+  Exhaustive search of every point of the `lattice` within `bounds`, for
+  small integer spaces, `batch_size` points at a time.
+  """
+
+  def __init__(self, bounds: Sequence[Tuple[float, float]],
+               lattice: Optional[Sequence[float]] = None,
+               batch_size: int = 32) -> None:
+    lattice = lattice or [1] * len(bounds)
+    if not all(lattice):
+      raise ValueError('grid search needs a lattice step for every dimension')
+    super().__init__(bounds, lattice)
+    self.batch_size = batch_size
+
+  def points(self) -> List[List[float]]:
+    axes = []
+    for (low, high), step in zip(self.bounds or (), self.lattice or ()):
+      count = int(math.floor((high - low) / step + 1e-9)) + 1
+      axes.append([float(low + i * step) for i in range(count)])
+    return [list(p) for p in itertools.product(*axes)]
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    points = self.points()
+    for start in range(0, len(points), self.batch_size):
+      yield Batch(points[start:start + self.batch_size], step='grid')
+      self.iteration += 1
+
+
+class CoordinateDescent(Strategy):
+  """
+  Moves from `vertex` one axis at a time, to whichever of the two
+  neighbours `step_sizes` away improves the objective.  After a sweep of all
+  the axes without improvement the steps are halved, no smaller than the
+  `lattice`; the search stops once they're all below `tolerance`, can't get
+  any smaller, or after `iterations` sweeps.
+  """
+
+  def __init__(self, vertex: Sequence,
+               step_sizes: Optional[Sequence[float]] = None,
+               iterations: int = 200, tolerance: float = 1e-2,
+               bounds: Bounds = None, lattice: Lattice = None) -> None:
+    super().__init__(bounds, lattice)
+    self.vertex = vertex
+    self.step_sizes = step_sizes
+    self.iterations = iterations
+    self.tolerance = tolerance
+    self.current = []  # type: List[List[Any]]
+
+  def ranking(self) -> List[List[Any]]:
+    return self.current
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    point = self.project(self.vertex)
+    steps = [float(s) for s in (self.step_sizes or [1] * len(point))]
+    value, = yield Batch([point], step='initial')
+    self.current = [[point, value]]
+    for _ in range(self.iterations):
+      self.iteration += 1
+      improved = False
+      for i in range(len(point)):
+        candidates = []
+        for sign in (1, -1):
+          candidate = list(point)
+          candidate[i] += sign * steps[i]
+          candidate = self.project(candidate)
+          if candidate != point and candidate not in candidates:
+            candidates.append(candidate)
+        if not candidates:
+          continue
+        values = yield Batch(candidates, [value], step=f'axis {i}')
+        best, candidate = min(zip(values, candidates))
+        if best < value:
+          point, value, improved = candidate, best, True
+          self.current = [[point, value]]
+      if improved:
+        continue
+      lattice = self.lattice or [0.0] * len(steps)
+      halved = [max(s / 2, lattice[i]) for i, s in enumerate(steps)]
+      if halved == steps or max(halved) < self.tolerance:
+        break
+      steps = halved
+
+
+class SuccessiveHalving(Strategy):
+  """
+  Multi-fidelity search: the `candidates`, or `count` points drawn uniformly
+  within `bounds`, are all evaluated at `min_fidelity`.  The best `1 / eta`
+  of them are promoted to a fidelity `eta` times higher, and so on up to
+  `max_fidelity`, so that only the most promising configurations get the
+  long, expensive measurements.  The child reads its fidelity, e.g. a number
+  of benchmark batches, with `forking_tuner.fidelity()`.
+  """
+
+  def __init__(self, candidates: Optional[List[Sequence[float]]] = None,
+               bounds: Bounds = None, lattice: Lattice = None,
+               count: int = 27, min_fidelity: float = 1,
+               max_fidelity: float = 27, eta: int = 3,
+               seed: Optional[int] = 0) -> None:
+    super().__init__(bounds, lattice)
+    if candidates is None and bounds is None:
+      raise ValueError('either candidates or bounds are needed')
+    self.candidates = candidates
+    self.count = count
+    self.min_fidelity = min_fidelity
+    self.max_fidelity = max_fidelity
+    self.eta = eta
+    self.random = random.Random(seed)
+    self.rung = []  # type: List[List[Any]]
+    # the best point at the highest fidelity so far
+    self._best = None  # type: Optional[Tuple[float, float, List[float]]]
+
+  def ranking(self) -> List[List[Any]]:
+    return self.rung
+
+  def best(self) -> Optional[Tuple[List[float], float]]:
+    if self._best is None:
+      return None
+    return (self._best[2], self._best[1])
+
+  def sample(self, count: int) -> List[List[float]]:
+    """
+    `count` distinct feasible points drawn uniformly within the bounds.
+    """
+    points = []  # type: List[List[float]]
+    for _ in range(count * 10):
+      if len(points) == count:
+        break
+      point = self.project([self.random.uniform(low, high)
+                            for low, high in self.bounds or ()])
+      if point not in points:
+        points.append(point)
+    return points
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    candidates = [self.project(c) for c in self.candidates or []]
+    candidates = candidates or self.sample(self.count)
+    yield from self._halving(candidates, self.min_fidelity)
+
+  def _halving(self, candidates: List[List[float]], fidelity: float
+               ) -> Generator[Batch, List[float], None]:
+    while candidates:
+      values = yield Batch(candidates, fidelity=fidelity,
+                           step=f'fidelity {fidelity:g}')
+      ranked = sorted(zip(values, candidates))
+      self.rung = [[c, v] for v, c in ranked]
+      best = (-fidelity, ranked[0][0], ranked[0][1])
+      if self._best is None or best < self._best:
+        self._best = best
+      self.iteration += 1
+      if fidelity >= self.max_fidelity or len(candidates) == 1:
+        return
+      candidates = [c for _, c in ranked[:max(len(ranked) // self.eta, 1)]]
+      fidelity = min(fidelity * self.eta, self.max_fidelity)
+
+
+class Hyperband(SuccessiveHalving):
+  """
+  Hyperband: successive halving brackets that trade the number of points
+  drawn within `bounds` for the fidelity they start at, from many points at
+  `min_fidelity` to a few at `max_fidelity`.
+  """
+
+  def __init__(self, bounds: Sequence[Tuple[float, float]],
+               lattice: Lattice = None, min_fidelity: float = 1,
+               max_fidelity: float = 27, eta: int = 3,
+               seed: Optional[int] = 0) -> None:
+    super().__init__(None, bounds, lattice, 0, min_fidelity, max_fidelity,
+                     eta, seed)
+
+  def search(self) -> Generator[Batch, List[float], None]:
+    brackets = int(math.log(self.max_fidelity / self.min_fidelity, self.eta)
+                   + 1e-9)
+    for s in range(brackets, -1, -1):
+      count = int(math.ceil((brackets + 1) / (s + 1) * self.eta ** s))
+      fidelity = self.max_fidelity / self.eta ** s
+      yield from self._halving(self.sample(count), fidelity)
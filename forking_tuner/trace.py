@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Trial traces: one JSON record per trial, appended as soon as it completes,
+and their offline analysis, see `python -m forking_tuner.trace --help`.
+"""
+
+import argparse
+import json
+import math
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, IO, Iterator, Optional, Sequence
+
+__all__ = ['Trace', 'phases', 'read_trace', 'summarize']
+
+
+# the phases of a trial, between two of its timestamps: the tuner's own work
+# since the previous batch, the fork, the child's setup, the trial itself, the
+# child's exit once it's done, and its reaping
+_PHASES = (('tuner', 'ready', 'fork'),
+           ('fork', 'fork', 'forked'),
+           ('setup', 'child', 'start'),
+           ('workload', 'start', 'end'),
+           ('exit', 'end', 'closed'),
+           ('reap', 'closed', 'reaped'))
+
+
+class Trace(object):
+  """
+  Appends trial records to the JSONL file at `path`, flushing each one so
+  that a crash loses at most the trial being written.
+  """
+
+  def __init__(self, path: str) -> None:
+    self.file = open(path, 'a')
+
+  def write(self, trial: Any, clamped: bool = False) -> None:
+    record = OrderedDict([('vertex', list(trial.vertex)),
+                          ('objective', trial.objective),
+                          ('step', trial.step),
+                          ('fidelity', trial.fidelity),
+                          ('repeat', trial.repeat),
+                          ('clamped', clamped),
+                          ('violation', trial.violation),
+                          ('pid', trial.child.get('pid')),
+                          ('start', trial.child.get('start')),
+                          ('end', trial.child.get('end')),
+                          ('timings', trial.child.get('timings')),
+                          ('status', trial.child.get('status')),
+                          ('signal', trial.child.get('signal')),
+                          ('metrics', trial.metrics),
+                          ('usage', trial.usage)])
+    self.file.write(json.dumps(record) + '\n')
+    self.file.flush()
+
+  def close(self) -> None:
+    self.file.close()
+
+
+def phases(timings: Dict[str, int]) -> Dict[str, int]:
+  """
+  The nanoseconds a trial spent in each of its phases, from its `timings`,
+  the `perf_counter_ns` timestamps in its `child`: `tuner`, `fork`, `setup`,
+  `workload`, `exit` and `reap`, those with both of their timestamps.
+  """
+  return OrderedDict((name, timings[end] - timings[start])
+                     for name, start, end in _PHASES
+                     if start in timings and end in timings)
+
+
+def read_trace(lines: IO[str]) -> Iterator[Dict[str, Any]]:
+  """
+  The records of a trace, one at a time, skipping a last one cut short by a
+  crash.
+  """
+  for line in lines:
+    try:
+      yield json.loads(line)
+    except ValueError:
+      if line.endswith('\n'):
+        raise
+
+
+def _duration(record: Dict[str, Any]) -> float:
+  if record.get('start') is None or record.get('end') is None:
+    return 0.0
+  return record['end'] - record['start']
+
+
+def summarize(records: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+  """
+  The convergence curve of a trace, `(trial, seconds since the first trial,
+  best objective)` every time the best objective improved, its `best`
+  record, the `count` of trials and the seconds spent per `steps` kind, and
+  the trials and seconds `wasted` on `duplicate` vertices, evaluated before
+  but not to decide a close call, and on vertices `clamped` to the bounds,
+  and the seconds spent in each of the trials' `phases`.
+  """
+  curve = []  # type: list
+  best = None  # type: Optional[Dict[str, Any]]
+  steps = OrderedDict()  # type: OrderedDict
+  wasted = {'duplicate': [0, 0.0], 'clamped': [0, 0.0]}
+  spent = OrderedDict((name, 0.0) for name, _, _ in _PHASES)
+  seen = set()
+  first = None  # type: Optional[float]
+  count = 0
+  for count, record in enumerate(records, 1):
+    duration = _duration(record)
+    if first is None:
+      first = record.get('start')
+    for name, ns in phases(record.get('timings') or {}).items():
+      spent[name] += ns / 1e9
+    step = steps.setdefault(record.get('step') or '', [0, 0.0])
+    step[0] += 1
+    step[1] += duration
+    key = (tuple(record['vertex']), record.get('fidelity'))
+    if key in seen and not record.get('repeat'):
+      wasted['duplicate'][0] += 1
+      wasted['duplicate'][1] += duration
+    seen.add(key)
+    if record.get('clamped'):
+      wasted['clamped'][0] += 1
+      wasted['clamped'][1] += duration
+    objective = record['objective']
+    feasible = math.isfinite(objective) and not record.get('violation')
+    if feasible and (best is None or objective < best['objective']):
+      best = record
+      end = record.get('end')
+      elapsed = end - first if end is not None and first is not None else 0.0
+      curve.append((count, elapsed, objective))
+  return {'count': count, 'curve': curve, 'best': best, 'steps': steps,
+          'wasted': wasted, 'phases': spent}
+
+
+def _print_summary(summary: Dict[str, Any], out: IO[str]) -> None:
+  print(f'{summary["count"]} trials', file=out)
+  print('\nconvergence:', file=out)
+  print(f'{"trial":>8} {"seconds":>10}  best objective', file=out)
+  for trial, elapsed, objective in summary['curve']:
+    print(f'{trial:>8} {elapsed:>10.2f}  {objective}', file=out)
+  best = summary['best']
+  print('\nbest configuration:', file=out)
+  if best is None:
+    print('  none, no trial was feasible', file=out)
+  else:
+    print(f'  {best["vertex"]}: {best["objective"]}', file=out)
+    for name, value in sorted(best.get('metrics', {}).items()):
+      print(f'  {name}: {value}', file=out)
+  print('\ntime per step:', file=out)
+  for step, (count, seconds) in summary['steps'].items():
+    print(f'  {step or "-":<16} {count:>6} trials {seconds:>10.2f} seconds',
+          file=out)
+  print('\ntime per phase:', file=out)
+  for phase, seconds in summary['phases'].items():
+    print(f'  {phase:<16} {seconds:>10.3f} seconds', file=out)
+  print('\nwasted evaluations:', file=out)
+  for kind, (count, seconds) in summary['wasted'].items():
+    print(f'  {kind:<16} {count:>6} trials {seconds:>10.2f} seconds',
+          file=out)
+
+
+def main(argv: Optional[Sequence[str]] = None,
+         out: Optional[IO[str]] = None) -> int:
+  """
+  Prints the summary of the trace files given on the command line.
+  """
+  out = out or sys.stdout
+  parser = argparse.ArgumentParser(prog='python -m forking_tuner.trace',
+                                   description='Summarizes forking-tuner '
+                                   'trial traces.')
+  parser.add_argument('traces', nargs='+', metavar='TRACE',
+                      help='a JSONL trace written with trace=PATH')
+  args = parser.parse_args(argv)
+  for index, path in enumerate(args.traces):
+    if index:
+      print(file=out)
+    if len(args.traces) > 1:
+      print(f'{path}:', file=out)
+    with open(path) as f:
+      _print_summary(summarize(read_trace(f)), out)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
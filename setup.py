@@ -31,5 +31,8 @@ setup(name=NAME,
       url="",
       keywords=["tensorflow"],
       packages=find_packages(),
+      entry_points={
+          'console_scripts': ['forking-tuner = forking_tuner.cli:main'],
+      },
       long_description=""
       )
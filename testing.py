@@ -15,6 +15,7 @@
 # limitations under the License.
 #
 
+import json
 import os
 import inspect
 
@@ -63,3 +64,21 @@ def patch_setattr(module_names, module_replace, monkeypatch, path, m=None):
     # maybe it's a builtin?
     monkeypatch.setattr("{}.{}".format('builtins', path), m)
   return m
+
+
+def forked_metrics(path, bounds, trial):
+  """
+  Runs `trial(vertex)` in the forked child of every point of the grid within
+  `bounds`, as the tuner does, and returns the metrics they reported, read
+  back from the trace at `path`.
+  """
+  from forking_tuner import report, tune
+  from forking_tuner.channel import in_trial
+  from forking_tuner.strategies import GridSearch
+
+  for vertex in tune(GridSearch(bounds), trace=str(path)):
+    if not in_trial():
+      break
+    report(0, **trial(vertex))
+  with open(path) as f:
+    return [json.loads(line)['metrics'] for line in f]
@@ -15,25 +15,49 @@
 # limitations under the License.
 #
 
+import json
 import logging
-from copy import deepcopy
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os as real_os
+import signal
+import time
 
 from mock import MagicMock, sentinel, call
-from pytest import fixture, mark
+from pytest import fixture, mark, raises
 
-from forking_tuner import logger, nelder_mead, set_log_level
-from forking_tuner import _make_simplex, _do_fork, _centroid, _reflect, _expand
-from forking_tuner import _contract, _shrink
+from forking_tuner import logger, nelder_mead, set_log_level, tune
+from forking_tuner import _do_fork, _read_reports, _fork_batch, _usage
+from forking_tuner import _format_usage
+from forking_tuner import _Evaluator, Simplex, report, channel, _exit_child
+from forking_tuner import _search, _die_with_parent, TrialFailed
+from forking_tuner import PENALTY, relative_timeout, resources
+from forking_tuner import INFEASIBLE, Trial, minimize, _CallEvaluator
+from forking_tuner.strategies import GridSearch, SuccessiveHalving
+from forking_tuner.strategies import _make_simplex
 
 
 simplex = [[1, [2, 3]], [2, [4, 7]], [3, [9, 11]]]
-centroid = [3.0, 5.0]
 values = [[1.5], [0.5, 0.3], [0.5, 0.7], [2.5, 2.5], [2.5, 3.5, 1.9, 2.9]]
 
 
+usage = {'user_time': 1.5, 'system_time': 0.25, 'max_rss': 2 ** 21,
+         'voluntary_switches': 10, 'involuntary_switches': 3000,
+         'minor_faults': 7, 'major_faults': 1}
+
+
+def reports(*values):
+  return (True, [(v, {}, {}, {}) for v in values])
+
+
 @fixture
 def fork(patch):
-  return patch(_do_fork)
+  return patch(_fork_batch)
+
+
+@fixture(autouse=True)
+def exit_child(patch):
+  return patch(_exit_child)
 
 
 @fixture
@@ -50,7 +74,7 @@ def simp(patch):
 
 @fixture
 def stdev(patch):
-  patch('stdev').side_effect = [5, 0]
+  patch('forking_tuner.strategies.stdev').side_effect = [5, 0]
 
 
 def test_set_log_level():
@@ -58,70 +82,855 @@ def test_set_log_level():
   assert logger.level == logging.DEBUG
 
 
-def test_make_simplex():
-  assert _make_simplex([3, 4]) == [[4, 4], [3, 5], [3, 4]]
-
-
 def test_do_fork_parent(os):
-  os.fdopen.return_value = ['a\n', 'b\n', '3\n']
+  os.pipe.return_value = (sentinel.r, sentinel.w)
   os.fork.return_value = 1
-  assert _do_fork() == (True, 3.0)
+  assert _do_fork() == (True, (1, sentinel.r))
+  os.close.assert_called_once_with(sentinel.w)
 
 
 def test_do_fork_child(patch, os):
   sys = patch('sys')
-  os.fdopen.return_value = sentinel.write
+  channel_ = patch('channel')
+  die_with_parent = patch(_die_with_parent)
+  os.pipe.return_value = (sentinel.r, sentinel.w)
   os.fork. return_value = 0
   assert _do_fork() == (False, None)
-  assert sys.stdout == sentinel.write
-
-
-def test_centroid():
-  assert _centroid(simplex) == centroid
+  channel_._open.assert_called_once_with(sentinel.w)
+  die_with_parent.assert_called_once_with(os.getpid.return_value)
+  sys.stdout.flush.assert_called_once_with()
+  os.sched_setaffinity.assert_not_called()
 
 
-def test_reflect():
-  assert _reflect(simplex, centroid) == [-3.0, -1.0]
+def test_do_fork_child_pinned(patch, os):
+  patch('sys')
+  patch('channel')
+  patch(_die_with_parent)
+  os.fork.return_value = 0
+  assert _do_fork({2, 3}) == (False, None)
+  os.sched_setaffinity.assert_called_once_with(0, {2, 3})
 
 
-def test_expand():
-  assert _expand([2.0, 3.0], centroid) == [-1.0, -2.0]
+def test_die_with_parent(patch, os):
+  ctypes = patch('ctypes')
+  prctl = ctypes.CDLL.return_value.prctl
+  os.getppid.return_value = 7
+  _die_with_parent(7)
+  prctl.assert_called_once_with(1, signal.SIGKILL)
+  assert not os._exit.called
+  # the parent died before the call
+  _die_with_parent(8)
+  os._exit.assert_called_once_with(1)
 
 
-def test_contract():
-  assert _contract(simplex, centroid) == [6.0, 8.0]
+def test_die_with_parent_unsupported(patch, os):
+  ctypes = patch('ctypes')
+  ctypes.CDLL.return_value = object()
+  _die_with_parent(7)
+  assert not os.getppid.called
 
 
-def test_shrink():
-  sim = deepcopy(simplex)
-  _shrink(sim)
-  assert sim[0] == simplex[0]
-  assert sim[1] == [2, [3.0, 5.0]]
-  assert sim[2] == [3, [5.5, 7.0]]
+def test_exit_child(patch, os):
+  sys = patch('sys')
+  # the fixture only replaced the module's reference
+  _exit_child()
+  sys.stdout.flush.assert_called_once_with()
+  os._exit.assert_called_once_with(0)
+
+
+def fork_child(monkeypatch, value, metrics={}, sleep=0):
+  r, w = real_os.pipe()
+  pid = real_os.fork()
+  if pid == 0:  # pragma: no cover
+    real_os.close(r)
+    monkeypatch.setattr(channel, '_fd', w)
+    print('x' * 100000)
+    time.sleep(sleep)
+    report(value, **metrics)
+    monkeypatch.setattr(channel, '_timings', {'start': 12})
+    channel._send_timings()
+    real_os._exit(0)
+  real_os.close(w)
+  return (pid, r)
+
+
+def test_read_reports(monkeypatch):
+  children = [fork_child(monkeypatch, 3), fork_child(monkeypatch, 4.5,
+                                                     {'rss': 7})]
+  reports = _read_reports(children)
+  assert [r[:2] for r in reports] == [(3.0, {}), (4.5, {'rss': 7})]
+  assert all(r[2]['max_rss'] > 0 for r in reports)
+  assert [r[3]['pid'] for r in reports] == [pid for pid, _ in children]
+  assert all(r[3]['end'] <= time.time() for r in reports)
+  assert [r[3]['timings']['start'] for r in reports] == [12, 12]
+  assert all(0 < r[3]['timings']['closed'] <= r[3]['timings']['reaped']
+             for r in reports)
+  # the children have been reaped already
+  for pid, _ in children:
+    with raises(ChildProcessError):
+      real_os.waitpid(pid, 0)
+
+
+def test_read_reports_timeout(monkeypatch):
+  children = [fork_child(monkeypatch, 3), fork_child(monkeypatch, 1, sleep=60)]
+  start = time.monotonic()
+  reports = _read_reports(children, 0.5)
+  assert [r[:2] for r in reports] == [(3.0, {}),
+                                      (PENALTY, {'timed_out': True})]
+  assert time.monotonic() - start < 30
+  # the killed child has been reaped as well
+  with raises(ChildProcessError):
+    real_os.waitpid(children[1][0], 0)
+
+
+def exit_child_without_report(code=0):
+  r, w = real_os.pipe()
+  pid = real_os.fork()
+  if pid == 0:  # pragma: no cover
+    if code is None:
+      real_os.kill(real_os.getpid(), signal.SIGKILL)
+    real_os._exit(code)
+  real_os.close(w)
+  return (pid, r)
+
+
+def test_read_reports_missing():
+  children = [exit_child_without_report(), exit_child_without_report(3),
+              exit_child_without_report(None)]
+  reports = _read_reports(children)
+  assert [r[:2] for r in reports] == [(PENALTY, {'failed': True})] * 3
+  statuses = [(r[3]['status'], r[3]['signal']) for r in reports]
+  assert statuses == [(0, None), (3, None), (None, signal.SIGKILL)]
+
+
+def test_read_reports_exit_status(monkeypatch):
+  reports = _read_reports([fork_child(monkeypatch, 3)])
+  assert (reports[0][3]['status'], reports[0][3]['signal']) == (0, None)
+
+
+def test_read_reports_interrupted(monkeypatch, patch):
+  children = [fork_child(monkeypatch, 1, sleep=60)]
+  selector = patch('selectors').DefaultSelector.return_value
+  selector.__enter__.side_effect = KeyboardInterrupt
+  with raises(KeyboardInterrupt):
+    _read_reports(children)
+  # the child has been killed and reaped
+  with raises(ChildProcessError):
+    real_os.waitpid(children[0][0], 0)
+
+
+def test_usage(patch):
+  rusage = MagicMock(ru_utime=1.5, ru_stime=0.25, ru_maxrss=2048,
+                     ru_nvcsw=10, ru_nivcsw=3000, ru_minflt=7, ru_majflt=1)
+  patch('sys').platform = 'linux'
+  assert _usage(rusage) == usage
+  assert _format_usage(usage) == ('1.50s user, 0.25s system, 2 MiB max RSS, '
+                                  '10 voluntary and 3000 involuntary context '
+                                  'switches, 7 minor and 1 major page faults')
+  assert _format_usage({}) == 'no usage'
+
+
+def test_relative_timeout():
+  timeout = relative_timeout(3, 10)
+  assert timeout(None) is None
+  assert timeout(2.0) == 16.0
+
+
+def test_fork_batch_parent(patch):
+  do_fork = patch(_do_fork)
+  do_fork.side_effect = [(True, sentinel.c1), (True, sentinel.c2)]
+  read = patch(_read_reports)
+  read.return_value = [(1.0, {}, {}, {'pid': 1}), (2.0, {}, {}, {'pid': 2})]
+  is_parent, reports = _fork_batch(2, [{0}, {1}], 5)
+  assert is_parent
+  assert [r[:2] for r in reports] == [(1.0, {}), (2.0, {})]
+  assert reports[0][3]['pid'] == 1
+  assert reports[0][3]['start'] <= time.time()
+  timings = reports[1][3]['timings']
+  assert 0 < timings['fork'] <= timings['forked']
+  do_fork.assert_has_calls([call({0}), call({1})])
+  read.assert_called_once_with([sentinel.c1, sentinel.c2], 5)
+
+
+def test_fork_batch_interrupted(patch, monkeypatch):
+  children = [fork_child(monkeypatch, 1, sleep=60)]
+  do_fork = patch(_do_fork)
+  do_fork.side_effect = [(True, children[0]), KeyboardInterrupt]
+  read = patch(_read_reports)
+  with raises(KeyboardInterrupt):
+    _fork_batch(2, [None, None])
+  assert not read.called
+  with raises(ChildProcessError):
+    real_os.waitpid(children[0][0], 0)
+
+
+def test_fork_batch_child(patch):
+  do_fork = patch(_do_fork)
+  do_fork.side_effect = [(True, sentinel.r1), (False, None)]
+  assert _fork_batch(2, [{0}, {1}]) == (False, 1)
+
+
+def test_evaluator_trials(fork):
+  fork.side_effect = [(True, [(1.0, {'rss': 3}, usage, {})])]
+  evaluator = _Evaluator(tuple, [None])
+  assert list(evaluator.evaluate([[1, 2]])) == []
+  assert len(evaluator.trials) == 1
+  trial = evaluator.trials[0]
+  assert trial.vertex == [1, 2]
+  assert trial.objective == 1.0
+  assert trial.metrics == {'rss': 3}
+  assert trial.usage == usage
+  assert repr(trial) == "Trial([1, 2], 1.0, {'rss': 3})"
+
+
+def test_evaluator_timeout(fork):
+  fork.side_effect = [reports(2.0, PENALTY, 1.0), reports(3.0)]
+  timeout = MagicMock(side_effect=[None, 10])
+  evaluator = _Evaluator(tuple, [None] * 3, trial_timeout=timeout)
+  assert list(evaluator.evaluate([[1], [2], [3], [4]])) == []
+  timeout.assert_has_calls([call(None), call(1.0)])
+  fork.assert_has_calls([call(3, [None] * 3, None),
+                         call(1, [None] * 3, 10)])
+  assert evaluator.best == 1.0
+
+
+def test_evaluator_absolute_timeout(fork):
+  fork.side_effect = [reports(2.0)]
+  evaluator = _Evaluator(tuple, [None], trial_timeout=5)
+  assert list(evaluator.evaluate([[1]])) == []
+  fork.assert_called_once_with(1, [None], 5)
+
+
+def test_evaluator_trial_budget(fork):
+  fork.side_effect = [reports(2.0, 1.0), reports(3.0)]
+  evaluator = _Evaluator(tuple, [None] * 2, trial_budget=3)
+  assert list(evaluator.evaluate([[1], [2]])) == []
+  assert not evaluator.exhausted()
+  assert list(evaluator.evaluate([[3]])) == []
+  assert evaluator.exhausted()
+
+
+def test_evaluator_time_budget(fork, patch):
+  monotonic = patch('time.monotonic')
+  monotonic.return_value = 100.0
+  fork.side_effect = [reports(2.0), reports(3.0), reports(4.0)]
+  evaluator = _Evaluator(tuple, [None], trial_timeout=5, time_budget=60)
+  monotonic.return_value = 157.0
+  assert list(evaluator.evaluate([[1]])) == []
+  fork.assert_called_with(1, [None], 3.0)
+  assert not evaluator.exhausted()
+  evaluator.trial_timeout = None
+  assert list(evaluator.evaluate([[2]])) == []
+  fork.assert_called_with(1, [None], 3.0)
+  monotonic.return_value = 161.0
+  assert evaluator.exhausted()
+  assert list(evaluator.evaluate([[3]])) == []
+  fork.assert_called_with(1, [None], 0.0)
+
+
+def run(gen):
+  # runs an evaluation in the parent, returning its objectives
+  with raises(StopIteration) as stop:
+    next(gen)
+  return stop.value.value
+
+
+def test_evaluator_repeats(fork):
+  fork.side_effect = [reports(4.9), reports(5.1), reports(5.0)]
+  evaluator = _Evaluator(tuple, [None], repeats=3)
+  # the first two samples can't tell 5.0 from 5.0
+  assert run(evaluator.evaluate([[1]], [5.0])) == [5.0]
+  assert fork.call_count == 3
+  assert round(evaluator.noise(), 6) == 0.1
+  assert round(evaluator.resolution(), 6) == round(0.1 / 3 ** 0.5, 6)
+
+
+def test_evaluator_repeats_clear(fork):
+  fork.side_effect = [reports(4.0, 9.0)]
+  evaluator = _Evaluator(tuple, [None, None], repeats=5)
+  evaluator._squares, evaluator._dof = 0.5, 2
+  assert run(evaluator.evaluate([[1], [2]], [6.0])) == [4.0, 9.0]
+  assert fork.call_count == 1
+
+
+def test_evaluator_repeats_no_comparison(fork):
+  fork.side_effect = [reports(4.0)]
+  evaluator = _Evaluator(tuple, [None], repeats=5)
+  assert evaluator.resolution() == 0.0
+  assert run(evaluator.evaluate([[1]])) == [4.0]
+
+
+def test_evaluator_repeats_penalty(fork):
+  fork.side_effect = [reports(PENALTY)]
+  evaluator = _Evaluator(tuple, [None], repeats=5)
+  assert run(evaluator.evaluate([[1]], [PENALTY])) == [PENALTY]
+  assert evaluator.noise() is None
+
+
+def test_evaluator_repeats_killed(fork):
+  # a sample killed after a close call decides it
+  fork.side_effect = [reports(5.0), reports(PENALTY)]
+  evaluator = _Evaluator(tuple, [None], repeats=5)
+  assert run(evaluator.evaluate([[1]], [5.0])) == [PENALTY]
+  assert fork.call_count == 2
+
+
+def test_evaluator_repeats_child(fork, exit_child):
+  fork.side_effect = [reports(5.0), (False, 0)]
+  evaluator = _Evaluator(tuple, [None], repeats=5)
+  assert list(evaluator.evaluate([[1]], [5.0])) == [(1,)]
+  exit_child.assert_called_once_with()
+
+
+def test_evaluator_repeats_cached(fork):
+  fork.side_effect = [reports(1.0), reports(3.0), reports(2.0)]
+  evaluator = _Evaluator(tuple, [None], lambda v: int(v[0]), repeats=3,
+                         aggregate='trimmed')
+  assert run(evaluator.evaluate([[1]])) == [1.0]
+  # the cached point gets refined for the comparison
+  assert run(evaluator.evaluate([[1.5]], [2.0])) == [2.0]
+  assert evaluator.cache[1] == [1.0, 3.0, 2.0]
+  assert evaluator.stats['cache_hits'] == 1
+
+
+def test_evaluator_aggregates():
+  assert _Evaluator(tuple, [None], aggregate=max).aggregate([1, 3]) == 3
+  trimmed = _Evaluator(tuple, [None], aggregate='trimmed').aggregate
+  assert trimmed([100, 1, 2, 3, -100]) == 2
+  with raises(ValueError):
+    _Evaluator(tuple, [None], aggregate='mode')
+
+
+def test_evaluator_constraints(fork):
+  fork.side_effect = [(True, [(1.0, {'rss': 20}, usage, {})]),
+                      (True, [(2.0, {'rss': 5}, usage, {})]),
+                      (True, [(PENALTY, {'timed_out': True}, usage, {})])]
+  evaluator = _Evaluator(tuple, [None], constraints={'rss': 10,
+                                                     'max_rss': 2 ** 22})
+  assert run(evaluator.evaluate([[1], [2], [3]])) == [INFEASIBLE * 2, 2.0,
+                                                      PENALTY]
+  assert [t.violation for t in evaluator.trials] == [1, 0, 0]
+  assert evaluator.trials[0].objective == 1.0
+  assert evaluator.best == 2.0
+
+
+def test_evaluator_constraints_penalty(fork):
+  fork.side_effect = [(True, [(1.0, {}, usage, {})])]
+  evaluator = _Evaluator(tuple, [None], constraints={'max_rss': 2 ** 20},
+                         penalty=2)
+  assert run(evaluator.evaluate([[1]])) == [3.0]
+  assert evaluator.best is None
+
+
+def test_evaluator_constraints_missing(fork, caplog):
+  # a trial that doesn't report a constrained metric ranks last
+  fork.side_effect = [(True, [(1.0, {}, usage, {})])]
+  evaluator = _Evaluator(tuple, [None], constraints={'rss': 10})
+  assert run(evaluator.evaluate([[1]])) == [math.inf]
+  assert evaluator.trials[0].violation == math.inf
+  assert evaluator.best is None
+  assert "constraints on ['rss']" in caplog.text
+
+
+def test_evaluator_constraints_repeats(fork):
+  # an infeasible close call is decided, its objective isn't even known
+  fork.side_effect = [(True, [(5.0, {'rss': 20}, usage, {})])]
+  evaluator = _Evaluator(tuple, [None], repeats=5, constraints={'rss': 10})
+  assert run(evaluator.evaluate([[1]], [5.0])) == [INFEASIBLE * 2]
+  assert fork.call_count == 1
+
+
+def test_evaluator_pareto(fork):
+  fork.side_effect = [(True, [(v, {'rss': rss}, usage, {})])
+                      for v, rss in [(1.0, 8), (2.0, 4), (3.0, 6),
+                                     (0.5, 12)]]
+  evaluator = _Evaluator(tuple, [None], constraints={'rss': 10},
+                         pareto=['rss'])
+  run(evaluator.evaluate([[1], [2], [3], [4]]))
+  assert [t.vertex for t in evaluator.front] == [[1], [2]]
+  assert evaluator._tradeoff(evaluator.front[1]) == [2.0, 4]
+
+
+def test_trial_values():
+  trial = Trial([1], 2.0, {'rss': 3, 'max_rss': 4}, usage={'max_rss': 5})
+  assert trial.values() == {'rss': 3, 'max_rss': 4, 'objective': 2.0}
+
+
+def test_evaluator_child(fork, exit_child):
+  fork.side_effect = [reports(1.0), (False, 0)]
+  evaluator = _Evaluator(tuple, [None])
+  attempts = list(evaluator.evaluate([[1, 2], [3, 4]]))
+  assert attempts == [(3, 4)]
+  exit_child.assert_called_once_with()
+
+
+def failed():
+  return (PENALTY, {'failed': True}, {}, {'status': None, 'signal': 11})
+
+
+def test_evaluator_failure_penalty(fork):
+  fork.side_effect = [(True, [failed(), (1.0, {}, {}, {})])]
+  evaluator = _Evaluator(tuple, [None] * 2)
+  assert run(evaluator.evaluate([[1], [2]])) == [PENALTY, 1.0]
+  assert evaluator.trials[0].child['signal'] == 11
+  assert fork.call_count == 1
+
+
+def test_evaluator_failure_retry(fork):
+  fork.side_effect = [(True, [failed(), (1.0, {}, {}, {}), failed()]),
+                      (True, [failed(), (3.0, {}, {}, {})]),
+                      reports(2.0)]
+  evaluator = _Evaluator(tuple, [None] * 3, on_failure='retry', retries=3)
+  assert run(evaluator.evaluate([[1], [2], [3]])) == [2.0, 1.0, 3.0]
+  fork.assert_has_calls([call(3, [None] * 3, None), call(2, [None] * 3, None),
+                         call(1, [None] * 3, None)])
+  # the retried trials keep their number
+  assert evaluator.stats['trials'] == 3
+
+
+def test_evaluator_failure_retries_spent(fork):
+  fork.side_effect = [(True, [failed()]), (True, [failed()])]
+  evaluator = _Evaluator(tuple, [None], on_failure='retry')
+  assert run(evaluator.evaluate([[1]])) == [PENALTY]
+  assert fork.call_count == 2
+
+
+def test_evaluator_failure_retry_child(fork, exit_child, patch):
+  channel_ = patch('channel')
+  hooks = [MagicMock()]
+  fork.side_effect = [(True, [(1.0, {}, {}, {}), failed()]), (False, 0)]
+  evaluator = _Evaluator(tuple, [None] * 2, hooks=hooks, on_failure='retry')
+  assert list(evaluator.evaluate([[1], [2]])) == [(2,)]
+  # the retried trial keeps its number
+  hooks[0].on_trial_start.assert_called_once_with(1, (2,))
+  assert channel_._mark.called
+  exit_child.assert_called_once_with()
+
+
+def test_evaluator_failure_abort(fork):
+  fork.side_effect = [(True, [(1.0, {}, {}, {}), failed()])]
+  evaluator = _Evaluator(tuple, [None] * 2, on_failure='abort')
+  with raises(TrialFailed, match=r'\[\[2\]\]'):
+    run(evaluator.evaluate([[1], [2]]))
+
+
+def test_nelder_mead_failure_abort(patch, simp, fork):
+  fork.side_effect = [reports(1.0), (True, [failed()])]
+  with raises(TrialFailed):
+    list(nelder_mead(sentinel.vertex, sentinel.step_sizes,
+                     on_failure='abort'))
+
+
+def test_evaluator_failure_unknown():
+  with raises(ValueError):
+    _Evaluator(tuple, [None], on_failure='ignore')
+
+
+def test_evaluator_hooks(fork, exit_child, patch):
+  channel_ = patch('channel')
+  hooks = [MagicMock(), MagicMock()]
+  fork.side_effect = [reports(1.0), (False, 0)]
+  evaluator = _Evaluator(tuple, [None], hooks=hooks)
+  gen = evaluator.evaluate([[1, 2], [3, 4]])
+  assert next(gen) == (3, 4)
+  hooks[0].on_trial_start.assert_called_once_with(1, (3, 4))
+  hooks[0].on_trial_end.assert_called_once_with(0, evaluator.trials[0])
+  assert not hooks[0].on_trial_exit.called
+  channel_._mark.assert_called_once_with('start')
+  assert list(gen) == []
+  channel_._mark.assert_called_with('end')
+  hooks[1].on_trial_exit.assert_called_once_with(1, (3, 4))
+  channel_._send_timings.assert_called_once_with()
+  exit_child.assert_called_once_with()
+
+
+def test_evaluator_timings(fork):
+  fork.side_effect = [(True, [(1.0, {}, {}, {'timings': {'fork': 5}})])]
+  evaluator = _Evaluator(tuple, [None])
+  evaluator._ready = 2
+  assert run(evaluator.evaluate([[1]])) == [1.0]
+  trial = evaluator.trials[0]
+  assert trial.child['timings'] == {'ready': 2, 'fork': 5}
+  assert trial.phases() == {'tuner': 3}
+  assert evaluator._ready > 5
+
+
+def test_evaluator_parallel(fork):
+  fork.side_effect = [reports(1.0, 2.0), reports(3.0)]
+  evaluator = _Evaluator(tuple, [{0}, {1}])
+  gen = evaluator.evaluate([[1], [2], [3]])
+  with raises(StopIteration) as stop:
+    next(gen)
+  assert stop.value.value == [1.0, 2.0, 3.0]
+  assert evaluator.stats == {'trials': 3, 'cache_hits': 0, 'cache_misses': 0}
+
+
+def test_evaluator_cache(fork):
+  fork.side_effect = [reports(1.0), reports(2.0), reports(3.0),
+                      reports(4.0)]
+  evaluator = _Evaluator(tuple, [None], lambda v: int(v[0]), cache_size=2)
+  assert list(evaluator.evaluate([[1.2], [1.7], [2.1]])) == []
+  assert fork.call_count == 2
+  assert evaluator.stats == {'trials': 2, 'cache_hits': 1, 'cache_misses': 2}
+  gen = evaluator.evaluate([[2.5], [3.0], [1.0]])
+  with raises(StopIteration) as stop:
+    next(gen)
+  assert stop.value.value == [2.0, 3.0, 1.0]
+  assert evaluator.stats == {'trials': 3, 'cache_hits': 3, 'cache_misses': 3}
+  # 2 was the least recently used when 3 got in
+  gen = evaluator.evaluate([[2.0]])
+  with raises(StopIteration) as stop:
+    next(gen)
+  assert stop.value.value == [4.0]
+  assert list(evaluator.cache) == [3, 2]
 
 
 @mark.parametrize('value', values)
 def test_nelder_mead_parent(patch, simp, stdev, fork, value):
-  fork.side_effect = [(True, v) for v in [1, 2, 3, *value]]
+  fork.side_effect = [reports(v) for v in [1, 2, 3, *value]]
   cb = MagicMock()
   for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb):
     pass
-  fork.assert_has_calls([call()] * (len(value) + 3))
+  fork.assert_has_calls([call(1, [None], None)] * (len(value) + 3))
 
 
 @mark.parametrize('value', values)
 def test_nelder_mead_child(patch, simp, stdev, fork, value):
-  fork.side_effect = [(True, v) for v in
-                      [1, 2, 3, *value[:-1]]] + [(False, value[-1])]
+  fork.side_effect = [reports(v) for v in
+                      [1, 2, 3, *value[:-1]]] + [(False, 0)]
   cb = MagicMock()
   for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb):
     pass
-  fork.assert_has_calls([call()] * (len(value) + 3))
+  fork.assert_has_calls([call(1, [None], None)] * (len(value) + 3))
 
 
 def test_nelder_mead_child_one(patch, simp, stdev, fork):
-  fork.side_effect = [(False, 1)]
+  fork.side_effect = [(False, 0)]
   cb = MagicMock()
   for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb):
     pass
-  fork.assert_has_calls([call()])
+  fork.assert_has_calls([call(1, [None], None)])
+
+
+def test_nelder_mead_penalty(patch, simp, fork):
+  # the reflected vertex times out, the contracted one replaces the worst
+  fork.side_effect = [reports(v) for v in [1, PENALTY, 3, PENALTY, 2]]
+  patch('forking_tuner.strategies.stdev').return_value = 0
+  cb = MagicMock()
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb,
+                             trial_timeout=5):
+    pass
+  objectives = [[o for _, o in c[0][0]] for c in cb.call_args_list]
+  assert objectives == [[1, 3, PENALTY], [1, 2, 3]]
+  fork.assert_called_with(1, [None], 5)
+
+
+def test_nelder_mead_repeats(patch, simp, stdev, fork):
+  # the reflected vertex is a close call with the second best one, measured
+  # until the noise is known and it's clearly the better one
+  fork.side_effect = [reports(v) for v in [1, 2, 3, 2.1, 1.7, 1.5, 1.7]]
+  cb = MagicMock()
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb,
+                             repeats=5):
+    pass
+  assert fork.call_count == 7
+  assert [o for _, o in cb.call_args[0][0]] == [1, 1.7, 2]
+
+
+def test_nelder_mead_lattice(patch):
+  patch('forking_tuner.strategies.stdev').return_value = 5
+  trials = []
+
+  def fork(self, points, fidelity=None, step='', repeat=False):
+    # (x - 1) ** 2 + (y - 1) ** 2, without forking
+    trials.extend(points)
+    return [(x - 1) ** 2 + (y - 1) ** 2 for x, y in points]
+    yield  # pragma: no cover
+
+  patch('_Evaluator._fork', fork)
+  attempts = list(nelder_mead([0, 0], [1, 1], bounds=[(0, 2), (0, 2)],
+                              lattice=[1, 1]))
+  assert attempts == [[1.0, 1.0]]
+  assert len(trials) == len(set(tuple(t) for t in trials))
+  assert all(0 <= x <= 2 and x == int(x) for t in trials for x in t)
+
+
+def test_nelder_mead_cache(patch, simp, stdev, fork):
+  fork.side_effect = [reports(v) for v in [1, 2, 3, 0.5]]
+  cb = MagicMock()
+  # the reflected vertex [-3, -1] runs the same configuration as [2, 3]
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb,
+                             cache_key=lambda v: tuple(v) if v[0] > 0
+                             else (2, 3)):
+    pass
+  assert fork.call_count == 4
+  stats = cb.call_args[0][0].stats
+  assert stats == {'trials': 4, 'cache_hits': 1, 'cache_misses': 4}
+  assert isinstance(cb.call_args[0][0], Simplex)
+  # the first callback got the initial trials, the second the contraction
+  assert [len(c[0][0].trials) for c in cb.call_args_list] == [3, 1]
+
+
+def test_nelder_mead_parallel(patch, simp, stdev, fork):
+  partition = patch('partition_cpus')
+  partition.return_value = [{0, 1}, {2, 3}]
+  fork.side_effect = [reports(1, 2), reports(3), reports(1.5)]
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes,
+                             parallel=2):
+    pass
+  partition.assert_called_once_with(2)
+  fork.assert_has_calls([call(2, [{0, 1}, {2, 3}], None),
+                         call(1, [{0, 1}, {2, 3}], None),
+                         call(1, [{0, 1}, {2, 3}], None)])
+
+
+def test_nelder_mead_parallel_unpinned(patch, simp, stdev, fork, caplog):
+  # more children than CPUs
+  patch('partition_cpus').side_effect = ValueError('cannot split')
+  fork.side_effect = [reports(1, 2), reports(3), reports(1.5)]
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes,
+                             parallel=2):
+    pass
+  fork.assert_has_calls([call(2, [None, None], None)])
+  assert 'without pinning them: cannot split' in caplog.text
+
+
+def test_tune_grid_search(patch, fork):
+  fork.side_effect = [reports(3.0), reports(1.0), reports(2.0)]
+  cb = MagicMock()
+  attempts = list(tune(GridSearch([(0, 2)], batch_size=2), tuple, cb=cb))
+  assert attempts == [(1.0,)]
+  assert [len(c[0][0].trials) for c in cb.call_args_list] == [2, 1]
+  assert cb.call_args[0][0] == [[(1.0,), 1.0], [(2.0,), 2.0], [(0.0,), 3.0]]
+
+
+def test_tune_trials(patch, fork):
+  # the strategy counts the trials, not the cache hits
+  fork.side_effect = [reports(3.0)]
+  strategy = GridSearch([(0, 2)], batch_size=1)
+  assert list(tune(strategy, cache_key=lambda v: 0)) == [[0.0]]
+  assert (len(strategy.history), strategy.trials) == (3, 1)
+
+
+def test_tune_fidelity(patch, fork):
+  fork.side_effect = [reports(3.0), reports(1.0), reports(2.0), reports(1.5)]
+  cb = MagicMock()
+  strategy = SuccessiveHalving([[0], [1], [2]], max_fidelity=3)
+  attempts = list(tune(strategy, cb=cb))
+  assert attempts == [[1.0]]
+  trials = cb.call_args[0][0].trials
+  assert [(t.vertex, t.fidelity) for t in trials] == [([1.0], 3)]
+
+
+def test_evaluator_fidelity(fork, monkeypatch):
+  monkeypatch.setattr(channel, '_fidelity', None)
+  fork.side_effect = [reports(1.0), reports(2.0), (False, 0)]
+  evaluator = _Evaluator(tuple, [None], tuple)
+  assert list(evaluator.evaluate([[1]], fidelity=1)) == []
+  assert list(evaluator.evaluate([[1]], fidelity=3)) == []
+  assert list(evaluator.cache) == [(1, (1,)), (3, (1,))]
+  assert list(evaluator.evaluate([[2]], fidelity=9)) == [(2,)]
+  assert channel.fidelity() == 9
+
+
+def test_nelder_mead_setup(patch, simp, stdev, fork):
+  gc = patch('forking_tuner.shared.gc')
+  gc.get_freeze_count.return_value = 0
+  fork.side_effect = [reports(v) for v in [1, 2, 3, 1.5]]
+  setup = MagicMock(return_value=sentinel.resources)
+  gen = nelder_mead(sentinel.vertex, sentinel.step_sizes, setup=setup)
+  setup.assert_not_called()
+  for attempt in gen:
+    assert resources() is sentinel.resources
+  setup.assert_called_once_with()
+  gc.freeze.assert_called_once_with()
+  # the parent's objects are collected again once tuning ends
+  gc.unfreeze.assert_called_once_with()
+
+
+def test_nelder_mead_pareto(patch, simp, stdev, fork):
+  fork.side_effect = [(True, [(v, {'rss': rss}, usage, {})])
+                      for v, rss in [(1, 9), (2, 4), (3, 20), (1.5, 2)]]
+  cb = MagicMock()
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes, cb=cb,
+                             constraints={'rss': 10}, pareto=['rss']):
+    pass
+  objectives = [[o for _, o in c[0][0]] for c in cb.call_args_list]
+  assert objectives == [[1, 2, INFEASIBLE * 2], [1, 1.5, 2]]
+  assert [t.objective for t in cb.call_args[0][0].pareto] == [1, 1.5]
+
+
+def test_nelder_mead_checkpoint(patch, fork, tmp_path):
+  patch('forking_tuner.strategies.stdev').return_value = 5
+  path = str(tmp_path / 'run.json')
+
+  def quadratic(count, partitions, timeout):
+    if fork.call_count > fork.limit:
+      raise RuntimeError('killed')
+    point = fork.points.pop(0)
+    return reports((point[0] - 1) ** 2 + (point[1] - 2) ** 2)
+
+  # `_fork_batch` doesn't know the points, capture them from the evaluator
+  evaluate = _Evaluator._fork
+
+  def capture(self, points, *args):
+    fork.points = list(points)
+    return (yield from evaluate(self, points, *args))
+
+  patch('_Evaluator._fork', capture)
+  fork.side_effect = quadratic
+  fork.limit = 100
+  complete = list(nelder_mead([0, 0], iterations=8))
+  forks = fork.call_count
+
+  # the parent dies during its 6th trial
+  fork.reset_mock()
+  fork.limit = 5
+  with raises(RuntimeError):
+    list(nelder_mead([0, 0], iterations=8, checkpoint=path))
+  fork.reset_mock()
+  fork.limit = 100
+  assert list(nelder_mead([0, 0], iterations=8, checkpoint=path)) == complete
+  assert fork.call_count == forks - 5
+
+
+def test_nelder_mead_trace(patch, simp, stdev, fork, tmp_path):
+  fork.side_effect = [reports(v) for v in [1, 2, 3, 1.5]]
+  path = tmp_path / 'trace.jsonl'
+  for attempt in nelder_mead(sentinel.vertex, sentinel.step_sizes,
+                             trace=str(path)):
+    pass
+  records = [json.loads(line) for line in path.read_text().splitlines()]
+  assert [r['step'] for r in records] == ['initial'] * 3 + ['reflect']
+  assert [r['vertex'] for r in records] == [[2, 3], [4, 7], [9, 11],
+                                            [-3.0, -1.0]]
+
+
+def quadratic(vertex):
+  return (vertex[0] - 5) ** 2 + (vertex[1] - 7) ** 2
+
+
+def test_minimize(fork):
+  cb = MagicMock()
+  vertex, objective = minimize(quadratic, [22, 2], [11, 1], threshold=1e-8,
+                               cb=cb)
+  assert [round(x, 3) for x in vertex] == [5, 7]
+  assert objective < 1e-6
+  assert not fork.called
+  trials = cb.call_args_list[0][0][0].trials
+  trial = next(t for t in trials if t.vertex == [22, 2])
+  assert trial.objective == 314
+  assert trial.child['end'] >= trial.child['start']
+  assert trial.phases()['workload'] > 0
+
+
+def test_minimize_slightly_infeasible():
+  def objective(vertex):
+    # every initial vertex uses 3% more memory than the limit
+    return quadratic(vertex), {'mem': 100 + vertex[0] - 19}
+
+  vertex, value = minimize(objective, [22, 2], [1, 1],
+                           constraints={'mem': 100})
+  assert value < INFEASIBLE
+  assert vertex[0] <= 19
+
+
+def test_minimize_metrics(tmp_path):
+  path = str(tmp_path / 'trace.jsonl')
+
+  def objective(vertex):
+    return quadratic(vertex), {'threads': vertex[0] * 2}
+
+  vertex, _ = minimize(objective, (8, 8), [2, 2], bounds=[(1, 10), (1, 10)],
+                       lattice=[1, 1], constraints={'threads': 12},
+                       trace=path)
+  assert vertex == (5, 7)
+  with open(path) as f:
+    records = [json.loads(line) for line in f]
+  record = next(r for r in records if r['vertex'] == [8, 8])
+  assert record['metrics'] == {'threads': 16}
+  assert record['violation'] > 0
+  # the lattice caches every visited vertex
+  assert len({tuple(r['vertex']) for r in records}) == len(records)
+
+
+def test_minimize_thread_pool():
+  calls = []
+
+  def objective(vertex):
+    calls.append(vertex)
+    return quadratic(vertex)
+
+  with ThreadPoolExecutor(3) as executor:
+    vertex, _ = minimize(objective, [22, 2], [11, 1], threshold=1e-8,
+                         executor=executor, parallel=3)
+  assert [round(x, 3) for x in vertex] == [5, 7]
+  assert sorted(calls[:3]) == [[22, 2], [22, 3], [33, 2]]
+
+
+def test_minimize_parallel(patch):
+  # as many vertices at once as CPUs with an executor, one without
+  evaluator = patch('_CallEvaluator')
+  patch('os.cpu_count').return_value = 6
+  minimize(quadratic, [22, 2], [11, 1], executor=sentinel.executor)
+  assert evaluator.call_args[0][3] == 6
+  patch('os.cpu_count').return_value = None
+  minimize(quadratic, [22, 2], [11, 1], executor=sentinel.executor)
+  minimize(quadratic, [22, 2], [11, 1])
+  assert [c[0][3] for c in evaluator.call_args_list] == [6, 1, 1]
+
+
+def test_minimize_process_pool():
+  with ProcessPoolExecutor(2) as executor:
+    vertex, _ = minimize(quadratic, [22, 2], [11, 1], iterations=20,
+                         executor=executor, parallel=3)
+  assert quadratic(vertex) < quadratic([22, 2])
+
+
+def test_minimize_trial_budget():
+  values = []
+
+  def objective(vertex):
+    values.append(quadratic(vertex))
+    return values[-1]
+
+  _, best = minimize(objective, [22, 2], [11, 1], threshold=1e-8,
+                     trial_budget=10)
+  assert len(values) == 10
+  assert best == min(values)
+
+
+def test_minimize_restarts(tmp_path):
+  path = str(tmp_path / 'trace.jsonl')
+  # improvements below 1e-3 don't count, the search stalls
+  vertex, _ = minimize(lambda v: round(quadratic(v), 3), [22, 2], [11, 1],
+                       iterations=1000, threshold=0, patience=10, restarts=2,
+                       trace=path)
+  with open(path) as f:
+    steps = [json.loads(line)['step'] for line in f]
+  assert steps.count('restart') == 2 * 2
+  assert len(steps) < 200
+  assert quadratic(vertex) < 1e-2
+
+
+def test_minimize_adaptive():
+  def objective(vertex):
+    return sum((x - i) ** 2 for i, x in enumerate(vertex))
+
+  vertex, best = minimize(objective, [0] * 8, iterations=1000,
+                          threshold=1e-10, adaptive=True, full_shrink=False)
+  assert best < 1e-4
+  assert [round(x) for x in vertex] == list(range(8))
+
+
+def test_minimize_none(patch):
+  patch('NelderMead').return_value.best.return_value = None
+  patch(_search).return_value = iter(())
+  assert minimize(quadratic, [1, 2]) is None
+
+
+def test_call_evaluator_fidelity():
+  objective = MagicMock(return_value=2.5)
+  evaluator = _CallEvaluator(objective, None, tuple, 2)
+  assert run(evaluator.evaluate([[1, 2]], fidelity=3)) == [2.5]
+  objective.assert_called_once_with((1, 2), fidelity=3)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+from pytest import fixture, raises
+
+from forking_tuner import affinity
+from forking_tuner.affinity import partition_cpus, place, placement_space
+from forking_tuner.affinity import set_placement, _parse_cpulist
+from testing import forked_metrics
+
+
+@fixture
+def sysfs(tmp_path, monkeypatch):
+  """
+  Two sockets with two cores each, SMT siblings numbered `n` and `n + 4`.
+  """
+  cpu, node = tmp_path / 'cpu', tmp_path / 'node'
+  for i in range(8):
+    topology = cpu / f'cpu{i}' / 'topology'
+    topology.mkdir(parents=True)
+    (topology / 'physical_package_id').write_text(f'{i % 4 // 2}\n')
+    (topology / 'core_id').write_text(f'{i % 2}\n')
+  for i, cpulist in enumerate(['0-1,4-5', '2-3,6-7']):
+    (node / f'node{i}').mkdir(parents=True)
+    (node / f'node{i}' / 'cpulist').write_text(cpulist + '\n')
+  (node / 'online').write_text('0-1\n')
+  monkeypatch.setattr(affinity, '_CPU_PATH', str(cpu))
+  monkeypatch.setattr(affinity, '_NODE_PATH', str(node))
+  monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: set(range(8)))
+
+
+def test_parse_cpulist():
+  assert _parse_cpulist('0-2,5,7-8\n') == [0, 1, 2, 5, 7, 8]
+  assert _parse_cpulist('\n') == []
+
+
+def test_online_cpus(sysfs, tmp_path):
+  (tmp_path / 'cpu' / 'online').write_text('0-3,6\n')
+  assert affinity._online_cpus() == [0, 1, 2, 3, 6]
+  # the topology of CPUs this process may not run on
+  assert affinity._sockets([1, 3, 6]) == [[[1]], [[6], [3]]]
+
+
+def test_online_cpus_no_sysfs(sysfs, patch):
+  patch('os.cpu_count').return_value = 4
+  assert affinity._online_cpus() == [0, 1, 2, 3]
+  patch('os.cpu_count').return_value = None
+  assert affinity._online_cpus() == [0]
+
+
+def test_partition_cpus_numa(sysfs):
+  assert partition_cpus(2) == [{0, 1, 4, 5}, {2, 3, 6, 7}]
+
+
+def test_partition_cpus_cores(sysfs):
+  assert partition_cpus(4) == [{0, 4}, {1, 5}, {2, 6}, {3, 7}]
+
+
+def test_partition_cpus_remainder(sysfs):
+  assert partition_cpus(3) == [{0, 4}, {1, 5}, {2, 6}]
+
+
+def test_partition_cpus_too_many(sysfs):
+  with raises(ValueError):
+    partition_cpus(9)
+
+
+def test_partition_cpus_no_sysfs(sysfs, monkeypatch):
+  monkeypatch.setattr(affinity, '_CPU_PATH', '/nonexistent')
+  monkeypatch.setattr(affinity, '_NODE_PATH', '/nonexistent')
+  assert partition_cpus(2) == [{0, 1, 2, 3}, {4, 5, 6, 7}]
+
+
+def test_place_compact(sysfs):
+  assert place(2) == {0, 4}
+  assert place(3) == {0, 1, 4}
+  assert place(2, smt=False) == {0, 1}
+  assert place(0) == {0}
+
+
+def test_place_scatter(sysfs):
+  assert place(2, scatter=True) == {0, 2}
+  assert place(4, scatter=True) == {0, 1, 2, 3}
+  assert place(6, scatter=True) == {0, 1, 2, 3, 4, 6}
+
+
+def test_place_sockets(sysfs):
+  assert place(4, sockets=1) == {0, 1, 4, 5}
+  assert place(8, sockets=1, smt=False) == {0, 1}
+  assert place(3, True, sockets=1) == {0, 1, 4}
+
+
+def test_placement_space(sysfs):
+  assert placement_space() == ([(1, 8), (0, 1), (1, 2), (0, 1)], [1] * 4)
+
+
+def test_set_placement(sysfs, patch):
+  setaffinity = patch('os.sched_setaffinity')
+  assert set_placement([3.2, 1, 2, 0]) == {0, 1, 2}
+  setaffinity.assert_called_once_with(0, {0, 1, 2})
+  assert set_placement([2, 0, 0, 1]) == {0, 4}
+
+
+def test_set_placement_child(tmp_path):
+  allowed = os.sched_getaffinity(0)
+
+  def trial(vertex):
+    cpus = set_placement(vertex + [0, 1, 1])
+    return {'cpus': sorted(cpus), 'affinity': sorted(os.sched_getaffinity(0))}
+
+  metrics = forked_metrics(tmp_path / 'trace.jsonl', [(1, 1)], trial)
+  assert len(metrics[0]['cpus']) == 1
+  assert metrics[0]['affinity'] == metrics[0]['cpus']
+  assert os.sched_getaffinity(0) == allowed
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import json
+import os
+import sys
+import time
+
+from mock import MagicMock
+from pytest import raises
+
+from forking_tuner import PENALTY, Trial, aio
+from forking_tuner.strategies import GridSearch, NelderMead, SuccessiveHalving
+
+
+def quadratic(vertex):
+  return (vertex[0] - 5) ** 2 + (vertex[1] - 7) ** 2
+
+
+def test_run():
+  status, output = asyncio.run(aio.run([sys.executable, '-c',
+                                        'import os; print(os.environ["X"])'],
+                                       {'X': '5'}))
+  assert (status, output) == (0, '5\n')
+
+
+def test_run_timeout():
+  start = time.monotonic()
+  assert asyncio.run(aio.run(['sleep', '60'], timeout=0.2)) == (None, '')
+  assert time.monotonic() - start < 30
+
+
+def test_run_timeout_output():
+  # what the command printed before it was killed
+  command = [sys.executable, '-c', 'import time; print(1, flush=True); '
+             'time.sleep(60)']
+  assert asyncio.run(aio.run(command, timeout=1)) == (None, '1\n')
+
+
+def test_run_cancelled(tmp_path):
+  pid_file = tmp_path / 'pid'
+
+  async def cancel():
+    command = ['sh', '-c', f'echo $$ > {pid_file}; exec sleep 60']
+    task = asyncio.ensure_future(aio.run(command))
+    while not pid_file.exists() or not pid_file.read_text():
+      await asyncio.sleep(0.01)
+    task.cancel()
+    with raises(asyncio.CancelledError):
+      await task
+
+  asyncio.run(cancel())
+  with raises(ProcessLookupError):
+    os.kill(int(pid_file.read_text()), 0)
+
+
+def test_tune():
+  calls = []
+
+  async def trial(vertex):
+    calls.append(vertex)
+    await asyncio.sleep(0)
+    return quadratic(vertex)
+
+  cb = MagicMock()
+  vertex, objective = asyncio.run(aio.tune(NelderMead([22, 2], [11, 1],
+                                                      threshold=1e-8),
+                                           trial, tuple, cb, parallel=3))
+  assert [round(x, 3) for x in vertex] == [5, 7]
+  assert objective < 1e-6
+  assert isinstance(vertex, tuple) and isinstance(calls[0], tuple)
+  assert cb.called
+
+
+def test_tune_concurrent():
+  running = []
+  peak = []
+
+  async def trial(vertex):
+    running.append(vertex)
+    peak.append(len(running))
+    await asyncio.sleep(0.01)
+    running.remove(vertex)
+    return quadratic(vertex)
+
+  async def sessions():
+    return await asyncio.gather(aio.tune(GridSearch([(4, 6), (6, 8)]), trial),
+                                aio.tune(GridSearch([(3, 5), (7, 9)]), trial))
+
+  assert asyncio.run(sessions()) == [([5, 7], 0), ([5, 7], 0)]
+  assert max(peak) == 2
+
+
+def test_trials(tmp_path):
+  path = str(tmp_path / 'trace.jsonl')
+
+  async def trial(vertex):
+    return quadratic(vertex), {'threads': vertex[0]}
+
+  async def collect():
+    return [t async for t in aio.trials(GridSearch([(4, 5), (7, 7)]), trial,
+                                        constraints={'threads': 4},
+                                        trace=path)]
+
+  trials = asyncio.run(collect())
+  assert all(isinstance(t, Trial) for t in trials)
+  found = [(t.vertex, t.objective, t.violation) for t in trials]
+  assert found == [([4.0, 7.0], 1, 0.0), ([5.0, 7.0], 0, 0.25)]
+  assert trials[0].phases()['workload'] >= 0
+  with open(path) as f:
+    metrics = [json.loads(line)['metrics'] for line in f]
+  assert metrics == [{'threads': 4}, {'threads': 5}]
+
+
+def test_trials_fidelity():
+  fidelities = []
+
+  async def trial(vertex, fidelity):
+    fidelities.append(fidelity)
+    return quadratic(vertex) / fidelity
+
+  strategy = SuccessiveHalving([[5, 7], [1, 1], [9, 9]], eta=3,
+                               max_fidelity=3)
+  assert asyncio.run(aio.tune(strategy, trial)) == ([5, 7], 0)
+  assert fidelities == [1, 1, 1, 3]
+
+
+def test_trials_timeout():
+  async def trial(vertex):
+    await asyncio.sleep(60 if vertex[0] == 2 else 0)
+    return vertex[0]
+
+  async def collect():
+    return [t async for t in aio.trials(GridSearch([(1, 2)]), trial,
+                                        trial_timeout=0.1)]
+
+  trials = asyncio.run(collect())
+  found = [(t.objective, t.metrics) for t in trials]
+  assert found == [(1, {}), (PENALTY, {'timed_out': True})]
+
+
+def test_trials_error():
+  cancelled = []
+
+  async def trial(vertex):
+    if vertex[0] == 1:
+      raise ValueError(vertex)
+    try:
+      await asyncio.sleep(60)
+    except asyncio.CancelledError:
+      cancelled.append(vertex)
+      raise
+
+  with raises(ValueError):
+    asyncio.run(aio.tune(GridSearch([(1, 2)]), trial, parallel=2))
+  assert cancelled == [[2.0]]
+
+
+def test_tune_none():
+  strategy = MagicMock(constrained=False, iteration=0)
+  strategy.ask.return_value = None
+  strategy.best.return_value = None
+  assert asyncio.run(aio.tune(strategy, MagicMock())) is None
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+from pytest import fixture
+
+from forking_tuner import channel
+from forking_tuner.channel import parse_records, report, _open
+
+
+@fixture
+def pipe(monkeypatch):
+  r, w = os.pipe()
+  monkeypatch.setattr(channel, '_fd', None)
+  yield r, w
+  os.close(r)
+
+
+def read_record(fd):
+  # what the tuner reads from a child's channel until it closes
+  data = b''
+  while True:
+    chunk = os.read(fd, 65536)
+    if not chunk:
+      return parse_records(data)
+    data += chunk
+
+
+def test_report_outside_trial(pipe):
+  assert report(1.5, rss=3) == 1.5
+
+
+def test_report(pipe):
+  r, w = pipe
+  _open(w)
+  assert report(2) == 2
+  os.close(w)
+  assert read_record(r) == (2.0, {})
+
+
+def test_report_last_wins(pipe):
+  r, w = pipe
+  _open(w)
+  report(2, rss=4)
+  report(1.25, rss=5, name='x')
+  os.close(w)
+  assert read_record(r) == (1.25, {'rss': 5, 'name': 'x'})
+
+
+def test_parse_records_none(pipe):
+  r, w = pipe
+  os.close(w)
+  assert read_record(r) is None
+
+
+def test_parse_records_truncated(pipe):
+  r, w = pipe
+  _open(w)
+  report(3, rss=1)
+  os.write(w, channel._HEADER.pack(4.0, 100) + b'{"rss"')
+  os.close(w)
+  assert read_record(r) == (3.0, {'rss': 1})
+
+
+def test_fidelity(monkeypatch):
+  monkeypatch.setattr(channel, '_fidelity', None)
+  assert channel.fidelity() is None
+  assert channel.fidelity(10) == 10
+  monkeypatch.setattr(channel, '_fidelity', 3)
+  assert channel.fidelity(10) == 3
+
+
+def test_in_trial(pipe):
+  r, w = pipe
+  assert not channel.in_trial()
+  _open(w)
+  assert channel.in_trial()
+  os.close(w)
+
+
+def test_timings(pipe):
+  r, w = pipe
+  channel._send_timings()
+  _open(w)
+  assert set(channel._timings) == {'child'}
+  report(2, rss=4)
+  channel._mark('start')
+  channel._send_timings()
+  os.close(w)
+  data = os.read(r, 65536)
+  assert channel.parse_records(data) == (2.0, {'rss': 4})
+  timings = channel.parse_timings(data)
+  assert 0 < timings['child'] <= timings['start']
+
+
+def test_parse_timings_none():
+  assert channel.parse_timings(channel._HEADER.pack(1.0, 0)) == {}
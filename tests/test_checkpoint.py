@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import math
+
+from pytest import fixture, raises
+
+from forking_tuner.checkpoint import Checkpoint
+
+
+@fixture
+def path(tmp_path):
+  return str(tmp_path / 'run.json')
+
+
+def test_record(path):
+  checkpoint = Checkpoint(path)
+  assert checkpoint.replay([[1.0]]) is None
+  checkpoint.record([[1.0], [2.0]], None, [(1.5, {'rss': 3}, {}, {'pid': 1}),
+                                           (math.inf, {}, {}, {'pid': 1})])
+  checkpoint.record([[3.0]], 9, [(0.5, {}, {'max_rss': 4}, {'pid': 1})])
+  with open(path) as f:
+    lines = f.read().splitlines()
+  assert json.loads(lines[0]) == {'version': 2}
+  assert [json.loads(line)['vertex'] for line in lines[1:]] == [[1.0], [2.0],
+                                                                [3.0]]
+
+  resumed = Checkpoint(path)
+  assert resumed.replay([[1.0], [2.0]]) == [(1.5, {'rss': 3}, {}, {'pid': 1}),
+                                            (math.inf, {}, {}, {'pid': 1})]
+  assert resumed.replay([[3.0]], 9) == [(0.5, {}, {'max_rss': 4}, {'pid': 1})]
+  assert resumed.replay([[4.0]]) is None
+
+
+def test_replay_diverged(path):
+  checkpoint = Checkpoint(path)
+  checkpoint.record([[1.0], [2.0], [3.0]], None,
+                    [(1.0, {}, {}, {'pid': 1})] * 3)
+  resumed = Checkpoint(path)
+  assert resumed.replay([[1.0]]) == [(1.0, {}, {}, {'pid': 1})]
+  # the fidelity differs
+  assert resumed.replay([[2.0]], 3) is None
+  assert resumed.replay([[2.0]]) is None
+  resumed.record([[5.0]], None, [(5.0, {}, {}, {'pid': 1})])
+  assert [t['vertex'] for t in resumed.trials] == [[1.0], [5.0]]
+  # the discarded trials are gone from the file as well
+  assert [t['vertex'] for t in Checkpoint(path).trials] == [[1.0], [5.0]]
+
+
+def test_replay_cut_short(path):
+  checkpoint = Checkpoint(path)
+  checkpoint.record([[1.0], [2.0]], None, [(1.0, {}, {}, {'pid': 1})] * 2)
+  with open(path, 'a') as f:
+    f.write('{"vertex": [3.0], "fid')
+  resumed = Checkpoint(path)
+  assert resumed.replay([[1.0], [2.0]]) == [(1.0, {}, {}, {'pid': 1})] * 2
+  resumed.record([[3.0]], None, [(3.0, {}, {}, {'pid': 1})])
+  assert [t['vertex'] for t in Checkpoint(path).trials] == [[1.0], [2.0],
+                                                            [3.0]]
+
+
+def test_replay_partial(path):
+  checkpoint = Checkpoint(path)
+  checkpoint.record([[1.0]], None, [(1.0, {}, {}, {'pid': 1})])
+  assert Checkpoint(path).replay([[1.0], [2.0]]) is None
+
+
+def test_version(path):
+  with open(path, 'w') as f:
+    json.dump({'version': 1, 'trials': []}, f)
+  with raises(ValueError):
+    Checkpoint(path)
+
+
+def test_empty(path):
+  open(path, 'w').close()
+  with raises(ValueError):
+    Checkpoint(path)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import re
+import sys
+
+from mock import MagicMock, call
+from pytest import fixture, mark, raises
+
+from forking_tuner import PENALTY
+from forking_tuner.cli import Param, extract, main, parse_param, run, trial
+
+
+def test_parse_param():
+  param = parse_param('THREADS=1:56')
+  assert (param.name, param.low, param.high) == ('THREADS', 1, 56)
+  assert (param.step, param.start) == (1, 28.5)
+  param = parse_param('RATIO=0:1:0:0.25')
+  assert (param.low, param.high, param.step, param.start) == (0, 1, 0, 0.25)
+
+
+@mark.parametrize('spec', ['THREADS', '=1:2', 'THREADS=1', 'X=1:2:3:4:5',
+                           'X=a:2', 'X=3:2'])
+def test_parse_param_invalid(spec):
+  with raises(argparse.ArgumentTypeError):
+    parse_param(spec)
+
+
+def test_param_format():
+  assert Param('X', 1, 56).format(7.4) == '7'
+  assert Param('X', 0, 200, step=10).format(30.0) == '30'
+  assert Param('X', 0, 1, step=0).format(0.25) == '0.25'
+  assert Param('X', 0.5, 2, step=0.5).format(1.5) == '1.5'
+
+
+def test_extract():
+  output = 'latency: 3.5 ms\nlatency: 2.5 ms\n'
+  assert extract(re.compile(r'latency: ([0-9.]+)'), output) == 2.5
+  assert extract(re.compile(r'[0-9.]+(?= ms)'), output) == 2.5
+  assert extract(re.compile(r'throughput: ([0-9.]+)'), output) is None
+  assert extract(re.compile(r'latency: (\S+)'), 'latency: n/a') is None
+
+
+def test_run():
+  status, output = run([sys.executable, '-c', 'import os, sys; '
+                        'print(os.environ["X"]); sys.exit(3)'], {'X': '5'})
+  assert (status, output) == (3, '5\n')
+
+
+def test_run_timeout():
+  status, output = run([sys.executable, '-c', 'import time; print(1, '
+                        'flush=True); time.sleep(60)'], {}, timeout=1)
+  assert (status, output) == (None, '1\n')
+
+
+@fixture
+def run_(patch):
+  return patch('run', MagicMock(return_value=(0, 'cost 4.5\n')))
+
+
+def test_trial(run_, monkeypatch):
+  monkeypatch.setattr('os.environ', {'PATH': '/bin'})
+  params = [Param('X', 1, 8), Param('Y', 0, 1, step=0)]
+  result = trial(params, [3.0, 0.5], ['cmd'], re.compile(r'cost (\S+)'))
+  assert result == (4.5, {'metric': 4.5})
+  run_.assert_called_once_with(['cmd'], {'PATH': '/bin', 'X': '3',
+                                         'Y': '0.5'}, None)
+
+
+def test_trial_maximize(run_):
+  assert trial([Param('X', 1, 8)], [3], ['cmd'], re.compile(r'cost (\S+)'),
+               True, 5) == (-4.5, {'metric': 4.5})
+  assert run_.call_args[0][2] == 5
+
+
+@mark.parametrize('status,output', [(1, 'cost 4.5\n'), (None, 'cost 4.5\n'),
+                                    (0, 'crashed\n')])
+def test_trial_failed(run_, status, output):
+  run_.return_value = (status, output)
+  result = trial([Param('X', 1, 8)], [3], ['cmd'], re.compile(r'cost (\S+)'))
+  assert result == (PENALTY, {'status': status, 'output': output})
+
+
+argv = ['--param', 'X=0:8', '--param', 'Y=0:1:0:0.25', '--metric',
+        r'cost (\S+)', '--timeout', '5', '--', 'cmd', '--arg']
+
+
+@fixture
+def tune(patch):
+  def tune_(strategy, **kw):
+    tune_.strategy = strategy
+    strategy.simplex = [(3.0, [2, 0.5]), (1.5, [1, 0.25])]
+    yield [1, 0.25]
+
+  tune_.strategy = None
+  return patch('tune', MagicMock(side_effect=tune_))
+
+
+def test_main_parent(tune, patch, capsys):
+  patch('in_trial').return_value = False
+  trial_ = patch('trial')
+  assert main(argv) == 0
+  assert not trial_.called
+  strategy = tune.side_effect.strategy
+  assert strategy.vertex == [4, 0.25]
+  assert strategy.bounds == [(0, 8), (0, 1)]
+  assert strategy.lattice == [1, 0]
+  assert (strategy.patience, strategy.restarts) == (None, 0)
+  assert tune.call_args[1]['trial_timeout'] == 15
+  assert tune.call_args[1]['time_budget'] is None
+  assert capsys.readouterr().out == 'X=1 Y=0.25\ncost (\\S+): 1.5\n'
+
+
+def test_main_child(tune, patch):
+  patch('in_trial').return_value = True
+  trial_ = patch('trial', MagicMock(return_value=(2.0, {'metric': 2.0})))
+  report = patch('report')
+  main(argv)
+  params, vertex, command, metric, maximize, timeout = trial_.call_args[0]
+  assert [p.name for p in params] == ['X', 'Y']
+  assert (vertex, command) == ([1, 0.25], ['cmd', '--arg'])
+  assert (maximize, timeout) == (False, 5)
+  assert report.call_args == call(2.0, metric=2.0)
+
+
+def test_main_maximize(tune, patch, capsys):
+  patch('in_trial').return_value = False
+  patch('set_log_level')
+  assert main(['--maximize', '-v'] + argv) == 0
+  assert capsys.readouterr().out.endswith(': -1.5\n')
+
+
+def test_main_budgets(tune, patch):
+  patch('in_trial').return_value = False
+  assert main(['--patience', '20', '--restarts', '2', '--time-budget', '600',
+               '--trial-budget', '100'] + argv) == 0
+  strategy = tune.side_effect.strategy
+  assert (strategy.patience, strategy.restarts) == (20, 2)
+  assert tune.call_args[1]['time_budget'] == 600
+  assert tune.call_args[1]['trial_budget'] == 100
+
+
+def test_main_infeasible(patch, capsys):
+  def tune_(strategy, **kw):
+    strategy.simplex = [(PENALTY, [4, 0.25])]
+    yield [4, 0.25]
+
+  patch('tune', MagicMock(side_effect=tune_))
+  patch('in_trial').return_value = False
+  assert main(argv) == 1
+  assert 'metric' in capsys.readouterr().err
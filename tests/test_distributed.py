@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+import socket
+import threading
+
+from mock import MagicMock
+from pytest import fixture, raises
+
+from forking_tuner import distributed, report
+from forking_tuner.channel import in_trial
+from forking_tuner.distributed import Coordinator, worker
+from forking_tuner.strategies import GridSearch
+
+
+def quadratic(vertex):
+  return (vertex[0] - 2) ** 2 + (vertex[1] - 1) ** 2
+
+
+def work(address, **kw):
+  # the tuning loop of a worker, in a thread
+  def loop():
+    for vertex in worker(address, connect_timeout=10, **kw):
+      assert in_trial()
+      report(quadratic(vertex))
+
+  thread = threading.Thread(target=loop)
+  thread.start()
+  return thread
+
+
+@fixture
+def coordinator(tmp_path):
+  coordinator = Coordinator(str(tmp_path / 'socket'))
+  yield coordinator
+  if coordinator.listener.fileno() != -1:
+    coordinator.close()
+
+
+def test_tune(coordinator, tmp_path, patch):
+  patch('forking_tuner.partition_cpus').return_value = [{0}, {0}]
+  threads = [work(coordinator.address), work(coordinator.address, parallel=2)]
+  cb = MagicMock()
+  trace = tmp_path / 'trace.jsonl'
+  best = coordinator.tune(GridSearch([(0, 4), (0, 3)], batch_size=7),
+                          cb=cb, trace=str(trace))
+  assert best == ([2.0, 1.0], 0.0)
+  assert cb.called
+  coordinator.close()
+  for thread in threads:
+    thread.join(10)
+    assert not thread.is_alive()
+  records = [json.loads(line) for line in trace.read_text().splitlines()]
+  grid = [[x, y] for x in range(5) for y in range(4)]
+  assert sorted(r['vertex'] for r in records) == grid
+  assert all(r['objective'] == quadratic(r['vertex']) for r in records)
+  assert all(r['timings']['ready'] <= r['timings']['fork'] for r in records)
+  assert not (tmp_path / 'socket').exists()
+
+
+def test_tune_tcp():
+  with Coordinator(('127.0.0.1', 0)) as coordinator:
+    host, port = coordinator.address
+    assert port
+    thread = work((host, port))
+    best = coordinator.tune(GridSearch([(1, 3), (0, 2)]), vertex_type=tuple)
+    assert best == ((2.0, 1.0), 0.0)
+    sock = coordinator.workers[0].sock
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+  thread.join(10)
+  assert not thread.is_alive()
+
+
+def test_tune_requeue(coordinator):
+  # a worker that leaves with its trials, then one that evaluates them
+  lost = socket.socket(socket.AF_UNIX)
+  lost.connect(coordinator.address)
+  lost.sendall(json.dumps({'type': 'hello', 'name': 'lost',
+                           'slots': 3}).encode() + b'\n')
+
+  def leave():
+    message = json.loads(lost.makefile('rb').readline())
+    assert message['type'] == 'trials'
+    assert len(message['points']) == 3
+    lost.close()
+    work(coordinator.address).join(0)
+
+  thread = threading.Thread(target=leave)
+  thread.start()
+  strategy = GridSearch([(0, 3), (0, 1)])
+  assert coordinator.tune(strategy) == ([2.0, 1.0], 0.0)
+  assert len(strategy.history) == 8
+  thread.join(10)
+
+
+def test_tune_unresponsive(tmp_path):
+  # a worker that stops responding without closing its socket, then one that
+  # evaluates its trials
+  coordinator = Coordinator(str(tmp_path / 'socket'), grace=0.2)
+  hung = socket.socket(socket.AF_UNIX)
+  hung.connect(coordinator.address)
+  hung.sendall(json.dumps({'type': 'hello', 'name': 'hung',
+                           'slots': 2}).encode() + b'\n')
+
+  def hang():
+    message = json.loads(hung.makefile('rb').readline())
+    assert message['timeout'] == 0.5
+    work(coordinator.address).join(0)
+
+  thread = threading.Thread(target=hang)
+  thread.start()
+  with coordinator:
+    strategy = GridSearch([(0, 3), (0, 1)])
+    assert coordinator.tune(strategy, trial_timeout=0.5) == ([2.0, 1.0], 0.0)
+    assert len(strategy.history) == 8
+    assert all(w.name != 'hung' for w in coordinator.workers)
+  thread.join(10)
+  hung.close()
+
+
+def test_run_send_failed(coordinator):
+  sock = MagicMock()
+  sock.sendall.side_effect = BrokenPipeError
+  sock.fileno.return_value = socket.socket().detach()
+  gone = distributed._Worker(sock)
+  gone.slots = 2
+  coordinator.workers.append(gone)
+  coordinator.selector.register(sock, distributed.selectors.EVENT_READ, gone)
+  thread = work(coordinator.address)
+  assert coordinator.run([[2, 1], [0, 0]], [0, 1], None, None)[1][0] == 5
+  assert gone not in coordinator.workers
+  assert sock.close.called
+  coordinator.close()
+  thread.join(10)
+
+
+def test_worker_child(patch):
+  sock = patch('forking_tuner.distributed._connect').return_value
+  messages = sock.makefile.return_value.__enter__.return_value
+  line = json.dumps({'type': 'trials', 'points': [[1, 2], [3, 4]],
+                     'numbers': [5, 6], 'fidelity': None, 'timeout': None})
+  messages.__iter__.return_value = [line.encode() + b'\n']
+  patch('_fork_batch').return_value = (False, 1)
+  exit_child = patch('forking_tuner._exit_child')
+  patch('forking_tuner.channel._send_timings')
+  loop = worker('address', vertex_type=tuple)
+  assert next(loop) == (3, 4)
+  assert messages.close.called and sock.close.called
+  with raises(StopIteration):
+    next(loop)
+  assert exit_child.called
+
+
+def test_connect_retry(tmp_path):
+  path = str(tmp_path / 'socket')
+  with raises(OSError):
+    distributed._connect(path, 0.2)
+  listener = socket.socket(socket.AF_UNIX)
+  threading.Timer(0.2, lambda: (listener.bind(path), listener.listen())).start()
+  with listener:
+    distributed._connect(path, 10).close()
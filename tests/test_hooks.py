@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import pstats
+import sys
+import tracemalloc
+
+from forking_tuner import report, tune
+from forking_tuner.channel import in_trial
+from forking_tuner.hooks import Hooks, Profile, TraceMalloc
+from forking_tuner.strategies import GridSearch
+
+
+def workload():
+  return [str(i) for i in range(1000)]
+
+
+def test_hooks():
+  hooks = Hooks()
+  hooks.on_trial_start(0, [1])
+  hooks.on_trial_exit(0, [1])
+  hooks.on_trial_end(0, None)
+
+
+def test_profile(tmp_path):
+  directory = str(tmp_path / 'profiles')
+  hooks = Profile(directory)
+  hooks.on_trial_start(3, [1])
+  workload()
+  hooks.on_trial_exit(3, [1])
+  stats = pstats.Stats(os.path.join(directory, 'trial-3.prof'))
+  assert any(name == 'workload' for _, _, name in stats.stats)
+
+
+def test_trace_malloc(tmp_path):
+  directory = str(tmp_path / 'snapshots')
+  hooks = TraceMalloc(directory, frames=2)
+  hooks.on_trial_start(4, [1])
+  kept = workload()
+  hooks.on_trial_exit(4, [1])
+  assert not tracemalloc.is_tracing()
+  snapshot = tracemalloc.Snapshot.load(os.path.join(directory,
+                                                    'trial-4.tracemalloc'))
+  assert snapshot.traceback_limit == 2
+  files = {s.traceback[0].filename for s in snapshot.statistics('lineno')}
+  assert __file__ in files
+  assert kept
+
+
+def test_profile_children(tmp_path):
+  directory = str(tmp_path / 'profiles')
+  for vertex in tune(GridSearch([(1, 2)]), hooks=[Profile(directory)]):
+    if not in_trial():
+      break
+    workload()
+    report(vertex[0])
+  assert sorted(os.listdir(directory)) == ['trial-0.prof', 'trial-1.prof']
+  assert sys.getprofile() is None
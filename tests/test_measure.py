@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from mock import MagicMock
+from pytest import approx, fixture, mark, raises
+
+from forking_tuner import tune
+from forking_tuner.channel import in_trial
+from forking_tuner.measure import Measurement, measure, percentile, steady
+from forking_tuner.strategies import GridSearch
+
+
+def test_percentile():
+  assert percentile([3], 99) == 3
+  assert percentile([4, 1, 3, 2], 0) == 1
+  assert percentile([4, 1, 3, 2], 50) == 2.5
+  assert percentile(list(range(101)), 95) == 95
+  assert percentile([1, 2], 99) == approx(1.99)
+
+
+def test_steady():
+  assert not steady([1, 1, 1], 2, 0.05)
+  assert not steady([9, 1, 1, 1], 2, 0.05)
+  assert steady([9, 1, 1, 1, 1], 2, 0.05)
+  assert not steady([9, 9, 2, 1], 2, 0.05)
+  assert steady([100, 104, 100, 100], 2, 0.05)
+  assert not steady([1, 1], 0, 0.05)
+
+
+def test_measurement():
+  m = Measurement([1000000000, 2000000000, 3000000000, 6000000000], items=8,
+                  warmup=3)
+  assert (m.mean, m.median) == (3.0, 2.5)
+  assert m.p95 == approx(5.55)
+  assert m.p99 == approx(5.91)
+  assert m.throughput == approx(32 / 12)
+  assert m.objective('p99') == m.p99
+  assert m.objective('throughput') == -m.throughput
+  metrics = m.metrics()
+  assert (metrics['samples'], metrics['warmup']) == (4, 3)
+  assert metrics['settled']
+  assert metrics['median'] == 2.5
+  assert repr(m) == ('Measurement(4 samples, median 2.500000s, p99 '
+                     '5.910000s, throughput 2.67/s)')
+  with raises(ValueError):
+    m.objective('max')
+  with raises(ValueError):
+    Measurement([])
+
+
+@fixture
+def clock(patch):
+  # each call of the workload takes the next of `clock.durations`, in ns
+  clock = patch('time')
+  clock.now = 0
+  clock.durations = []
+
+  def perf_counter_ns():
+    clock.now += clock.durations.pop(0) if clock.calls % 2 else 0
+    clock.calls += 1
+    return clock.now
+
+  clock.calls = 0
+  clock.perf_counter_ns.side_effect = perf_counter_ns
+  clock.monotonic.side_effect = lambda: clock.now / 1e9
+  return clock
+
+
+@fixture
+def report_(patch):
+  return patch('channel.report')
+
+
+def test_measure(clock, report_):
+  # graph tracing, then first-touch allocations, then a steady state
+  clock.durations = [900, 300, 110, 100, 100, 101, 99, 100, 102, 100, 98]
+  workload = MagicMock()
+  m = measure(workload, samples=5, window=2, items=4)
+  # the warm-up settles after 6 calls, the last 2 of which are sampled
+  assert workload.call_count == 9
+  assert m.samples == [100, 101, 99, 100, 102]
+  assert (m.warmup, m.settled) == (4, True)
+  assert report_.call_args[0] == (m.median,)
+  assert report_.call_args[1] == m.metrics()
+  assert report_.call_args[1]['throughput'] == approx(4e9 / 100.4)
+
+
+def test_measure_unsettled(clock, report_, caplog):
+  clock.durations = [100, 200, 100, 200, 300, 300]
+  m = measure(MagicMock(), samples=2, max_warmup=4, window=1, tolerance=0,
+              objective='throughput', report=False)
+  assert m.samples == [300, 300]
+  assert (m.warmup, m.settled) == (4, False)
+  assert 'did not reach a steady state in 4 calls' in caplog.text
+  assert not report_.called
+
+
+def test_measure_min_warmup(clock, report_):
+  clock.durations = [100] * 7
+  m = measure(MagicMock(), samples=3, warmup=5, window=1)
+  assert (m.warmup, len(m.samples)) == (4, 3)
+
+
+def test_measure_no_warmup(clock, report_, caplog):
+  clock.durations = [500, 100]
+  m = measure(MagicMock(), samples=2, max_warmup=0)
+  assert (m.samples, m.warmup, m.settled) == ([500, 100], 0, True)
+  assert not caplog.text
+
+
+def test_measure_max_time(clock, report_):
+  clock.durations = [1000] * 10
+  m = measure(MagicMock(), samples=10, window=2, max_time=4.5e-6)
+  # 4 warm-up calls settle, the last 2 of which are sampled, then 1 more
+  assert (m.warmup, m.samples) == (2, [1000] * 3)
+
+
+def test_measure_max_time_one_sample(clock, report_):
+  clock.durations = [1000] * 2
+  m = measure(MagicMock(), samples=10, max_time=0)
+  assert (m.settled, m.samples) == (False, [1000])
+
+
+def test_measure_fidelity(clock, patch, report_):
+  patch('channel.fidelity').return_value = 3.0
+  clock.durations = [100] * 5
+  assert len(measure(MagicMock(), window=1).samples) == 3
+
+
+def test_measure_unknown_objective():
+  with raises(ValueError):
+    measure(MagicMock(), objective='max')
+
+
+@mark.parametrize('stat', ['median', 'p99'])
+def test_measure_trials(stat):
+  delays = {1: 1e-3, 2: 2e-4}
+  for vertex in tune(GridSearch([(1, 2)])):
+    if not in_trial():
+      break
+    measure(lambda: sum(range(int(delays[vertex[0]] * 1e6))), samples=5,
+            objective=stat, max_time=5)
+  assert vertex == [2]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import math
+
+from forking_tuner.objectives import INFEASIBLE, pareto_front, penalize
+from forking_tuner.objectives import violation
+
+
+def test_violation():
+  constraints = {'rss': 100, 'cores': (2, 8), 'drops': 0}
+  assert violation({'rss': 100, 'cores': 2, 'drops': 0}, constraints) == 0
+  assert violation({'rss': 150, 'cores': 9, 'drops': 0},
+                   constraints) == 0.5 + 0.125
+  assert violation({'rss': 10, 'cores': 1, 'drops': 3}, constraints) == 3.5
+  assert violation({'rss': 10}, None) == 0
+  # a missing metric is as infeasible as can be
+  assert violation({'rss': 10}, constraints) == math.inf
+
+
+def test_penalize():
+  assert penalize(3.0, 0.0) == 3.0
+  assert penalize(3.0, 0.5) == INFEASIBLE * 1.5
+  assert penalize(3.0, math.inf) == penalize(3.0, math.inf, 0) == math.inf
+  # small violations still rank the least infeasible first
+  assert INFEASIBLE < penalize(1.0, 0.01) < penalize(1.0, 0.05)
+  assert penalize(3.0, 0.5, penalty=10) == 8.0
+  assert penalize(math.inf, 0.5) == math.inf
+
+
+def test_pareto_front():
+  points = [(1, 5), (2, 2), (3, 3), (5, 1), (1, 5), (2, 4)]
+  assert pareto_front(points, lambda p: p) == [(1, 5), (2, 2), (5, 1),
+                                               (1, 5)]
+  assert pareto_front([], lambda p: p) == []
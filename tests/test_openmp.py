@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import ctypes
+import ctypes.util
+import os
+
+from mock import MagicMock
+from pytest import fixture, mark, skip
+
+from forking_tuner.openmp import set_threading, _loaded_libraries, _runtimes
+from testing import forked_metrics
+
+
+@fixture(autouse=True)
+def environ(monkeypatch):
+  for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+               'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS'):
+    monkeypatch.delenv(name, raising=False)
+
+
+def test_set_threading_environment(patch):
+  setter = MagicMock()
+  patch('_runtimes').return_value = [('/lib/libgomp.so.1', setter)]
+  set_threading([3.7])
+  setter.assert_called_once_with(3)
+  assert os.environ['OMP_NUM_THREADS'] == '3'
+  assert os.environ['OPENBLAS_NUM_THREADS'] == '3'
+  set_threading([0])
+  assert os.environ['MKL_NUM_THREADS'] == '1'
+
+
+@mark.parametrize('name,getter', [('gomp', 'omp_get_max_threads'),
+                                  ('openblas', 'openblas_get_num_threads')])
+def test_set_threading_child(name, getter, tmp_path):
+  path = ctypes.util.find_library(name)
+  if path is None:
+    skip(f'no {name} library')
+  # loaded into the tuner process, like NumPy's BLAS
+  library = ctypes.CDLL(path)
+
+  def trial(vertex):
+    set_threading(vertex)
+    return {'threads': getattr(library, getter)(),
+            'environment': os.environ['OMP_NUM_THREADS']}
+
+  metrics = forked_metrics(tmp_path / 'trace.jsonl', [(2, 3)], trial)
+  assert metrics == [{'threads': 2, 'environment': '2'},
+                     {'threads': 3, 'environment': '3'}]
+  assert 'OMP_NUM_THREADS' not in os.environ
+
+
+def test_loaded_libraries(patch, tmp_path):
+  maps = tmp_path / 'maps'
+  maps.write_text('7f00-7f01 r-xp 00000000 08:01 12 /usr/lib/libgomp.so.1\n'
+                  '7f01-7f02 r--p 00001000 08:01 12 /usr/lib/libgomp.so.1\n'
+                  '7f02-7f03 rw-p 00000000 00:00 0 \n'
+                  '7f03-7f04 r--p 00000000 08:01 13 /usr/share/locale.dat\n'
+                  '7f04-7f05 r-xp 00000000 08:01 14 /opt/libmkl_rt.so\n')
+  patch('_MAPS_PATH', str(maps))
+  assert _loaded_libraries() == ['/opt/libmkl_rt.so', '/usr/lib/libgomp.so.1']
+  patch('_MAPS_PATH', str(tmp_path / 'missing'))
+  assert _loaded_libraries() == []
+
+
+def test_runtimes(patch):
+  loaded = patch('_loaded_libraries')
+  loaded.return_value = ['/lib/libc.so.6', '/lib/libgomp.so.1',
+                         '/lib/libopenblas.so.0', '/lib/libomp.so',
+                         '/lib/libmkl_rt.so']
+  gomp = MagicMock(spec=['omp_set_num_threads'])
+  openblas = MagicMock(spec=['openblas_set_num_threads64_'])
+  mkl = MagicMock(spec=[])
+  libraries = {'/lib/libgomp.so.1': gomp, '/lib/libopenblas.so.0': openblas,
+               '/lib/libmkl_rt.so': mkl}
+
+  def load(path):
+    if path not in libraries:
+      raise OSError(path)
+    return libraries[path]
+
+  patch('ctypes').CDLL.side_effect = load
+  assert _runtimes() == [('/lib/libgomp.so.1', gomp.omp_set_num_threads),
+                         ('/lib/libopenblas.so.0',
+                          openblas.openblas_set_num_threads64_)]
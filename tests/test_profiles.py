@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+import json
+import threading
+from collections import namedtuple
+
+from mock import MagicMock
+from pytest import fixture, raises
+
+from forking_tuner import INFEASIBLE, profiles, report
+from forking_tuner.channel import in_trial
+from forking_tuner.profiles import ProfileStore, fingerprint
+
+
+def machine(cores, cpu='Xeon', smt=2, sockets=2, libraries=None):
+  return {'cpu': cpu, 'machine': 'x86_64', 'cpus': cores * smt,
+          'cores': cores, 'sockets': sockets, 'smt': smt, 'numa': sockets,
+          'libraries': libraries or {'torch': '2.0'}}
+
+
+@fixture
+def store(tmp_path):
+  return ProfileStore(str(tmp_path / 'profiles' / 'store.json'))
+
+
+def test_fingerprint(patch, tmp_path):
+  cpuinfo = tmp_path / 'cpuinfo'
+  cpuinfo.write_text('processor\t: 0\nmodel name\t: Xeon Gold\n')
+  patch('_CPUINFO_PATH', str(cpuinfo))
+  patch('_online_cpus').return_value = [0, 1, 2, 3, 4, 5, 6]
+  sockets = patch('_sockets')
+  sockets.return_value = [[[0, 4], [1, 5]], [[2, 6], [3]]]
+  patch('_numa_nodes').return_value = [[0, 1, 4, 5], [2, 3, 6]]
+  result = fingerprint(['pytest', 'no-such-library'])
+  # the whole machine's topology, not just the CPUs this process may use
+  sockets.assert_called_once_with([0, 1, 2, 3, 4, 5, 6])
+  assert result['cpu'] == 'Xeon Gold'
+  assert (result['cpus'], result['cores'], result['sockets']) == (7, 4, 2)
+  assert (result['smt'], result['numa']) == (2, 2)
+  assert result['libraries']['pytest']
+  assert result['libraries']['no-such-library'] is None
+
+
+def test_fingerprint_defaults(patch, tmp_path):
+  patch('_CPUINFO_PATH', str(tmp_path / 'cpuinfo'))
+  patch('_numa_nodes').return_value = []
+  patch('platform.processor').return_value = ''
+  patch('platform.machine').return_value = 'aarch64'
+  result = fingerprint()
+  assert result['cpu'] == 'aarch64'
+  assert (result['numa'], result['libraries']) == (1, {})
+  (tmp_path / 'cpuinfo').write_text('processor\t: 0\n')
+  assert fingerprint() == result
+
+
+def test_store(store):
+  assert store.get('bert', machine(28)) is None
+  assert store.nearest('bert', machine(28)) is None
+  store.save('bert', machine(28), (14, 2), 1.5)
+  store.save('bert', machine(28), (16, 2), 1.25)
+  store.save('resnet', machine(28), (8, 1), 3.0)
+  profile = store.get('bert', machine(28))
+  assert (profile['vertex'], profile['objective']) == ([16.0, 2.0], 1.25)
+  assert profile['fingerprint'] == machine(28)
+  assert store.get('bert', machine(56)) is None
+  with open(store.path) as f:
+    assert len(json.load(f)['profiles']) == 2
+
+
+def test_store_concurrent_saves(store):
+  # machines saving at the same time keep each other's profiles
+  def save(cores):
+    for workload in range(10):
+      ProfileStore(store.path).save(str(workload), machine(cores), [1], 1.0)
+
+  threads = [threading.Thread(target=save, args=(c,)) for c in range(1, 5)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join(30)
+  with open(store.path) as f:
+    assert len(json.load(f)['profiles']) == 40
+
+
+def test_store_version(store):
+  store.save('bert', machine(28), [1], 1.0)
+  with open(store.path) as f:
+    data = json.load(f)
+  data['version'] = 0
+  with open(store.path, 'w') as f:
+    json.dump(data, f)
+  with raises(ValueError):
+    store.get('bert', machine(28))
+
+
+def test_store_default_path(monkeypatch, tmp_path):
+  monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+  path = tmp_path / 'forking-tuner' / 'profiles.json'
+  assert ProfileStore().path == str(path)
+  monkeypatch.delenv('XDG_CACHE_HOME')
+  monkeypatch.setenv('HOME', str(tmp_path))
+  path = tmp_path / '.cache' / 'forking-tuner' / 'profiles.json'
+  assert ProfileStore().path == str(path)
+
+
+def test_nearest(store):
+  store.save('bert', machine(16), [8, 1], 2.0)
+  store.save('bert', machine(64), [32, 1], 1.0)
+  store.save('bert', machine(48, cpu='EPYC'), [24, 1], 1.0)
+  store.save('bert', machine(48, libraries={'torch': '1.0'}), [24, 1], 1.0)
+  assert store.nearest('bert', machine(40))['vertex'] == [32, 1]
+  assert store.nearest('bert', machine(20))['vertex'] == [8, 1]
+  assert store.nearest('bert', machine(48, cpu='EPYC'))['vertex'] == [24, 1]
+  assert store.nearest('resnet', machine(40)) is None
+
+
+def test_warm_start(store):
+  cold = store.warm_start('bert', machine(28), [22, 2], [11, 1])
+  assert cold == ([22, 2], [11, 1])
+  assert store.warm_start('bert', machine(28), [22, 2]) == ([22, 2], [1, 1])
+  store.save('bert', machine(16), [8, 3], 2.0)
+  # the thread count scales with the cores, the step sizes are tighter
+  assert store.warm_start('bert', machine(32), [22, 2], [12, 4],
+                          [True]) == ([16, 3], [3, 1])
+  store.save('bert', machine(32), [18, 2], 1.0)
+  assert store.warm_start('bert', machine(32), [22, 2], [12, 4],
+                          [True, False]) == ([18, 2], [3, 1])
+  # the search space has changed since
+  with raises(ValueError):
+    store.warm_start('bert', machine(32), [22, 2, 1])
+
+
+@fixture
+def here(patch):
+  return patch('fingerprint', MagicMock(return_value=machine(28)))
+
+
+def test_nelder_mead_reuse(store, here, patch):
+  tune = patch('tune')
+  store.save('bert', machine(28), [16, 2], 1.25)
+  threading = namedtuple('threading', ['intra', 'inter'])
+  loop = profiles.nelder_mead(store, 'bert', threading(22, 2),
+                              libraries=['torch'])
+  assert list(loop) == [threading(16, 2)]
+  assert not tune.called
+  here.assert_called_once_with(['torch'])
+  with raises(ValueError):
+    next(profiles.nelder_mead(store, 'bert', [22, 2, 1]))
+
+
+def quadratic(vertex):
+  return (vertex[0] - 12) ** 2 + (vertex[1] - 3) ** 2
+
+
+def tuning_loop(store, vertex, **kw):
+  # the loop of a tuned program, the best vertex it ends with and its count
+  # of trials
+  for vertex in profiles.nelder_mead(store, 'bert', vertex, [8, 2],
+                                     bounds=[(1, 28), (1, 8)],
+                                     lattice=[1, 1], **kw):
+    if not in_trial():
+      break
+    report(quadratic(vertex))
+  with open(kw['trace']) as f:
+    trials = len(f.readlines())
+  return vertex, trials
+
+
+def test_nelder_mead(store, here, tmp_path):
+  # a cold search, then a confirmation around its result, then none
+  vertex, cold = tuning_loop(store, [20, 6], trace=str(tmp_path / 'cold'))
+  assert vertex == [12, 3]
+  assert store.get('bert', machine(28))['vertex'] == [12, 3]
+  vertex, warm = tuning_loop(store, [20, 6], reuse=False,
+                             trace=str(tmp_path / 'warm'))
+  assert vertex == [12, 3]
+  assert warm < cold
+  (tmp_path / 'reused').touch()
+  reused = tuning_loop(store, [20, 6], trace=str(tmp_path / 'reused'))
+  assert reused == ([12, 3], 0)
+
+
+def test_nelder_mead_infeasible(store, here, patch):
+  def tune(strategy, vertex_type, **kw):
+    strategy.history.append(([1.0], INFEASIBLE + 1))
+    yield [1.0]
+
+  patch('tune', MagicMock(side_effect=tune))
+  patch('in_trial').return_value = False
+  assert list(profiles.nelder_mead(store, 'bert', [1])) == [[1.0]]
+  assert store.get('bert', machine(28)) is None
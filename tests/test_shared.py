@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import array
+import gc as real_gc
+import os
+
+from mock import MagicMock, sentinel
+from pytest import fixture, importorskip, raises
+
+from forking_tuner import report, shared, tune
+from forking_tuner.channel import in_trial
+from forking_tuner.shared import inherit, resources, _setup, _teardown
+from forking_tuner.strategies import GridSearch
+
+
+@fixture
+def gc(patch, monkeypatch):
+  monkeypatch.setattr(shared, '_resources', None)
+  monkeypatch.setattr(shared, '_froze', False)
+  monkeypatch.setattr(shared, '_depth', 0)
+  gc = patch('gc')
+  gc.get_freeze_count.return_value = 0
+  return gc
+
+
+def test_setup(gc):
+  assert resources() is None
+  hook = MagicMock(return_value=sentinel.resources)
+  _setup(hook)
+  assert resources() is sentinel.resources
+  hook.assert_called_once_with()
+  gc.freeze.assert_called_once_with()
+
+
+def test_setup_none(gc):
+  _setup(None)
+  assert resources() is None
+  gc.freeze.assert_called_once_with()
+
+
+def test_teardown(gc):
+  _setup(None)
+  _teardown()
+  gc.unfreeze.assert_called_once_with()
+  _teardown()
+  gc.unfreeze.assert_called_once_with()
+
+
+def test_teardown_frozen(gc):
+  # the caller froze objects of its own, they stay frozen
+  gc.get_freeze_count.return_value = 10
+  _setup(None)
+  _teardown()
+  gc.freeze.assert_called_once_with()
+  gc.unfreeze.assert_not_called()
+
+
+def test_teardown_nested(gc):
+  # only the outermost tuning loop unfreezes
+  _setup(None)
+  gc.get_freeze_count.return_value = 10
+  _setup(None)
+  _teardown()
+  gc.unfreeze.assert_not_called()
+  _teardown()
+  gc.unfreeze.assert_called_once_with()
+
+
+def test_tune_unfreezes():
+  for vertex in tune(GridSearch([(1, 2)])):
+    if not in_trial():
+      break
+    report(vertex[0])
+  assert real_gc.get_freeze_count() == 0
+
+
+def test_inherit_bytes():
+  view = inherit(b'forking')
+  assert isinstance(view, memoryview)
+  assert view.tobytes() == b'forking'
+  assert inherit(b'').tobytes() == b''
+
+
+def test_inherit_array():
+  data = array.array('d', [1.5, 2.5, 3.5])
+  view = inherit(data)
+  assert view.format == 'd'
+  assert view.tolist() == [1.5, 2.5, 3.5]
+
+
+def test_inherit_not_contiguous():
+  with raises(ValueError):
+    inherit(memoryview(b'forking')[::2])
+
+
+def test_inherit_private():
+  # a child's writes stay in its own copy
+  view = inherit(bytearray(b'forking'))
+  pid = os.fork()
+  if pid == 0:  # pragma: no cover
+    view[0] = ord('F')
+    os._exit(0 if view[0] == ord('F') else 1)
+  assert os.waitpid(pid, 0)[1] == 0
+  assert view.tobytes() == b'forking'
+
+
+def test_inherit_numpy():
+  np = importorskip('numpy')
+  data = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+  view = inherit(data)
+  assert view.shape == (2, 3, 4)
+  assert view.dtype == np.float32
+  assert (view == data).all()
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import sys
+from copy import deepcopy
+
+from pytest import fixture, importorskip, raises
+
+from forking_tuner import INFEASIBLE, PENALTY
+from forking_tuner.strategies import AdaptiveNelderMead, Batch
+from forking_tuner.strategies import CoordinateDescent, GridSearch
+from forking_tuner.strategies import Hyperband, NelderMead, SuccessiveHalving
+from forking_tuner.strategies import _make_simplex, _centroid, _reflect
+from forking_tuner.strategies import _expand, _contract, _shrink, _converged
+from forking_tuner.strategies import _project, _rebuild, _collapsed
+from forking_tuner.strategies import _flatness, _gao_han, _ArraySimplex
+from forking_tuner.strategies import _numpy
+
+
+simplex = [[1, [2, 3]], [2, [4, 7]], [3, [9, 11]]]
+centroid = [3.0, 5.0]
+
+
+def quadratic(point):
+  return sum((x - 3) ** 2 for x in point)
+
+
+def drive(strategy, objective=quadratic):
+  # the tuner's loop, without forking
+  batches = []
+  while True:
+    batch = strategy.ask()
+    if batch is None:
+      return batches
+    batches.append(batch)
+    strategy.tell([objective(p) for p in batch.points])
+
+
+def test_make_simplex():
+  assert _make_simplex([3, 4]) == [[4, 4], [3, 5], [3, 4]]
+
+
+def test_project():
+  assert _project([2.4, -3.0]) == [2.4, -3.0]
+  assert _project([2.4, -3.0], lattice=[1, 0]) == [2.0, -3.0]
+  assert _project([2.4, -3.0], [(3, 5), (-2, 2)]) == [3.0, -2.0]
+  assert _project([7.6, 4.1], [(1, 8), (0, 4)], [2, 0.5]) == [7.0, 4.0]
+  assert _project([1.4], [(0, 1.5)], [1]) == [1.0]
+  assert _project([1.5], [(0, 1.5)], [1]) == [1.0]
+
+
+def test_rebuild():
+  project = lambda p: _project(p, [(0, 3), (0, 3)], [1, 1])  # noqa: E731
+  sim = [[1, [0.0, 2.0]], [2, [0.0, 2.0]], [3, [1.0, 1.0]]]
+  visited = {(1.0, 2.0), (0.0, 2.0)}
+  assert _rebuild(sim, [1.0, 1.0], project,
+                  lambda p: tuple(p) in visited) == [[1.0, 2.0], [0.0, 3.0]]
+  visited.add((0.0, 3.0))
+  assert _rebuild(sim, [1.0, 1.0], project,
+                  lambda p: tuple(p) in visited) == [[1.0, 2.0], [0.0, 1.0]]
+  visited.add((0.0, 1.0))
+  assert _rebuild(sim, [1.0, 1.0], project,
+                  lambda p: tuple(p) in visited) is None
+
+
+def test_collapsed():
+  assert not _collapsed(simplex)
+  assert _collapsed(simplex, [4, 7])
+  assert not _collapsed(simplex, [4, 8])
+  assert _collapsed([[1, [2, 3]], [2, [4, 7]], [3, [2, 3]]])
+
+
+def test_converged():
+  assert _converged([1.0, 1.001, 1.002], 1e-2)
+  assert not _converged([1.0, 2.0, 3.0], 1e-2)
+  assert not _converged([1.0, 1.0, PENALTY], 1e-2)
+  assert not _converged([INFEASIBLE * 1.01] * 3, 1e-2)
+  assert _converged([1.0, 2.0, 3.0], 1e-2, 1.5)
+
+
+def test_centroid():
+  assert _centroid(simplex) == centroid
+
+
+def test_reflect():
+  assert _reflect(simplex, centroid) == [-3.0, -1.0]
+
+
+def test_expand():
+  assert _expand([2.0, 3.0], centroid) == [-1.0, -2.0]
+
+
+def test_contract():
+  assert _contract(simplex, centroid) == [6.0, 8.0]
+
+
+def test_shrink():
+  sim = deepcopy(simplex)
+  _shrink(sim)
+  assert sim[0] == simplex[0]
+  assert sim[1] == [2, [3.0, 5.0]]
+  assert sim[2] == [3, [5.5, 7.0]]
+
+
+def test_batch():
+  batch = Batch([[1.0]], [2.0], 3, 'grid')
+  assert repr(batch) == "Batch([[1.0]], [2.0], 3, 'grid')"
+
+
+def test_nelder_mead():
+  strategy = NelderMead([0, 0], [2, 2])
+  batches = drive(strategy)
+  assert batches[0].step == 'initial'
+  assert len(batches[0].points) == 3
+  assert all(len(b.points) == 1 for b in batches if b.step == 'reflect')
+  point, objective = strategy.best()
+  assert objective < 0.1
+  assert strategy.ranking()[0] == [point, objective]
+  assert strategy.ask() is None
+
+
+def test_nelder_mead_lattice():
+  strategy = NelderMead([0, 0], [1, 1], bounds=[(0, 5), (0, 5)],
+                        lattice=[1, 1])
+  batches = drive(strategy)
+  # revisited vertices are left to the tuner's cache
+  assert all(x == int(x) and 0 <= x <= 5
+             for b in batches for p in b.points for x in p)
+  assert strategy.best() == ([3.0, 3.0], 0.0)
+
+
+def test_clamped():
+  strategy = NelderMead([0, 0], bounds=[(0, 5), (0, 5)])
+  assert strategy.project([-1.0, 2.0]) == [0.0, 2.0]
+  assert strategy.project([1.0, 2.0]) == [1.0, 2.0]
+  assert strategy.clamped == {(0.0, 2.0)}
+  strategy.ask()
+  assert strategy.clamped == set()
+
+
+def test_nelder_mead_reflect_collapsed():
+  # the worst vertex reflects onto the best one once projected
+  strategy = NelderMead([0, 0], [1, 1], bounds=[(0, 5), (0, 5)],
+                        lattice=[1, 1])
+  batches = drive(strategy, lambda p: 10 * p[1] - p[0])
+  assert [b.step for b in batches[:2]] == ['initial', 'rebuild']
+
+
+def test_flatness():
+  assert _flatness([[0, [1, 1]], [1, [3, 1]], [2, [1, 4]]], [1, 1]) == 1
+  assert _flatness([[0, [0, 0]], [1, [1, 1]], [2, [3, 3]]], [1, 1]) == 0
+  assert _flatness([[0, [0, 0]], [1, [0, 0]], [2, [0, 1]]], [1, 1]) == 0
+  flatness = _flatness([[0, [0, 0]], [1, [1, 0]], [2, [1, 1]]], [1, 1])
+  assert abs(flatness - 0.5 ** 0.5) < 1e-12
+  # relative to the scale of each axis
+  scaled = [[0, [0, 0]], [1, [2, 0]], [2, [2, 1]]]
+  assert _flatness(scaled, [2, 1]) == flatness
+  assert _flatness([[0, [0, 0, 0]], [1, [0, 0, 1]], [2, [0, 1, 0]],
+                    [3, [1, 0, 0]]], [1, 1, 1]) == 1
+
+
+def test_nelder_mead_patience():
+  # only the starting vertex is any good
+  strategy = NelderMead([0, 0], [2, 2], patience=5)
+  batches = drive(strategy, lambda p: 0 if p == [0, 0] else 10 + sum(p))
+  # checked once per iteration, which may take two trials
+  assert 3 + 5 <= len(strategy.history) <= 3 + 6
+  assert 'restart' not in [b.step for b in batches]
+
+
+def test_nelder_mead_restarts():
+  strategy = NelderMead([0, 0], [2, 2], patience=5, restarts=2)
+  batches = drive(strategy, lambda p: 0 if p == [0, 0] else 10 + sum(p))
+  restarts = [b.points for b in batches if b.step == 'restart']
+  # smaller and smaller simplices around the best vertex
+  assert restarts == [[[1, 0], [0, 1]], [[0.5, 0], [0, 0.5]]]
+  assert strategy.restarted == 2
+  assert strategy.best() == ([0.0, 0.0], 0)
+
+
+def test_nelder_mead_best_trial():
+  # the trial of the first best objective, or of the last restart
+  strategy = NelderMead([0, 0], [2, 2], patience=5, restarts=1)
+  strategy.ask()
+  strategy.tell([3, 1, 1])
+  assert (strategy._best_objective, strategy._best_trial) == (1, 2)
+  strategy._restart([0, 0])
+  assert (strategy._best_objective, strategy._best_trial) == (1, 3)
+
+
+def test_nelder_mead_patience_cache_hits():
+  # only the first 3 points were trials, the rest were cache hits
+  strategy = NelderMead([0, 0], [2, 2], iterations=20, patience=5,
+                        restarts=2)
+  batches = []
+  while True:
+    batch = strategy.ask()
+    if batch is None:
+      break
+    batches.append(batch)
+    strategy.trials = 3
+    strategy.tell([0 if p == [0, 0] else 10 + sum(p) for p in batch.points])
+  assert len(strategy.history) > 3 + 6
+  assert 'restart' not in [b.step for b in batches]
+
+
+def test_nelder_mead_degenerate():
+  strategy = NelderMead([0, 0], [1, 1], restarts=1)
+  strategy.simplex = [[0, [0, 0]], [1, [1, 1]], [2, [2, 2]]]
+  assert strategy._stalled()
+  strategy.simplex[2] = [2, [2, 1]]
+  assert not strategy._stalled()
+  strategy.restarts = 0
+  strategy.simplex[2] = [2, [2, 2]]
+  assert not strategy._stalled()
+
+
+def test_nelder_mead_best():
+  # a budget stops the search while its reflected point awaits expansion
+  strategy = NelderMead([0, 0], [2, 2])
+  drive(strategy)
+  strategy.history.append(([3.0, 3.0], -1.0))
+  assert strategy.best() == ([3.0, 3.0], -1.0)
+
+
+@fixture(params=['lists', 'numpy'])
+def arrays(request, patch):
+  # the simplex in lists, and in NumPy arrays when it's installed
+  if request.param == 'numpy':
+    importorskip('numpy')
+  else:
+    patch('_numpy').return_value = None
+
+
+def test_numpy(monkeypatch):
+  numpy = importorskip('numpy')
+  assert _numpy() is numpy
+  monkeypatch.setitem(sys.modules, 'numpy', None)
+  assert _numpy() is None
+
+
+def test_gao_han():
+  assert _gao_han(1) == _gao_han(2) == (2, 0.5, 0.5)
+  assert _gao_han(40) == (1.05, 0.7375, 0.975)
+
+
+def test_array_simplex(arrays):
+  array = _ArraySimplex(deepcopy(simplex[::-1]))
+  assert array.pairs() == simplex
+  assert array.objective(0) == 1 and list(array.vertex(-1)) == [9, 11]
+  assert (array.best(), array.worst()) == (simplex[0], simplex[-1])
+  assert list(array.centroid()) == centroid
+  assert not array.collapsed() and array.collapsed([4, 7])
+  array.replace(-1, 0.5, [1.0, 1.0])
+  assert [list(v) for _, v in array.pairs()] == [[2, 3], [4, 7], [1, 1]]
+  assert not array.collapsed([9, 11]) and array.collapsed([1, 1])
+  array.sort()
+  assert array.pairs()[0] == array.best() == [0.5, [1.0, 1.0]]
+  assert list(array.centroid()) == _centroid(array.pairs()) == [1.5, 2.0]
+  # the sum is computed again from scratch every few replacements
+  array.replace(-1, 3, [8.0, 9.0])
+  array.replace(-1, 4, [6.0, 5.0])
+  assert (array.updates, list(array.total)) == (0, [9.0, 9.0])
+  assert array.flatness([1, 1]) == _flatness(array.pairs(), [1, 1])
+  array.replace(-1, 4, [1.0, 1.0])
+  assert array.flatness([1, 1]) == 0
+  assert array.collapsed()
+
+
+def test_adaptive_nelder_mead(arrays):
+  strategy = AdaptiveNelderMead([0] * 10, [1] * 10, iterations=1000,
+                                threshold=1e-8)
+  assert strategy.simplex == []
+  batches = drive(strategy)
+  assert {'reflect', 'expand', 'contract'} <= {b.step for b in batches}
+  assert strategy.simplex == strategy.array.pairs()
+  point, objective = strategy.best()
+  assert objective < 1e-3
+  assert strategy.ranking()[0] == [point, objective]
+
+
+def test_adaptive_nelder_mead_lattice(arrays):
+  strategy = AdaptiveNelderMead([0, 0], [1, 1], bounds=[(0, 5), (0, 5)],
+                                lattice=[1, 1])
+  batches = drive(strategy, lambda p: 10 * p[1] - p[0] + quadratic(p))
+  assert 'rebuild' in [b.step for b in batches]
+  assert strategy.best() == ([3.0, 0.0], -3.0 + 9)
+
+
+def test_adaptive_nelder_mead_contract_collapsed(arrays):
+  # the reflection is worse than every vertex, the contraction toward the
+  # worst one rounds onto the best one
+  objectives = {(0, 0): 0, (0, 1): 1, (1, 0): 2}
+  strategy = AdaptiveNelderMead([0, 0], [1, 1], bounds=[(-5, 5), (-5, 5)],
+                                lattice=[1, 1])
+  batches = drive(strategy, lambda p: objectives.get(tuple(p), 10))
+  assert [b.step for b in batches[:3]] == ['initial', 'reflect', 'rebuild']
+  assert strategy.best() == ([0.0, 0.0], 0)
+
+
+def test_adaptive_nelder_mead_shrink(arrays):
+  # objectives that get worse with every trial make every step fail
+  count = iter(range(10 ** 6))
+
+  def worse(point):
+    return next(count)
+
+  strategy = AdaptiveNelderMead([0] * 4, iterations=3, threshold=0)
+  assert [len(b.points) for b in drive(strategy, worse)
+          if b.step == 'shrink'] == [4] * 3
+  strategy = AdaptiveNelderMead([0] * 4, iterations=3, threshold=0,
+                                full_shrink=False)
+  assert [len(b.points) for b in drive(strategy, worse)
+          if b.step == 'shrink'] == [1] * 3
+
+
+def test_adaptive_nelder_mead_restarts(arrays):
+  strategy = AdaptiveNelderMead([0, 0], [2, 2], patience=5, restarts=1)
+  batches = drive(strategy, lambda p: 0 if p == [0, 0] else 10 + sum(p))
+  restarts = [b.points for b in batches if b.step == 'restart']
+  assert restarts == [[[1, 0], [0, 1]]]
+  assert strategy.best() == ([0.0, 0.0], 0)
+
+
+def test_adaptive_nelder_mead_degenerate(arrays):
+  strategy = AdaptiveNelderMead([0, 0], [1, 1], restarts=1)
+  strategy.array = _ArraySimplex([[0, [0, 0]], [1, [1, 1]], [2, [2, 2]]])
+  assert strategy._stalled()
+
+
+def test_grid_search():
+  strategy = GridSearch([(1, 3), (0, 1)], batch_size=4)
+  assert strategy.points() == [[1.0, 0.0], [1.0, 1.0], [2.0, 0.0],
+                               [2.0, 1.0], [3.0, 0.0], [3.0, 1.0]]
+  batches = drive(strategy)
+  assert [len(b.points) for b in batches] == [4, 2]
+  assert strategy.best() == ([3.0, 1.0], 4.0)
+  assert strategy.iteration == 2
+  with raises(ValueError):
+    GridSearch([(0, 1)], [0])
+
+
+def test_coordinate_descent():
+  strategy = CoordinateDescent([0, 10], [2, 2], bounds=[(0, 10), (0, 10)],
+                               lattice=[1, 1])
+  drive(strategy)
+  assert strategy.best() == ([3.0, 3.0], 0.0)
+  assert strategy.ranking() == [[[3.0, 3.0], 0.0]]
+
+
+def test_coordinate_descent_fixed():
+  # the second knob has nowhere to go
+  strategy = CoordinateDescent([0, 1], [2, 2], bounds=[(0, 10), (1, 1)],
+                               lattice=[1, 1])
+  batches = drive(strategy)
+  assert all(b.step == 'initial' or b.step == 'axis 0' for b in batches)
+  assert strategy.best() == ([3.0, 1.0], 4.0)
+
+
+def test_coordinate_descent_tolerance():
+  strategy = CoordinateDescent([0.0], [1.0], tolerance=0.1)
+  drive(strategy)
+  point, objective = strategy.best()
+  assert abs(point[0] - 3) < 0.1
+
+
+def test_successive_halving():
+  candidates = [[i] for i in range(9)]
+  strategy = SuccessiveHalving(candidates, max_fidelity=9, eta=3)
+  batches = drive(strategy, lambda p: abs(p[0] - 4))
+  rungs = [(len(b.points), b.fidelity) for b in batches]
+  assert rungs == [(9, 1), (3, 3), (1, 9)]
+  assert batches[1].points == [[4.0], [3.0], [5.0]]
+  assert strategy.best() == ([4.0], 0)
+
+
+def test_successive_halving_best():
+  # the best point at the highest fidelity wins over lucky low fidelity ones
+  strategy = SuccessiveHalving([[0], [1], [2]], min_fidelity=1,
+                               max_fidelity=3, eta=3)
+  strategy.ask()
+  strategy.tell([0.5, 1.0, 2.0])
+  strategy.ask()
+  strategy.tell([0.7])
+  assert strategy.ask() is None
+  assert strategy.best() == ([0.0], 0.7)
+  assert SuccessiveHalving([[0]]).best() is None
+
+
+def test_successive_halving_sample():
+  strategy = SuccessiveHalving(bounds=[(0, 4), (0, 4)], lattice=[1, 1],
+                               count=5)
+  points = strategy.sample(5)
+  assert len(points) == len(set(tuple(p) for p in points)) == 5
+  assert all(x == int(x) and 0 <= x <= 4 for p in points for x in p)
+  with raises(ValueError):
+    SuccessiveHalving()
+
+
+def test_hyperband():
+  strategy = Hyperband([(0, 10)], max_fidelity=9, eta=3)
+  batches = drive(strategy)
+  starts = [(len(b.points), b.fidelity) for b in batches
+            if b.step == f'fidelity {b.fidelity:g}']
+  assert starts[0] == (9, 1)
+  assert (3, 9) in starts
+  assert strategy.best()[1] < PENALTY
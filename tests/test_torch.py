@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import torch
+
+from forking_tuner.torch import set_threading
+from testing import forked_metrics
+
+
+def test_set_threading_child(tmp_path):
+  def trial(vertex):
+    set_threading(vertex)
+    return {'intra': torch.get_num_threads(),
+            'inter': torch.get_num_interop_threads()}
+
+  metrics = forked_metrics(tmp_path / 'trace.jsonl', [(1, 2), (3, 3)], trial)
+  assert metrics == [{'intra': 1, 'inter': 3}, {'intra': 2, 'inter': 3}]
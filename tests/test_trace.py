@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import io
+import json
+import math
+import runpy
+import sys
+
+from pytest import fixture, mark, raises
+
+from forking_tuner import Trial
+from forking_tuner.trace import Trace, main, phases, read_trace, summarize
+
+
+def record(vertex, objective, step='reflect', start=0.0, end=1.0, **kw):
+  return dict(vertex=vertex, objective=objective, step=step, start=start,
+              end=end, **kw)
+
+
+records = [record([1, 1], 5.0, 'initial', 100, 102),
+           record([2, 1], 4.0, 'initial', 102, 103, metrics={'rss': 9}),
+           record([1, 1], 5.0, 'reflect', 103, 104),
+           record([3, 1], math.inf, 'reflect', 104, 110),
+           record([0, 1], 3.0, 'expand', 110, 111, clamped=True),
+           record([0, 1], 2.5, 'expand', 111, 112, repeat=True,
+                  metrics={'rss': 3}),
+           record([4, 4], 1.0, 'contract', 112, 113, violation=0.5,
+                  timings={'ready': 0, 'fork': 10 ** 6, 'forked': 3 * 10 ** 6,
+                           'child': 2 * 10 ** 6, 'start': 3 * 10 ** 6})]
+
+
+@fixture
+def path(tmp_path):
+  path = tmp_path / 'trace.jsonl'
+  with open(path, 'w') as f:
+    for r in records:
+      f.write(json.dumps(r) + '\n')
+  return str(path)
+
+
+def test_trace(tmp_path):
+  path = str(tmp_path / 'trace.jsonl')
+  trial = Trial([1.0, 2.0], 3.5, {'rss': 4}, usage={'max_rss': 5},
+                step='reflect', child={'pid': 7, 'start': 1.0, 'end': 2.5,
+                                       'status': None, 'signal': 9})
+  trace = Trace(path)
+  trace.write(trial)
+  trace.write(trial, clamped=True)
+  trace.close()
+  with open(path) as f:
+    written = list(read_trace(f))
+  assert written[0] == {'vertex': [1.0, 2.0], 'objective': 3.5,
+                        'step': 'reflect', 'fidelity': None,
+                        'repeat': False, 'clamped': False, 'violation': 0.0,
+                        'pid': 7, 'start': 1.0, 'end': 2.5, 'timings': None,
+                        'status': None, 'signal': 9,
+                        'metrics': {'rss': 4}, 'usage': {'max_rss': 5}}
+  assert written[1]['clamped']
+
+
+def test_phases():
+  assert phases({}) == {}
+  timings = {'ready': 1, 'fork': 3, 'forked': 7, 'child': 5, 'start': 12,
+             'end': 20, 'closed': 21, 'reaped': 25}
+  assert list(phases(timings).items()) == [('tuner', 2), ('fork', 4),
+                                           ('setup', 7), ('workload', 8),
+                                           ('exit', 1), ('reap', 4)]
+
+
+def test_read_trace_cut_short():
+  lines = io.StringIO('{"objective": 1}\n{"objective": 2}\n{"obj')
+  assert list(read_trace(lines)) == [{'objective': 1}, {'objective': 2}]
+  with raises(ValueError):
+    list(read_trace(io.StringIO('{"obj\n{"objective": 1}\n')))
+
+
+def test_summarize():
+  summary = summarize(iter(records))
+  assert summary['count'] == 7
+  assert summary['curve'] == [(1, 2, 5.0), (2, 3, 4.0), (5, 11, 3.0),
+                              (6, 12, 2.5)]
+  assert summary['best']['objective'] == 2.5
+  assert dict(summary['steps']) == {'initial': [2, 3.0], 'reflect': [2, 7.0],
+                                    'expand': [2, 2.0], 'contract': [1, 1.0]}
+  assert summary['wasted'] == {'duplicate': [1, 1.0], 'clamped': [1, 1.0]}
+  assert dict(summary['phases']) == {'tuner': 0.001, 'fork': 0.002,
+                                     'setup': 0.001, 'workload': 0.0,
+                                     'exit': 0.0, 'reap': 0.0}
+
+
+def test_summarize_empty():
+  summary = summarize(iter([{'vertex': [1], 'objective': math.inf}]))
+  assert summary['best'] is None
+  assert summary['curve'] == []
+  assert summary['steps'] == {'': [1, 0.0]}
+
+
+def test_main(path):
+  out = io.StringIO()
+  assert main([path], out) == 0
+  text = out.getvalue()
+  assert text.startswith('7 trials\n')
+  assert '       6      12.00  2.5' in text
+  assert '  [0, 1]: 2.5\n  rss: 3\n' in text
+  assert '  reflect               2 trials       7.00 seconds' in text
+  assert '  duplicate             1 trials       1.00 seconds' in text
+  assert '  fork                  0.002 seconds' in text
+
+
+def test_main_several(path, tmp_path):
+  empty = tmp_path / 'empty.jsonl'
+  empty.write_text(json.dumps(record([1], math.inf)) + '\n')
+  out = io.StringIO()
+  main([path, str(empty)], out)
+  assert f'\n\n{empty}:\n1 trials\n' in out.getvalue()
+  assert 'none, no trial was feasible' in out.getvalue()
+
+
+@mark.filterwarnings('ignore:.*found in sys.modules:RuntimeWarning')
+def test_trace_module(path, monkeypatch, capsys):
+  monkeypatch.setattr(sys, 'argv', ['trace', path])
+  with raises(SystemExit) as exit:
+    runpy.run_module('forking_tuner.trace', run_name='__main__')
+  assert exit.value.code == 0
+  assert capsys.readouterr().out.startswith('7 trials\n')